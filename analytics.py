@@ -0,0 +1,464 @@
+import math
+import threading
+import warnings
+from dataclasses import dataclass
+from typing import Dict, Tuple, Callable, Any
+
+import numpy as np
+import pandas as pd
+
+from disease_cube import METRICS, DiseaseCube
+from env_archive import EnvArchive
+
+# Fewer overlapping months than this gives no coefficient (NaN) for a pair
+MIN_PERIODS = 6
+
+# Longest environment -> disease lead time examined, in months
+MAX_LAG = 12
+
+# Robust z-score above which a month counts as an outbreak anomaly (Iglewicz & Hoaglin)
+ANOMALY_THRESHOLD = 3.5
+# MAD of a normal sample is 0.6745 sigma
+MAD_SCALE = 1.4826
+
+
+# ---------------- DISTRIBUTIONS ----------------
+_lgamma = np.vectorize(math.lgamma, otypes=[np.float64])
+
+
+def _betacf(a: np.ndarray, b: np.ndarray, x: np.ndarray, iterations: int = 200) -> np.ndarray:
+    """Continued fraction for the regularized incomplete beta (modified Lentz), elementwise"""
+    tiny = 1e-300
+    qab, qap, qam = a + b, a + 1.0, a - 1.0
+    c = np.ones_like(x)
+    d = 1.0 - qab * x / qap
+    d = 1.0 / np.where(np.abs(d) < tiny, tiny, d)
+    h = d.copy()
+    for m in range(1, iterations + 1):
+        m2 = 2 * m
+        aa = m * (b - m) * x / ((qam + m2) * (a + m2))
+        d = 1.0 + aa * d
+        d = 1.0 / np.where(np.abs(d) < tiny, tiny, d)
+        c = 1.0 + aa / c
+        c = np.where(np.abs(c) < tiny, tiny, c)
+        h *= d * c
+        aa = -(a + m) * (qab + m) * x / ((a + m2) * (qap + m2))
+        d = 1.0 + aa * d
+        d = 1.0 / np.where(np.abs(d) < tiny, tiny, d)
+        c = 1.0 + aa / c
+        c = np.where(np.abs(c) < tiny, tiny, c)
+        delta = d * c
+        h *= delta
+        if np.all(np.abs(delta - 1.0) < 1e-12):
+            break
+    return h
+
+
+def betainc(a: np.ndarray, b: np.ndarray, x: np.ndarray) -> np.ndarray:
+    """Regularized incomplete beta I_x(a, b) for arrays of parameters, without scipy"""
+    a, b, x = np.broadcast_arrays(*(np.asarray(v, dtype=np.float64) for v in (a, b, x)))
+    result = np.full(x.shape, np.nan)
+    inside = (x > 0) & (x < 1) & (a > 0) & (b > 0)
+    result[(x <= 0) & (a > 0) & (b > 0)] = 0.0
+    result[(x >= 1) & (a > 0) & (b > 0)] = 1.0
+    if not inside.any():
+        return result
+
+    a, b, x = a[inside], b[inside], x[inside]
+    log_front = _lgamma(a + b) - _lgamma(a) - _lgamma(b) + a * np.log(x) + b * np.log1p(-x)
+    front = np.exp(log_front)
+    # The continued fraction converges fast on one side of the mean; use symmetry on the other
+    direct = x < (a + 1.0) / (a + b + 2.0)
+    values = np.empty_like(x)
+    values[direct] = front[direct] * _betacf(a[direct], b[direct], x[direct]) / a[direct]
+    flip = ~direct
+    values[flip] = 1.0 - front[flip] * _betacf(b[flip], a[flip], 1.0 - x[flip]) / b[flip]
+    result[inside] = values
+    return result
+
+
+def t_two_sided_p(t: np.ndarray, df: np.ndarray) -> np.ndarray:
+    """Two-sided p-value of Student's t: P(|T| >= |t|) = I_{df/(df+t^2)}(df/2, 1/2)"""
+    t, df = np.broadcast_arrays(np.asarray(t, dtype=np.float64), np.asarray(df, dtype=np.float64))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x = df / (df + t * t)
+    p = betainc(df / 2.0, np.full(df.shape, 0.5), x)
+    return np.where(np.isinf(t) & (df > 0), 0.0, p)
+
+
+# ---------------- CORRELATION ----------------
+def pairwise_pearson(x: np.ndarray, y: np.ndarray, min_periods: int = MIN_PERIODS) -> Tuple[np.ndarray, np.ndarray]:
+    """Pearson r and overlap count along the last axis, using only positions valid in both.
+
+    ``x`` and ``y`` broadcast against each other; NaN marks a missing observation.
+    """
+    x, y = np.broadcast_arrays(x, y)
+    valid = np.isfinite(x) & np.isfinite(y)
+    n = valid.sum(axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x_mean = np.where(valid, x, 0.0).sum(axis=-1) / n
+        y_mean = np.where(valid, y, 0.0).sum(axis=-1) / n
+        dx = np.where(valid, x - x_mean[..., None], 0.0)
+        dy = np.where(valid, y - y_mean[..., None], 0.0)
+        r = (dx * dy).sum(axis=-1) / np.sqrt((dx * dx).sum(axis=-1) * (dy * dy).sum(axis=-1))
+    r = np.clip(r, -1.0, 1.0)
+    return np.where(n >= min_periods, r, np.nan), n
+
+
+def rank_along_last(a: np.ndarray) -> np.ndarray:
+    """Average ranks (1-based, ties share the mean rank) along the last axis; NaN stays NaN"""
+    shape = a.shape
+    rows = a.reshape(-1, shape[-1])
+    order = np.argsort(rows, axis=1, kind="stable")
+    ordered = np.take_along_axis(rows, order, axis=1)
+
+    # Number tie groups globally so one bincount averages positions for every row at once
+    new_group = np.ones(ordered.shape, dtype=bool)
+    new_group[:, 1:] = ordered[:, 1:] != ordered[:, :-1]
+    group = np.cumsum(new_group.ravel()) - 1
+    positions = np.tile(np.arange(1, shape[-1] + 1, dtype=np.float64), rows.shape[0])
+    mean_rank = np.bincount(group, weights=positions) / np.bincount(group)
+
+    ranks = np.empty(rows.shape)
+    np.put_along_axis(ranks, order, mean_rank[group].reshape(rows.shape), axis=1)
+    ranks[~np.isfinite(rows)] = np.nan
+    return ranks.reshape(shape)
+
+
+def correlation_p_values(r: np.ndarray, n: np.ndarray) -> np.ndarray:
+    """Two-sided p-values for correlation coefficients via t = r * sqrt((n - 2) / (1 - r^2))"""
+    df = (n - 2).astype(np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = r * np.sqrt(df / ((1.0 - r) * (1.0 + r)))
+    p = t_two_sided_p(np.where(np.isfinite(r), t, np.nan), np.where(df > 0, df, np.nan))
+    return np.where(np.isfinite(r), p, np.nan)
+
+
+@dataclass(frozen=True)
+class CorrelationResult:
+    """Coefficients and p-values over city x disease x variable, plus the months used"""
+    cities: Tuple[str, ...]
+    diseases: Tuple[str, ...]
+    variables: Tuple[str, ...]
+    months: Tuple[str, ...]
+    n: np.ndarray
+    pearson_r: np.ndarray
+    pearson_p: np.ndarray
+    spearman_r: np.ndarray
+    spearman_p: np.ndarray
+
+    def to_frame(self) -> pd.DataFrame:
+        """Long table with one row per city, disease and variable"""
+        index = pd.MultiIndex.from_product([self.cities, self.diseases, self.variables],
+                                           names=["City", "Disease", "Variable"])
+        return pd.DataFrame({
+            "N": self.n.ravel(),
+            "Pearson r": self.pearson_r.ravel(),
+            "Pearson p": self.pearson_p.ravel(),
+            "Spearman r": self.spearman_r.ravel(),
+            "Spearman p": self.spearman_p.ravel(),
+        }, index=index).reset_index()
+
+    def matrix(self, city: str, statistic: str = "pearson_r") -> pd.DataFrame:
+        """Disease x variable table of one statistic for a city (empty if the city is absent)"""
+        lowered = [c.lower() for c in self.cities]
+        if city.lower() not in lowered:
+            return pd.DataFrame()
+        values = getattr(self, statistic)[lowered.index(city.lower())]
+        return pd.DataFrame(values, index=list(self.diseases), columns=list(self.variables))
+
+
+def align_series(cube: DiseaseCube, archive: EnvArchive,
+                 metric: str = "Population_Affected") -> Tuple[np.ndarray, np.ndarray, Tuple[str, ...], Tuple[str, ...]]:
+    """Disease (city, disease, month) and environment (city, variable, month) arrays on shared axes.
+
+    Only cities present in both sources are kept; months run contiguously over both ranges
+    (so a shift of k positions is k months) and gaps on either side become NaN. Months
+    without disease records are NaN, not zero.
+    """
+    archive_pos = {c.lower(): i for i, c in enumerate(archive.cities)}
+    cities = tuple(c for c in cube.cities if c.lower() in archive_pos)
+    labels = list(cube.months) + list(archive.months)
+    months = ()
+    if labels:
+        span = pd.period_range(min(labels), max(labels), freq="M")
+        months = tuple(p.start_time.strftime("%Y-%m-%d") for p in span)
+    month_pos = {m: i for i, m in enumerate(months)}
+
+    disease = np.full((len(cities), len(cube.diseases), len(months)), np.nan)
+    environment = np.full((len(cities), len(archive.variables), len(months)), np.nan)
+    if not cities:
+        return disease, environment, cities, months
+
+    cube_rows = np.array([cube.cities.index(c) for c in cities])
+    archive_rows = np.array([archive_pos[c.lower()] for c in cities])
+    cube_cols = np.array([month_pos[m] for m in cube.months])
+    archive_cols = np.array([month_pos[m] for m in archive.months])
+
+    block = np.asarray(cube.values[cube_rows][..., METRICS.index(metric)], dtype=np.float64)
+    recorded = np.asarray(cube.counts[cube_rows]) > 0
+    disease[..., cube_cols] = np.where(recorded, block, np.nan)
+    environment[..., archive_cols] = np.moveaxis(archive.values[archive_rows], 1, 2)
+    return disease, environment, cities, months
+
+
+_results: Dict[tuple, Tuple[tuple, Any]] = {}
+_results_lock = threading.Lock()
+
+
+def _cached(key: tuple, sources: tuple, compute: Callable[[], Any]) -> Any:
+    """Reuse a result while the same source objects (cube, archive) are current.
+
+    Sources are replaced (never mutated) when their files change, so identity is the
+    invalidation signal.
+    """
+    with _results_lock:
+        cached = _results.get(key)
+        if cached is not None and len(cached[0]) == len(sources) and all(a is b for a, b in zip(cached[0], sources)):
+            return cached[1]
+    result = compute()
+    with _results_lock:
+        _results[key] = (sources, result)
+    return result
+
+
+def correlate(cube: DiseaseCube, archive: EnvArchive, metric: str = "Population_Affected",
+              min_periods: int = MIN_PERIODS) -> CorrelationResult:
+    """Pearson and Spearman correlation with p-values for every city x disease x variable.
+
+    All combinations are computed at once by broadcasting the (city, disease, 1, month)
+    disease array against the (city, 1, variable, month) environment array. Spearman ranks
+    are taken over the months both series share, and its p-value uses the same t
+    approximation as Pearson's.
+    """
+    return _cached(("correlate", metric, min_periods), (cube, archive),
+                   lambda: _correlate(cube, archive, metric, min_periods))
+
+
+def _correlate(cube: DiseaseCube, archive: EnvArchive, metric: str, min_periods: int) -> CorrelationResult:
+    disease, environment, cities, months = align_series(cube, archive, metric)
+    y = disease[:, :, None, :]
+    x = environment[:, None, :, :]
+
+    pearson_r, n = pairwise_pearson(x, y, min_periods)
+
+    # Rank each pair over its jointly observed months only
+    both = np.isfinite(x) & np.isfinite(y)
+    x_ranks = rank_along_last(np.where(both, x, np.nan))
+    y_ranks = rank_along_last(np.where(both, y, np.nan))
+    spearman_r, _ = pairwise_pearson(x_ranks, y_ranks, min_periods)
+
+    return CorrelationResult(
+        cities=cities,
+        diseases=tuple(cube.diseases),
+        variables=tuple(archive.variables),
+        months=months,
+        n=n,
+        pearson_r=pearson_r,
+        pearson_p=correlation_p_values(pearson_r, n),
+        spearman_r=spearman_r,
+        spearman_p=correlation_p_values(spearman_r, n),
+    )
+
+
+# ---------------- LAGGED CROSS-CORRELATION ----------------
+@dataclass(frozen=True)
+class LagResult:
+    """Pearson r of disease at month t against environment at t - lag, for lags 0..max_lag"""
+    cities: Tuple[str, ...]
+    diseases: Tuple[str, ...]
+    variables: Tuple[str, ...]
+    lags: np.ndarray
+    r: np.ndarray
+    n: np.ndarray
+    best_lag: np.ndarray
+    best_r: np.ndarray
+    best_p: np.ndarray
+
+    def best_table(self, city: str) -> pd.DataFrame:
+        """Best lead time per disease and variable for a city, strongest first"""
+        lowered = [c.lower() for c in self.cities]
+        if city.lower() not in lowered:
+            return pd.DataFrame()
+        c = lowered.index(city.lower())
+        index = pd.MultiIndex.from_product([self.diseases, self.variables], names=["Disease", "Variable"])
+        table = pd.DataFrame({
+            "Best Lag (months)": self.best_lag[c].ravel(),
+            "r": self.best_r[c].ravel(),
+            "p": self.best_p[c].ravel(),
+        }, index=index).reset_index().dropna(subset=["r"])
+        return table.reindex(table["r"].abs().sort_values(ascending=False).index).reset_index(drop=True)
+
+    def profile(self, city: str, variable: str) -> Dict[str, np.ndarray]:
+        """r at every lag for each disease, for one city and variable"""
+        lowered = [c.lower() for c in self.cities]
+        if city.lower() not in lowered or variable not in self.variables:
+            return {}
+        block = self.r[lowered.index(city.lower()), :, self.variables.index(variable)]
+        return {d: block[i] for i, d in enumerate(self.diseases)}
+
+
+def _lagged_products(f: np.ndarray, g: np.ndarray, n_lags: int, n_fft: int) -> np.ndarray:
+    """sum_t f[..., t - k] * g[..., t] for k = 0..n_lags-1, via one FFT product"""
+    spectrum = np.conj(np.fft.rfft(f, n_fft)) * np.fft.rfft(g, n_fft)
+    return np.fft.irfft(spectrum, n_fft)[..., :n_lags]
+
+
+def lagged_correlation(cube: DiseaseCube, archive: EnvArchive, max_lag: int = MAX_LAG,
+                       metric: str = "Population_Affected", min_periods: int = MIN_PERIODS) -> LagResult:
+    """Cross-correlation at lags 0..max_lag for every city x disease x variable.
+
+    A lag of k months compares disease at month t with the environment at month t - k, so a
+    positive best lag means the variable leads the disease. Cached until the cube or archive
+    changes.
+    """
+    return _cached(("lagged", metric, max_lag, min_periods), (cube, archive),
+                   lambda: _lagged_correlation(cube, archive, max_lag, metric, min_periods))
+
+
+def _lagged_correlation(cube: DiseaseCube, archive: EnvArchive, max_lag: int, metric: str,
+                        min_periods: int) -> LagResult:
+    disease, environment, cities, months = align_series(cube, archive, metric)
+    n_lags = max_lag + 1
+    n_fft = 1 << int(np.ceil(np.log2(max(len(months) + n_lags, 2))))
+
+    # Centre each series first so the sums below do not lose precision to large means
+    with np.errstate(invalid="ignore"):
+        x = environment - np.nanmean(environment, axis=-1, keepdims=True) if environment.size else environment
+        y = disease - np.nanmean(disease, axis=-1, keepdims=True) if disease.size else disease
+    mx, my = np.isfinite(x).astype(np.float64), np.isfinite(y).astype(np.float64)
+    x, y = np.where(mx > 0, x, 0.0), np.where(my > 0, y, 0.0)
+
+    # Environment (city, 1, variable, t) against disease (city, disease, 1, t): every pair at
+    # every lag from six masked sums, exact for series with gaps
+    xe, mxe = x[:, None], mx[:, None]
+    yd, myd = y[:, :, None], my[:, :, None]
+    n = np.rint(_lagged_products(mxe, myd, n_lags, n_fft))
+    sx = _lagged_products(xe, myd, n_lags, n_fft)
+    sy = _lagged_products(mxe, yd, n_lags, n_fft)
+    sxx = _lagged_products(xe * xe, myd, n_lags, n_fft)
+    syy = _lagged_products(mxe, yd * yd, n_lags, n_fft)
+    sxy = _lagged_products(xe, yd, n_lags, n_fft)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cov = n * sxy - sx * sy
+        var = (n * sxx - sx * sx) * (n * syy - sy * sy)
+        r = np.where((n >= min_periods) & (var > 0), cov / np.sqrt(var), np.nan)
+    r = np.clip(r, -1.0, 1.0)
+    n = n.astype(np.int64)
+
+    strength = np.where(np.isfinite(r), np.abs(r), -1.0)
+    best_lag = strength.argmax(axis=-1) if r.size else np.zeros(r.shape[:-1], dtype=np.int64)
+    best_r = np.take_along_axis(r, best_lag[..., None], axis=-1)[..., 0] if r.size else np.full(r.shape[:-1], np.nan)
+    best_n = np.take_along_axis(n, best_lag[..., None], axis=-1)[..., 0] if r.size else np.zeros(r.shape[:-1], dtype=np.int64)
+
+    return LagResult(
+        cities=cities,
+        diseases=tuple(cube.diseases),
+        variables=tuple(archive.variables),
+        lags=np.arange(n_lags),
+        r=r,
+        n=n,
+        best_lag=best_lag,
+        best_r=best_r,
+        # Per-lag p-value; picking the best of max_lag + 1 lags makes it optimistic
+        best_p=correlation_p_values(best_r, best_n),
+    )
+
+
+def strongest_correlations(result: CorrelationResult, alpha: float = 0.05,
+                           statistic: str = "Spearman") -> pd.DataFrame:
+    """Significant pairs sorted by absolute coefficient"""
+    frame = result.to_frame()
+    significant = frame[frame[f"{statistic} p"] < alpha]
+    return significant.reindex(significant[f"{statistic} r"].abs().sort_values(ascending=False).index)
+
+
+# ---------------- ANOMALIES ----------------
+@dataclass(frozen=True)
+class AnomalyResult:
+    """Seasonal baseline, robust z-scores and flags over city x disease x month"""
+    cities: Tuple[str, ...]
+    diseases: Tuple[str, ...]
+    months: Tuple[str, ...]
+    metric: str
+    threshold: float
+    values: np.ndarray
+    baseline: np.ndarray
+    z: np.ndarray
+    flags: np.ndarray
+
+    def _position(self, city: str, disease: str) -> Tuple[int, int]:
+        lowered = [c.lower() for c in self.cities]
+        if city.lower() not in lowered or disease not in self.diseases:
+            return -1, -1
+        return lowered.index(city.lower()), self.diseases.index(disease)
+
+    def series_flags(self, city: str, disease: str) -> Dict[str, float]:
+        """Flagged month -> z-score for one series"""
+        c, d = self._position(city, disease)
+        if c < 0:
+            return {}
+        hits = np.flatnonzero(self.flags[c, d])
+        return {self.months[i]: float(self.z[c, d, i]) for i in hits}
+
+    def current(self, recent_months: int = 3) -> pd.DataFrame:
+        """Flags in each series' last ``recent_months`` recorded months, strongest first"""
+        recorded = np.isfinite(self.values)
+        # Position of each series' latest recorded month, then a window back from it
+        positions = np.arange(len(self.months))
+        latest = np.where(recorded, positions, -1).max(axis=-1, initial=-1)
+        window = (positions >= (latest[..., None] - recent_months + 1)) & (latest[..., None] >= 0)
+        c, d, m = np.nonzero(self.flags & window)
+        frame = pd.DataFrame({
+            "City": [self.cities[i] for i in c],
+            "Disease": [self.diseases[i] for i in d],
+            "Month": [self.months[i] for i in m],
+            self.metric: self.values[c, d, m].astype(np.int64),
+            "Seasonal Baseline": np.rint(self.baseline[c, d, m]).astype(np.int64),
+            "Robust z": np.round(self.z[c, d, m], 2),
+        })
+        return frame.sort_values("Robust z", ascending=False).reset_index(drop=True)
+
+
+def seasonal_anomalies(cube: DiseaseCube, metric: str = "Population_Affected",
+                       threshold: float = ANOMALY_THRESHOLD) -> AnomalyResult:
+    """Flag months far above the same calendar month in other years, for every series at once.
+
+    The baseline is the multi-year median of each calendar month and the scale its MAD
+    (x 1.4826, floored at one case so flat series do not divide by zero). Months without
+    records are ignored. Cached until the cube changes.
+    """
+    return _cached(("anomalies", metric, threshold), (cube,),
+                   lambda: _seasonal_anomalies(cube, metric, threshold))
+
+
+def _seasonal_anomalies(cube: DiseaseCube, metric: str, threshold: float) -> AnomalyResult:
+    values = np.where(np.asarray(cube.counts) > 0,
+                      np.asarray(cube.values[..., METRICS.index(metric)], dtype=np.float64), np.nan)
+    n_cities, n_diseases, n_months = values.shape
+    if n_months == 0:
+        empty = np.empty(values.shape)
+        return AnomalyResult(tuple(cube.cities), tuple(cube.diseases), tuple(cube.months), metric, threshold,
+                             values, empty, empty, np.zeros(values.shape, dtype=bool))
+
+    # Pad to whole years starting in January so calendar months line up on one axis
+    first_month = int(cube.months[0][5:7]) - 1
+    years = -(-(first_month + n_months) // 12)
+    padded = np.full((n_cities, n_diseases, years * 12), np.nan)
+    padded[..., first_month:first_month + n_months] = values
+    by_year = padded.reshape(n_cities, n_diseases, years, 12)
+
+    with warnings.catch_warnings():
+        # Calendar months never recorded for a series stay NaN
+        warnings.simplefilter("ignore", RuntimeWarning)
+        median = np.nanmedian(by_year, axis=2, keepdims=True)
+        mad = np.nanmedian(np.abs(by_year - median), axis=2, keepdims=True) * MAD_SCALE
+    scale = np.maximum(mad, 1.0)
+    z = ((by_year - median) / scale).reshape(n_cities, n_diseases, -1)[..., first_month:first_month + n_months]
+    baseline = np.broadcast_to(median, by_year.shape).reshape(n_cities, n_diseases, -1)[..., first_month:first_month + n_months]
+
+    with np.errstate(invalid="ignore"):
+        flags = z > threshold
+    return AnomalyResult(tuple(cube.cities), tuple(cube.diseases), tuple(cube.months), metric, threshold,
+                         values, np.array(baseline), z, flags)
@@ -0,0 +1,258 @@
+from typing import Optional, Tuple, Dict, Any
+
+import numpy as np
+
+# ---------------- EPA BREAKPOINTS ----------------
+# (concentration low, concentration high, AQI low, AQI high), in each pollutant's AQI units
+PM25_BREAKPOINTS = [
+    (0.0, 12.0, 0, 50),
+    (12.1, 35.4, 51, 100),
+    (35.5, 55.4, 101, 150),
+    (55.5, 150.4, 151, 200),
+    (150.5, 250.4, 201, 300),
+    (250.5, 350.4, 301, 400),
+    (350.5, 500.4, 401, 500),
+]
+
+PM10_BREAKPOINTS = [
+    (0, 54, 0, 50),
+    (55, 154, 51, 100),
+    (155, 254, 101, 150),
+    (255, 354, 151, 200),
+    (355, 424, 201, 300),
+    (425, 504, 301, 400),
+    (505, 604, 401, 500),
+]
+
+O3_BREAKPOINTS = [
+    (0, 54, 0, 50),
+    (55, 70, 51, 100),
+    (71, 85, 101, 150),
+    (86, 105, 151, 200),
+    (106, 200, 201, 300),
+    (201, 404, 301, 400),
+    (405, 604, 401, 500),
+]
+
+NO2_BREAKPOINTS = [
+    (0, 53, 0, 50),
+    (54, 100, 51, 100),
+    (101, 360, 101, 150),
+    (361, 649, 151, 200),
+    (650, 1249, 201, 300),
+    (1250, 1649, 301, 400),
+    (1650, 2049, 401, 500),
+]
+
+SO2_BREAKPOINTS = [
+    (0, 35, 0, 50),
+    (36, 75, 51, 100),
+    (76, 185, 101, 150),
+    (186, 304, 151, 200),
+    (305, 604, 201, 300),
+    (605, 804, 301, 400),
+    (805, 1004, 401, 500),
+]
+
+CO_BREAKPOINTS = [
+    (0.0, 4.4, 0, 50),
+    (4.5, 9.4, 51, 100),
+    (9.5, 12.4, 101, 150),
+    (12.5, 15.4, 151, 200),
+    (15.5, 30.4, 201, 300),
+    (30.5, 40.4, 301, 400),
+    (40.5, 50.4, 401, 500),
+]
+
+# ---------------- COMPREHENSIVE AQI CALCULATION FUNCTIONS ----------------
+def calculate_aqi(concentration: float, breakpoints: list) -> Optional[int]:
+    """Calculate AQI based on concentration and breakpoints"""
+    if concentration is None or concentration < 0:
+        return None
+    for bp_low, bp_high, aqi_low, aqi_high in breakpoints:
+        if bp_low <= concentration <= bp_high:
+            return round(((aqi_high - aqi_low)/(bp_high - bp_low)) * (concentration - bp_low) + aqi_low)
+    # If concentration exceeds all breakpoints, return max AQI
+    return 500
+
+def calculate_pm25_aqi(concentration: float) -> Optional[int]:
+    """Calculate PM2.5 AQI using EPA breakpoints"""
+    if concentration is None:
+        return None
+    return calculate_aqi(concentration, PM25_BREAKPOINTS)
+
+def calculate_pm10_aqi(concentration: float) -> Optional[int]:
+    """Calculate PM10 AQI using EPA breakpoints"""
+    if concentration is None:
+        return None
+    return calculate_aqi(concentration, PM10_BREAKPOINTS)
+
+def calculate_o3_aqi(concentration_ugm3: float) -> Optional[int]:
+    """Calculate Ozone AQI (8-hour average) - concentration in µg/m³"""
+    if concentration_ugm3 is None:
+        return None
+    
+    # Convert from µg/m³ to ppb: For O3: 1 ppb = 1.96 µg/m³ at 25°C
+    concentration_ppb = concentration_ugm3 / 1.96
+    
+    return calculate_aqi(concentration_ppb, O3_BREAKPOINTS)
+
+def calculate_no2_aqi(concentration: float) -> Optional[int]:
+    """Calculate NO2 AQI (1-hour average) - concentration in µg/m³"""
+    if concentration is None:
+        return None
+    
+    # Convert from µg/m³ to ppb: NO2: 1 ppb = 1.88 µg/m³
+    concentration_ppb = concentration / 1.88
+    
+    return calculate_aqi(concentration_ppb, NO2_BREAKPOINTS)
+
+def calculate_so2_aqi(concentration: float) -> Optional[int]:
+    """Calculate SO2 AQI (1-hour average) - concentration in µg/m³"""
+    if concentration is None:
+        return None
+    
+    # Convert from µg/m³ to ppb: SO2: 1 ppb = 2.62 µg/m³
+    concentration_ppb = concentration / 2.62
+    
+    return calculate_aqi(concentration_ppb, SO2_BREAKPOINTS)
+
+def calculate_co_aqi(concentration: float) -> Optional[int]:
+    """Calculate CO AQI (8-hour average) - concentration in µg/m³"""
+    if concentration is None:
+        return None
+    
+    # Convert from µg/m³ to ppm: CO: 1 ppm = 1145 µg/m³
+    concentration_ppm = concentration / 1145
+    
+    return calculate_aqi(concentration_ppm, CO_BREAKPOINTS)
+
+def calculate_comprehensive_aqi(components: dict) -> dict:
+    """Calculate comprehensive AQI considering all pollutants"""
+    aqi_values = {}
+    
+    # Calculate AQI for each pollutant
+    if 'pm2_5' in components and components['pm2_5'] is not None:
+        aqi_values['PM2.5'] = calculate_pm25_aqi(components['pm2_5'])
+    
+    if 'pm10' in components and components['pm10'] is not None:
+        aqi_values['PM10'] = calculate_pm10_aqi(components['pm10'])
+    
+    if 'o3' in components and components['o3'] is not None:
+        aqi_values['O3'] = calculate_o3_aqi(components['o3'])
+    
+    if 'no2' in components and components['no2'] is not None:
+        aqi_values['NO2'] = calculate_no2_aqi(components['no2'])
+    
+    if 'so2' in components and components['so2'] is not None:
+        aqi_values['SO2'] = calculate_so2_aqi(components['so2'])
+    
+    if 'co' in components and components['co'] is not None:
+        aqi_values['CO'] = calculate_co_aqi(components['co'])
+    
+    # Filter out None values
+    valid_aqi_values = {k: v for k, v in aqi_values.items() if v is not None}
+    
+    if not valid_aqi_values:
+        return {'overall_aqi': None, 'dominant_pollutant': None, 'individual_aqis': {}}
+    
+    # Overall AQI is the maximum of all pollutant AQIs
+    overall_aqi = max(valid_aqi_values.values())
+    dominant_pollutant = max(valid_aqi_values, key=valid_aqi_values.get)
+    
+    return {
+        'overall_aqi': overall_aqi,
+        'dominant_pollutant': dominant_pollutant,
+        'individual_aqis': valid_aqi_values
+    }
+
+def get_aqi_category(aqi: Optional[int]) -> Tuple[str, str]:
+    """Get AQI category and color"""
+    if aqi is None:
+        return "Unknown", "gray"
+    elif aqi <= 50:
+        return "Good", "green"
+    elif aqi <= 100:
+        return "Moderate", "yellow"
+    elif aqi <= 150:
+        return "Unhealthy for Sensitive Groups", "orange"
+    elif aqi <= 200:
+        return "Unhealthy", "red"
+    elif aqi <= 300:
+        return "Very Unhealthy", "purple"
+    else:
+        return "Hazardous", "maroon"
+
+# ---------------- BATCH AQI ENGINE ----------------
+# OWM component key -> (AQI label, µg/m³ divisor into breakpoint units, breakpoints).
+# Order matters: it is the tie-break order for the dominant pollutant, as in the scalar path.
+POLLUTANTS = {
+    'pm2_5': ('PM2.5', None, PM25_BREAKPOINTS),
+    'pm10': ('PM10', None, PM10_BREAKPOINTS),
+    'o3': ('O3', 1.96, O3_BREAKPOINTS),
+    'no2': ('NO2', 1.88, NO2_BREAKPOINTS),
+    'so2': ('SO2', 2.62, SO2_BREAKPOINTS),
+    'co': ('CO', 1145, CO_BREAKPOINTS),
+}
+
+
+def _breakpoint_arrays(breakpoints: list) -> Tuple[np.ndarray, ...]:
+    """Column arrays (bp_low, bp_high, aqi_low, aqi_high) for np.searchsorted"""
+    return tuple(np.array(column, dtype=np.float64) for column in zip(*breakpoints))
+
+
+_BREAKPOINT_ARRAYS = {key: _breakpoint_arrays(bp) for key, (_, _, bp) in POLLUTANTS.items()}
+
+
+def calculate_aqi_batch(concentration: np.ndarray, breakpoints: Tuple[np.ndarray, ...]) -> np.ndarray:
+    """Vectorized ``calculate_aqi`` over an array of concentrations.
+
+    NaN stands for a missing (None) reading. Negative or missing readings give NaN; values
+    in a gap between bands or above the last band give 500, exactly as the scalar loop does.
+    """
+    c = np.asarray(concentration, dtype=np.float64)
+    bp_low, bp_high, aqi_low, aqi_high = breakpoints
+
+    band = np.clip(np.searchsorted(bp_low, c, side="right") - 1, 0, len(bp_low) - 1)
+    lo, hi = bp_low[band], bp_high[band]
+    in_band = (c >= lo) & (c <= hi)
+
+    # Same operation order as the scalar formula so results round identically
+    with np.errstate(invalid="ignore"):
+        interpolated = np.rint(((aqi_high[band] - aqi_low[band]) / (hi - lo)) * (c - lo) + aqi_low[band])
+    result = np.where(in_band, interpolated, 500.0)
+    return np.where(np.isnan(c) | (c < 0), np.nan, result)
+
+
+def calculate_comprehensive_aqi_batch(components: Dict[str, np.ndarray]) -> Dict[str, Any]:
+    """Vectorized ``calculate_comprehensive_aqi`` over arrays of readings.
+
+    ``components`` maps OWM keys ('pm2_5', 'pm10', 'o3', 'no2', 'so2', 'co') to equally
+    shaped arrays in µg/m³, with NaN for missing readings. Returns float arrays of
+    sub-indices and the overall AQI (NaN where nothing was valid) and an object array
+    of dominant pollutant labels (None where nothing was valid).
+    """
+    individual = {}
+    for key, (label, divisor, _) in POLLUTANTS.items():
+        if key not in components or components[key] is None:
+            continue
+        concentration = np.asarray(components[key], dtype=np.float64)
+        if divisor is not None:
+            concentration = concentration / divisor
+        individual[label] = calculate_aqi_batch(concentration, _BREAKPOINT_ARRAYS[key])
+
+    if not individual:
+        return {'overall_aqi': np.empty(0), 'dominant_pollutant': np.empty(0, dtype=object), 'individual_aqis': {}}
+
+    stacked = np.stack(np.broadcast_arrays(*individual.values()))
+    # argmax returns the first maximum, matching max(dict, key=dict.get) in insertion order
+    best = np.argmax(np.where(np.isnan(stacked), -np.inf, stacked), axis=0)
+    overall = np.take_along_axis(stacked, best[np.newaxis], axis=0)[0]
+    labels = np.array(list(individual), dtype=object)
+    dominant = np.where(np.isnan(overall), None, labels[best])
+
+    return {
+        'overall_aqi': overall,
+        'dominant_pollutant': dominant,
+        'individual_aqis': individual
+    }
@@ -0,0 +1,88 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Optional, Dict, Iterable, Callable, List
+
+from environment import ENDPOINTS, EnvironmentCache, EnvironmentSnapshot, environment_cache
+from geocode import GeocodeStore, resolve_coordinates
+from owm_client import DEFAULT_CALLS_PER_MINUTE, configure_rate_limit
+
+
+@dataclass
+class CityEnvironment:
+    """Outcome of collecting one city: a snapshot, or the reason there is none"""
+    city: str
+    lat: Optional[float] = None
+    lon: Optional[float] = None
+    snapshot: Optional[EnvironmentSnapshot] = None
+    error: Optional[str] = None
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.snapshot is not None and not self.snapshot.errors
+
+    @property
+    def has_data(self) -> bool:
+        """At least one requested endpoint returned a payload"""
+        return self.snapshot is not None and bool(self.snapshot.fetched)
+
+
+def _collect_city(city: str, api_key: str, endpoints: tuple, cache: EnvironmentCache,
+                  store: Optional[GeocodeStore], timeout: float) -> CityEnvironment:
+    started = time.perf_counter()
+    result = CityEnvironment(city=city)
+    try:
+        result.lat, result.lon = resolve_coordinates(city, api_key, store)
+        if result.lat is None or result.lon is None:
+            result.error = f"Could not determine coordinates for {city}"
+        else:
+            # Cities are already fetched in parallel; endpoints within a city go in turn
+            result.snapshot = cache.get(result.lat, result.lon, api_key, endpoints, timeout,
+                                        concurrent=False, allow_stale=False)
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def collect_environment(cities: Iterable[str], api_key: str, endpoints: tuple = ENDPOINTS,
+                        max_workers: int = 8, calls_per_minute: Optional[float] = DEFAULT_CALLS_PER_MINUTE,
+                        cache: EnvironmentCache = environment_cache, store: Optional[GeocodeStore] = None,
+                        timeout: float = 10,
+                        on_result: Optional[Callable[[CityEnvironment], None]] = None) -> Dict[str, CityEnvironment]:
+    """Fetch weather, forecast and pollution for many cities into the shared environment cache.
+
+    Work runs on ``max_workers`` threads; every HTTP call first takes a token from the API
+    key's bucket, set to ``calls_per_minute`` (None leaves the current limit in place). The
+    bucket is shared with interactive calls, so a batch spends from the same per-minute quota.
+    Endpoints still fresh in ``cache`` cost no call. ``on_result`` is invoked as each city
+    completes, from the calling thread. Results are returned in input order.
+    """
+    cities = list(dict.fromkeys(cities))
+    if calls_per_minute is not None:
+        configure_rate_limit(api_key, calls_per_minute)
+
+    results: Dict[str, CityEnvironment] = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(cities) or 1))) as pool:
+        futures = {pool.submit(_collect_city, city, api_key, endpoints, cache, store, timeout): city
+                   for city in cities}
+        for future in as_completed(futures):
+            result = future.result()
+            results[result.city] = result
+            if on_result is not None:
+                on_result(result)
+    return {city: results[city] for city in cities}
+
+
+def summarize_collection(results: Dict[str, CityEnvironment]) -> Dict[str, List[str]]:
+    """Group cities by outcome for logging or display; a city with no endpoint data has failed"""
+    summary = {"ok": [], "partial": [], "failed": []}
+    for city, result in results.items():
+        if result.ok and result.has_data:
+            summary["ok"].append(city)
+        elif result.has_data:
+            summary["partial"].append(city)
+        else:
+            summary["failed"].append(city)
+    return summary
@@ -0,0 +1,372 @@
+import multiprocessing
+import os
+import threading
+import time
+import warnings
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Optional, Dict, List, Tuple
+
+import numpy as np
+
+from analytics import MIN_PERIODS, align_series, pairwise_pearson
+from disease_cube import METRICS, DiseaseCube
+from env_archive import EnvArchive
+
+# Replicates drawn per chunk and round; intervals are re-checked after every round
+ROUND_SIZE = 200
+MAX_REPLICATES = 2000
+# A chunk stops once no interval bound moved more than this between rounds
+# (absolute for coefficients, relative to the estimate for monthly means)
+TOLERANCE = 0.01
+CONFIDENCE = 0.95
+# Series (cities) handed to a worker per task
+CHUNK_SIZE = 4
+# How often a running round checks whether its job was cancelled
+CANCEL_POLL_SECONDS = 0.1
+
+
+# ---------------- SHARED ARRAYS ----------------
+@dataclass(frozen=True)
+class SharedArray:
+    """Picklable handle to a float64 array in a shared memory block"""
+    name: str
+    shape: Tuple[int, ...]
+
+
+def _share(array: np.ndarray) -> Tuple[shared_memory.SharedMemory, SharedArray]:
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=np.float64, buffer=block.buf)[...] = array
+    return block, SharedArray(block.name, array.shape)
+
+
+def _attach(handle: SharedArray, start: int, stop: int) -> np.ndarray:
+    """Copy rows [start, stop) of a shared array out and detach again"""
+    try:
+        # The parent owns the block; keep the child's resource tracker from unlinking it (3.13+)
+        block = shared_memory.SharedMemory(name=handle.name, track=False)
+    except TypeError:
+        block = shared_memory.SharedMemory(name=handle.name)
+    try:
+        return np.array(np.ndarray(handle.shape, dtype=np.float64, buffer=block.buf)[start:stop])
+    finally:
+        block.close()
+
+
+# ---------------- WORKER ----------------
+def _chunk_seed(seed: int, kind: str, start: int, round_index: int) -> np.random.SeedSequence:
+    # Derived from the chunk and round only, so results do not depend on worker scheduling
+    return np.random.SeedSequence([seed, 0 if kind == "corr" else 1, start, round_index])
+
+
+def _bootstrap_chunk(kind: str, handles: Tuple[SharedArray, ...], start: int, stop: int, seed: int,
+                     round_index: int, replicates: int, min_periods: int) -> Tuple[str, int, np.ndarray]:
+    """One round of month-resampling replicates for series [start, stop).
+
+    ``corr``: Pearson r of (disease, variable) pairs, months resampled jointly -> (c, D, V, B).
+    ``mean``: mean monthly cases over recorded months -> (c, D, B).
+    """
+    rng = np.random.default_rng(_chunk_seed(seed, kind, start, round_index))
+    disease = _attach(handles[0], start, stop)
+    months = disease.shape[-1]
+    idx = rng.integers(0, months, size=(replicates, months))
+
+    if kind == "corr":
+        environment = _attach(handles[1], start, stop)
+        y = disease[:, :, None, idx]          # (c, D, 1, B, T)
+        x = environment[:, None, :, idx]      # (c, 1, V, B, T)
+        r, _ = pairwise_pearson(x, y, min_periods)
+        return kind, start, r.astype(np.float32)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sample = disease[:, :, idx]           # (c, D, B, T)
+        valid = np.isfinite(sample)
+        means = np.where(valid, sample, 0.0).sum(axis=-1) / valid.sum(axis=-1)
+    return kind, start, means
+
+
+# ---------------- RESULTS ----------------
+@dataclass(frozen=True)
+class BootstrapResult:
+    """Percentile intervals for correlation coefficients and per-disease monthly means"""
+    confidence: float
+    corr_cities: Tuple[str, ...]
+    mean_cities: Tuple[str, ...]
+    diseases: Tuple[str, ...]
+    variables: Tuple[str, ...]
+    r_low: np.ndarray
+    r_high: np.ndarray
+    mean: np.ndarray
+    mean_low: np.ndarray
+    mean_high: np.ndarray
+    months_recorded: np.ndarray
+    replicates: Dict[Tuple[str, int], int]
+    converged: bool
+
+    def _position(self, cities: Tuple[str, ...], city: str) -> Optional[int]:
+        lowered = [c.lower() for c in cities]
+        return lowered.index(city.lower()) if city.lower() in lowered else None
+
+    def correlation_interval(self, city: str, disease: str, variable: str) -> Tuple[float, float]:
+        c = self._position(self.corr_cities, city)
+        if c is None or disease not in self.diseases or variable not in self.variables:
+            return np.nan, np.nan
+        d, v = self.diseases.index(disease), self.variables.index(variable)
+        return float(self.r_low[c, d, v]), float(self.r_high[c, d, v])
+
+    def total_interval(self, city: str, disease: str) -> Tuple[float, float]:
+        """Interval for the all-time case total, as mean monthly cases x months recorded"""
+        c = self._position(self.mean_cities, city)
+        if c is None or disease not in self.diseases:
+            return np.nan, np.nan
+        d = self.diseases.index(disease)
+        months = self.months_recorded[c, d]
+        return float(self.mean_low[c, d] * months), float(self.mean_high[c, d] * months)
+
+
+def _percentiles(samples: np.ndarray, confidence: float) -> Tuple[np.ndarray, np.ndarray]:
+    tail = (1.0 - confidence) / 2.0 * 100.0
+    with warnings.catch_warnings():
+        # All-NaN slices (pairs with too little overlap) simply stay NaN
+        warnings.simplefilter("ignore", RuntimeWarning)
+        low, high = np.nanpercentile(samples, [tail, 100.0 - tail], axis=-1)
+    return low, high
+
+
+def _nanmean(values: np.ndarray) -> np.ndarray:
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return np.nanmean(values, axis=-1)
+
+
+def _moved(old: Tuple[np.ndarray, np.ndarray], new: Tuple[np.ndarray, np.ndarray], scale: np.ndarray) -> float:
+    """Largest change of either bound since the previous round, relative to ``scale``"""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        change = np.maximum(np.abs(new[0] - old[0]), np.abs(new[1] - old[1])) / scale
+    change = change[np.isfinite(change)]
+    return float(change.max()) if change.size else 0.0
+
+
+# ---------------- SERVICE ----------------
+class BootstrapCancelled(Exception):
+    """Raised inside a run whose job was superseded"""
+
+
+class BootstrapJob:
+    """Handle to a bootstrap run; poll ``done`` instead of waiting on it from the UI"""
+
+    def __init__(self):
+        self._done = threading.Event()
+        self._cancelled = threading.Event()
+        self.result: Optional[BootstrapResult] = None
+        self.error: Optional[str] = None
+        self.replicates_done = 0
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self) -> None:
+        """Drop queued tasks and stop; the run ends once the tasks already running finish"""
+        self._cancelled.set()
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[BootstrapResult]:
+        self._done.wait(timeout)
+        return self.result
+
+
+def archive_key(archive: EnvArchive) -> tuple:
+    """What a bootstrap run depends on in the archive: its cities, months and variables.
+
+    Observations folded into an existing month shift its mean a little but do not start a
+    new run; a new city, month or variable does.
+    """
+    return tuple(archive.cities), tuple(archive.months), tuple(archive.variables)
+
+
+class BootstrapService:
+    """Runs bootstrap jobs on a process pool, one current job per cube and archive layout.
+
+    Inputs are placed in shared memory once per job; workers copy out only their chunk.
+    Each chunk draws ``round_size`` replicates per round and stops early when its
+    intervals move less than ``tolerance``, or at ``max_replicates``.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, seed: int = 0, round_size: int = ROUND_SIZE,
+                 max_replicates: int = MAX_REPLICATES, tolerance: float = TOLERANCE,
+                 confidence: float = CONFIDENCE, chunk_size: int = CHUNK_SIZE,
+                 min_periods: int = MIN_PERIODS):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.seed = seed
+        self.round_size = round_size
+        self.max_replicates = max_replicates
+        self.tolerance = tolerance
+        self.confidence = confidence
+        self.chunk_size = chunk_size
+        self.min_periods = min_periods
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._jobs: Dict[tuple, Tuple[DiseaseCube, tuple, BootstrapJob]] = {}
+        self._lock = threading.Lock()
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # spawn: forking a process that already runs server and fetch threads is unsafe
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def submit(self, cube: DiseaseCube, archive: EnvArchive, metric: str = "Population_Affected") -> BootstrapJob:
+        """Start (or return the running/finished) job for this cube and archive without blocking.
+
+        A job for a different cube or archive layout replaces the current one, which is cancelled.
+        """
+        key = (metric,)
+        layout = archive_key(archive)
+        with self._lock:
+            existing = self._jobs.get(key)
+            if existing is not None and existing[0] is cube and existing[1] == layout:
+                return existing[2]
+            if existing is not None and not existing[2].done:
+                existing[2].cancel()
+            job = BootstrapJob()
+            self._jobs[key] = (cube, layout, job)
+        threading.Thread(target=self._run, args=(job, cube, archive, metric),
+                         name="bootstrap", daemon=True).start()
+        return job
+
+    def current(self, metric: str = "Population_Affected") -> Optional[BootstrapJob]:
+        """The job most recently submitted for ``metric``, if any"""
+        with self._lock:
+            existing = self._jobs.get((metric,))
+            return existing[2] if existing is not None else None
+
+    def _run(self, job: BootstrapJob, cube: DiseaseCube, archive: EnvArchive, metric: str) -> None:
+        blocks: List[shared_memory.SharedMemory] = []
+        try:
+            job.result = self._bootstrap(job, cube, archive, metric, blocks)
+        except BootstrapCancelled:
+            pass
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+            job.finished_at = time.time()
+            job._done.set()
+
+    def _bootstrap(self, job: BootstrapJob, cube: DiseaseCube, archive: EnvArchive, metric: str,
+                   blocks: List[shared_memory.SharedMemory]) -> BootstrapResult:
+        # Per-disease series for every cube city, and the archive-aligned arrays for correlation
+        recorded = np.asarray(cube.counts) > 0
+        series = np.where(recorded, np.asarray(cube.values[..., METRICS.index(metric)], dtype=np.float64), np.nan)
+        aligned_disease, aligned_env, corr_cities, _ = align_series(cube, archive, metric)
+
+        handles = {}
+        for name, array in (("series", series), ("disease", aligned_disease), ("env", aligned_env)):
+            block, handle = _share(array)
+            blocks.append(block)
+            handles[name] = handle
+
+        chunks = [("mean", start, min(start + self.chunk_size, series.shape[0]))
+                  for start in range(0, series.shape[0], self.chunk_size)]
+        if aligned_env.shape[1]:
+            chunks += [("corr", start, min(start + self.chunk_size, len(corr_cities)))
+                       for start in range(0, len(corr_cities), self.chunk_size)]
+        task_handles = {"mean": (handles["series"],), "corr": (handles["disease"], handles["env"])}
+
+        samples: Dict[Tuple[str, int], List[np.ndarray]] = {(kind, start): [] for kind, start, _ in chunks}
+        bounds: Dict[Tuple[str, int], Tuple[np.ndarray, np.ndarray]] = {}
+        active = list(chunks)
+        pool = self._executor()
+        round_index = 0
+        while active and round_index * self.round_size < self.max_replicates:
+            futures = []
+            try:
+                for kind, start, stop in active:
+                    if job.cancelled:
+                        raise BootstrapCancelled()
+                    futures.append(pool.submit(_bootstrap_chunk, kind, task_handles[kind], start, stop,
+                                               self.seed, round_index, self.round_size, self.min_periods))
+                pending = set(futures)
+                while pending:
+                    done, pending = wait(pending, timeout=CANCEL_POLL_SECONDS, return_when=FIRST_COMPLETED)
+                    if job.cancelled:
+                        raise BootstrapCancelled()
+                    for future in done:
+                        kind, start, values = future.result()
+                        samples[(kind, start)].append(values)
+                        job.replicates_done += self.round_size
+            finally:
+                # Drop queued tasks (superseded job or failed chunk), but let running ones finish:
+                # they may still be attached to the shared blocks that _run unlinks afterwards
+                for future in futures:
+                    future.cancel()
+                wait(futures)
+
+            still_active = []
+            for kind, start, stop in active:
+                new = _percentiles(np.concatenate(samples[(kind, start)], axis=-1), self.confidence)
+                old = bounds.get((kind, start))
+                bounds[(kind, start)] = new
+                if kind == "corr":
+                    scale = np.ones_like(new[0])
+                else:
+                    scale = np.abs(_nanmean(series[start:stop]))
+                if old is None or _moved(old, new, scale) >= self.tolerance:
+                    still_active.append((kind, start, stop))
+            active = still_active
+            round_index += 1
+
+        def stitch(kind: str, shape: tuple) -> Tuple[np.ndarray, np.ndarray]:
+            low, high = np.full(shape, np.nan), np.full(shape, np.nan)
+            for chunk_kind, start, stop in chunks:
+                if chunk_kind == kind:
+                    low[start:stop], high[start:stop] = bounds[(kind, start)]
+            return low, high
+
+        r_low, r_high = stitch("corr", aligned_env.shape[:1] + (len(cube.diseases), aligned_env.shape[1]))
+        mean_low, mean_high = stitch("mean", series.shape[:2])
+        return BootstrapResult(
+            confidence=self.confidence,
+            corr_cities=corr_cities,
+            mean_cities=tuple(cube.cities),
+            diseases=tuple(cube.diseases),
+            variables=tuple(archive.variables),
+            r_low=r_low,
+            r_high=r_high,
+            mean=_nanmean(series),
+            mean_low=mean_low,
+            mean_high=mean_high,
+            months_recorded=recorded.sum(axis=-1),
+            replicates={(kind, start): sum(s.shape[-1] for s in samples[(kind, start)])
+                        for kind, start, _ in chunks},
+            converged=not active,
+        )
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+_service: Optional[BootstrapService] = None
+_service_lock = threading.Lock()
+
+
+def get_bootstrap_service() -> BootstrapService:
+    """Process-wide service so every session shares one pool and one job per dataset"""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = BootstrapService()
+        return _service
@@ -0,0 +1,357 @@
+import functools
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, List, Tuple, Iterable, Callable, Any
+
+import numpy as np
+
+from aqi import get_aqi_category
+from analytics import AnomalyResult
+from disease_cube import METRICS, DiseaseCube
+
+# Typical width of a full-width chart in the wide layout, and the density worth sending
+CHART_WIDTH_PX = 1100
+PIXELS_PER_POINT = 2
+
+
+# ---------------- DOWNSAMPLING ----------------
+def point_budget(width_px: int = CHART_WIDTH_PX, pixels_per_point: float = PIXELS_PER_POINT) -> int:
+    """Points a line chart of ``width_px`` can actually show"""
+    return max(3, int(width_px / pixels_per_point))
+
+
+def lttb_indices(y: np.ndarray, threshold: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets over evenly spaced points; returns kept positions.
+
+    Keeps the first and last point and, from each of ``threshold - 2`` buckets, the point
+    forming the largest triangle with the previous pick and the next bucket's average.
+    NaN points are treated as 0 for selection only.
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    values = np.nan_to_num(np.asarray(y, dtype=np.float64))
+    edges = np.floor(np.linspace(1, n - 1, threshold - 1)).astype(np.int64)
+
+    picked = np.empty(threshold, dtype=np.int64)
+    picked[0], picked[-1] = 0, n - 1
+    previous = 0
+    for b in range(threshold - 2):
+        start, stop = edges[b], max(edges[b + 1], edges[b] + 1)
+        # Average of the following bucket (the last point for the final bucket)
+        next_stop = edges[b + 2] if b + 2 < len(edges) else n
+        next_start = stop if stop < n else n - 1
+        avg_x = (next_start + max(next_stop, next_start + 1) - 1) / 2.0
+        avg_y = values[next_start:max(next_stop, next_start + 1)].mean()
+
+        xs = np.arange(start, stop)
+        area = np.abs((previous - avg_x) * (values[xs] - values[previous])
+                      - (previous - xs) * (avg_y - values[previous]))
+        previous = int(xs[area.argmax()])
+        picked[b + 1] = previous
+    return picked
+
+
+def downsample(labels: List[str], series: Dict[str, List[Optional[float]]], budget: int,
+               keep: Iterable[str] = ()) -> Tuple[List[str], Dict[str, List[Optional[float]]]]:
+    """Thin a category-axis chart to about ``budget`` x positions.
+
+    Each series gets an equal share of the budget through LTTB and the union of picks is
+    kept, so all series stay on one shared axis. Labels in ``keep`` (e.g. flagged months)
+    are never dropped.
+    """
+    if len(labels) <= budget or not series:
+        return list(labels), {name: list(values) for name, values in series.items()}
+    share = max(3, budget // len(series))
+    chosen = set()
+    for values in series.values():
+        as_array = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+        chosen.update(lttb_indices(as_array, share).tolist())
+    position = {label: i for i, label in enumerate(labels)}
+    chosen.update(position[label] for label in keep if label in position)
+    kept = sorted(chosen)
+    return [labels[i] for i in kept], {name: [values[i] for i in kept] for name, values in series.items()}
+
+
+def clip_range(labels: List[str], series: Dict[str, List[Optional[float]]],
+               label_range: Optional[Tuple[str, str]]) -> Tuple[List[str], Dict[str, List[Optional[float]]]]:
+    """Restrict a chart to labels within ``label_range`` (inclusive); None keeps everything"""
+    if label_range is None:
+        return list(labels), series
+    start, end = label_range
+    kept = [i for i, label in enumerate(labels) if start <= label <= end]
+    return [labels[i] for i in kept], {name: [values[i] for i in kept] for name, values in series.items()}
+
+
+# ---------------- OPTION CACHE ----------------
+class OptionCache:
+    """LRU of built echarts options, valid while the same source objects are current"""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, Tuple[tuple, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key: tuple, sources: tuple, build: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and len(entry[0]) == len(sources) and all(a is b for a, b in zip(entry[0], sources)):
+                self._entries.move_to_end(key)
+                return entry[1]
+        option = build()
+        with self._lock:
+            self._entries[key] = (sources, option)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return option
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+option_cache = OptionCache()
+
+
+def input_digest(inputs: Any) -> str:
+    """Stable hash of JSON-like chart inputs"""
+    payload = json.dumps(inputs, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def memoized_option(build: Callable[..., Dict[str, Any]]) -> Callable[..., Dict[str, Any]]:
+    """Cache a builder's option by a hash of its (JSON-like) arguments.
+
+    The returned dict is shared between reruns and sessions and must not be mutated.
+    """
+    @functools.wraps(build)
+    def wrapper(*args):
+        return option_cache.get_or_build((build.__name__, input_digest(args)), (), lambda: build(*args))
+    return wrapper
+
+
+# ---------------- TREND OPTIONS ----------------
+def _markers(labels: List[str], values: List[Optional[float]], flagged: Dict[str, float]) -> Dict[str, Any]:
+    points = [{"coord": [label, value], "value": f"z {flagged[label]:.1f}"}
+              for label, value in zip(labels, values) if label in flagged and value is not None]
+    return {"symbol": "pin", "itemStyle": {"color": "#F44336"}, "data": points}
+
+
+def trend_option(labels: List[str], series: Dict[str, List[Optional[float]]], budget: int,
+                 flags: Optional[Dict[str, Dict[str, float]]] = None,
+                 label_range: Optional[Tuple[str, str]] = None, smooth: bool = False,
+                 projection: Optional[Dict[str, Any]] = None, projection_anchor: Optional[str] = None) -> Dict[str, Any]:
+    """Multi-line trend chart, clipped to ``label_range`` and downsampled to ``budget`` points.
+
+    ``flags`` maps series name -> {label: z} for anomaly pins. ``projection`` (``months`` and
+    ``forecast``) is drawn dashed after the history, joined to ``projection_anchor``'s last value.
+    """
+    flags = flags or {}
+    labels, series = clip_range(labels, series, label_range)
+    flagged = {label for marks in flags.values() for label in marks}
+    labels, series = downsample(labels, series, budget, keep=flagged)
+
+    future = projection["months"] if projection else []
+    padding = [None] * len(future)
+    lines = [
+        {"name": name, "type": "line", "smooth": smooth, "data": values + padding,
+         "markPoint": _markers(labels, values, flags.get(name, {}))}
+        for name, values in series.items()
+    ]
+    if projection and projection_anchor in series and labels:
+        lines.append({"name": "Projected Cases", "type": "line", "lineStyle": {"type": "dashed"},
+                      "data": [None] * (len(labels) - 1) + [series[projection_anchor][-1]] + list(projection["forecast"])})
+    return {
+        "tooltip": {"trigger": "axis"},
+        "legend": {"data": [line["name"] for line in lines]},
+        "xAxis": {"type": "category", "data": labels + future},
+        "yAxis": {"type": "value"},
+        "series": lines,
+    }
+
+
+# ---------------- DISEASE CHARTS ----------------
+def disease_trend_chart(cube: DiseaseCube, anomalies: Optional[AnomalyResult], city: str, disease: str,
+                        budget: int, projection: Optional[Dict[str, Any]] = None,
+                        zoom: Optional[Tuple[str, str]] = None) -> Dict[str, Any]:
+    """Affected / deaths / survived per month for one series, with anomaly pins and projection"""
+    projection_key = (tuple(projection["months"]), tuple(projection["forecast"])) if projection else None
+
+    def build() -> Dict[str, Any]:
+        months, monthly = cube.monthly(city, disease)
+        flags = anomalies.series_flags(city, disease) if anomalies is not None else {}
+        return trend_option(
+            months,
+            {
+                "Population Affected": monthly[:, METRICS.index("Population_Affected")].tolist(),
+                "Deaths": monthly[:, METRICS.index("Number_of_Deaths")].tolist(),
+                "Survived": monthly[:, METRICS.index("Survived")].tolist(),
+            },
+            budget,
+            flags={"Population Affected": flags},
+            label_range=zoom,
+            # The projection continues the full history only, not a zoomed window
+            projection=projection if zoom is None or (months and zoom[1] == months[-1]) else None,
+            projection_anchor="Population Affected",
+        )
+
+    return option_cache.get_or_build(("disease", city.lower(), disease, zoom, budget, projection_key),
+                                     (cube, anomalies), build)
+
+
+def city_trend_chart(cube: DiseaseCube, anomalies: Optional[AnomalyResult], city: str, budget: int,
+                     zoom: Optional[Tuple[str, str]] = None) -> Dict[str, Any]:
+    """Monthly population affected for every disease recorded in a city"""
+    def build() -> Dict[str, Any]:
+        months, series = cube.city_monthly(city)
+        flags = {dis: anomalies.series_flags(city, dis) for dis in series} if anomalies is not None else {}
+        return trend_option(months, series, budget, flags=flags, label_range=zoom, smooth=True)
+
+    return option_cache.get_or_build(("city_trend", city.lower(), zoom, budget), (cube, anomalies), build)
+
+
+def precompute_disease_charts(cube: DiseaseCube, anomalies: Optional[AnomalyResult],
+                              forecasts: Dict[Tuple[str, str], Dict[str, Any]], budget: int) -> int:
+    """Build the unzoomed disease-side charts for every city so reruns only look them up.
+
+    Returns the number of options built or found; already-cached ones cost a dict lookup.
+    """
+    built = 0
+    for city in cube.cities:
+        city_trend_chart(cube, anomalies, city, budget)
+        built += 1
+        for disease in cube.diseases_for(city):
+            disease_trend_chart(cube, anomalies, city, disease, budget, forecasts.get((city, disease)))
+            built += 1
+    return built
+
+
+# ---------------- LIVE CHARTS ----------------
+@memoized_option
+def weather_trend_option(times: List[str], temperatures: List[float], humidities: List[float]) -> Dict[str, Any]:
+    return {
+        "tooltip": {"trigger": "axis"},
+        "legend": {"data": ["Temperature (°C)", "Humidity (%)"]},
+        "xAxis": {"type": "category", "data": times},
+        "yAxis": {"type": "value"},
+        "series": [
+            {"name": "Temperature (°C)", "type": "line", "data": temperatures},
+            {"name": "Humidity (%)", "type": "line", "data": humidities}
+        ]
+    }
+
+
+@memoized_option
+def distribution_pie_option(name: str, counts: Dict[str, int], colors: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    data = []
+    for label, value in counts.items():
+        item = {"value": value, "name": label}
+        if colors:
+            item["itemStyle"] = {"color": colors[label]}
+        data.append(item)
+    return {
+        "tooltip": {"trigger": "item"},
+        "series": [{"name": name, "type": "pie", "radius": "50%", "data": data}]
+    }
+
+
+@memoized_option
+def aqi_bar_option(individual_aqis: Dict[str, int]) -> Dict[str, Any]:
+    # One colour per bar from its AQI category
+    bar_data = [{"value": aqi_val, "itemStyle": {"color": get_aqi_category(aqi_val)[1]}}
+                for aqi_val in individual_aqis.values()]
+    return {
+        "tooltip": {"trigger": "axis", "formatter": "{b}: {c} AQI"},
+        "xAxis": {"type": "category", "data": list(individual_aqis)},
+        "yAxis": {"type": "value", "name": "AQI"},
+        "series": [{"type": "bar", "data": bar_data}]
+    }
+
+
+@memoized_option
+def aqi_gauge_option(calculated_aqi: int) -> Dict[str, Any]:
+    return {
+        "tooltip": {"formatter": "{a} <br/>{b} : {c}"},
+        "series": [{
+            "name": "Calculated AQI",
+            "type": "gauge",
+            "min": 0,
+            "max": 500,
+            "detail": {"formatter": f"{calculated_aqi}"},
+            "data": [{"value": calculated_aqi, "name": "AQI"}],
+            "axisLine": {
+                "lineStyle": {
+                    "color": [
+                        [0.1, "#4CAF50"],   # Good
+                        [0.2, "#FFEB3B"],   # Moderate
+                        [0.3, "#FF9800"],   # Unhealthy for Sensitive
+                        [0.4, "#F44336"],   # Unhealthy
+                        [0.6, "#9C27B0"],   # Very Unhealthy
+                        [1, "#8B0000"]      # Hazardous
+                    ]
+                }
+            }
+        }]
+    }
+
+
+@memoized_option
+def risk_level_bar_option(diseases: List[str], risks: List[str], color_map: Dict[str, str]) -> Dict[str, Any]:
+    risk_values = [3 if r == "High" else 2 if r == "Moderate" else 1 for r in risks]
+    return {
+        "tooltip": {"trigger": "axis"},
+        "xAxis": {"type": "category", "data": diseases},
+        "yAxis": {"type": "value", "max": 3, "min": 0, "interval": 1, "axisLabel": {"show": True}},
+        "series": [{
+            "name": "Risk Level",
+            "type": "bar",
+            "data": [{"value": val, "itemStyle": {"color": color_map[risk]}}
+                     for val, risk in zip(risk_values, risks)],
+            "label": {"show": True, "position": "top"}
+        }]
+    }
+
+
+@memoized_option
+def risk_score_option(diseases: List[str], percentages: List[float], risks: List[str],
+                      color_map: Dict[str, str]) -> Dict[str, Any]:
+    return {
+        "tooltip": {"trigger": "axis"},
+        "xAxis": {"type": "category", "data": diseases},
+        "yAxis": {"type": "value", "name": "Risk Percentage (%)"},
+        "series": [{
+            "name": "Risk Score",
+            "type": "bar",
+            "data": [{"value": score, "itemStyle": {"color": color_map[risk]}}
+                     for score, risk in zip(percentages, risks)],
+            "label": {"show": True, "position": "top", "formatter": "{c}%"}
+        }]
+    }
+
+
+@memoized_option
+def risk_radar_option(diseases: List[str], percentages: List[float]) -> Dict[str, Any]:
+    return {
+        "tooltip": {},
+        "legend": {"data": ["Risk Percentage"]},
+        "radar": {"indicator": [{"name": disease, "max": 100} for disease in diseases]},
+        "series": [{
+            "name": "Risk Assessment",
+            "type": "radar",
+            "data": [{"value": percentages, "name": "Risk Percentage"}]
+        }]
+    }
+
+
+@memoized_option
+def risk_timeline_option(step_labels: List[str], percentages: Dict[str, List[float]]) -> Dict[str, Any]:
+    return {
+        "tooltip": {"trigger": "axis"},
+        "legend": {"data": list(percentages)},
+        "xAxis": {"type": "category", "data": step_labels},
+        "yAxis": {"type": "value", "name": "Risk Percentage (%)", "max": 100},
+        "series": [{"name": dis, "type": "line", "data": values} for dis, values in percentages.items()]
+    }
@@ -0,0 +1,187 @@
+import json
+import os
+from typing import Optional, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from disease_data import CACHE_DIR_NAME, COUNT_COLUMNS, load_disease_frame, source_fingerprint
+
+# Axis order of the cube: city x disease x month x metric
+METRICS = tuple(COUNT_COLUMNS)
+CUBE_VERSION = 2
+
+
+# ---------------- BUILD ----------------
+def build_cube(df: pd.DataFrame) -> Dict[str, object]:
+    """Aggregate the disease frame into dense city x disease x month arrays.
+
+    ``values`` holds the monthly sum of every metric and ``counts`` the number of source
+    rows per cell, so months without records can be told apart from months with zero cases.
+    Rows without a city, disease or parsable date are left out; unparsable counts add zero.
+    """
+    df = df[df["City"].notna() & df["Disease"].notna() & df["Date"].notna()]
+    cities = sorted(df["City"].astype(str).unique().tolist())
+    diseases = sorted(df["Disease"].astype(str).unique().tolist())
+    month_index = (df["Date"].dt.year * 12 + df["Date"].dt.month - 1).to_numpy(dtype=np.int64)
+    if len(month_index):
+        first = int(month_index.min())
+        months = pd.period_range(pd.Period(year=first // 12, month=first % 12 + 1, freq="M"),
+                                 periods=int(month_index.max()) - first + 1, freq="M")
+    else:
+        first, months = 0, pd.PeriodIndex([], freq="M")
+
+    city_codes = pd.Categorical(df["City"].astype(str), categories=cities).codes.astype(np.int64)
+    disease_codes = pd.Categorical(df["Disease"].astype(str), categories=diseases).codes.astype(np.int64)
+    month_codes = month_index - first
+
+    shape = (len(cities), len(diseases), len(months))
+    cells = int(np.prod(shape))
+    flat = np.ravel_multi_index((city_codes, disease_codes, month_codes), shape)
+
+    values = np.empty(shape + (len(METRICS),), dtype=np.int64)
+    for m, metric in enumerate(METRICS):
+        weights = np.nan_to_num(df[metric].to_numpy(dtype=np.float64, na_value=np.nan), nan=0.0)
+        values[..., m] = np.bincount(flat, weights=weights, minlength=cells).reshape(shape).astype(np.int64)
+    counts = np.bincount(flat, minlength=cells).reshape(shape).astype(np.int32)
+
+    return {
+        "values": values,
+        "counts": counts,
+        "cities": cities,
+        "diseases": diseases,
+        "months": [p.start_time.strftime("%Y-%m-%d") for p in months],
+    }
+
+
+def _cube_dir(file_path: str, out_dir: Optional[str] = None) -> str:
+    if out_dir is not None:
+        return out_dir
+    source = os.path.abspath(file_path)
+    stem = os.path.splitext(os.path.basename(source))[0]
+    return os.path.join(os.path.dirname(source), CACHE_DIR_NAME, f"{stem}_cube")
+
+
+def _save_array(path: str, array: np.ndarray) -> None:
+    tmp_path = f"{path}.tmp.npy"
+    np.save(tmp_path, array)
+    os.replace(tmp_path, path)
+
+
+def ingest_cube(file_path: str, out_dir: Optional[str] = None, frame: Optional[pd.DataFrame] = None) -> str:
+    """Build the cube from the CSV and write it as memory-mappable .npy files plus axis labels"""
+    out_dir = _cube_dir(file_path, out_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    fingerprint = source_fingerprint(file_path)
+    cube = build_cube(frame if frame is not None else load_disease_frame(file_path))
+
+    _save_array(os.path.join(out_dir, "values.npy"), cube["values"])
+    _save_array(os.path.join(out_dir, "counts.npy"), cube["counts"])
+    labels = {
+        "version": CUBE_VERSION,
+        "source": fingerprint,
+        "cities": cube["cities"],
+        "diseases": cube["diseases"],
+        "months": cube["months"],
+        "metrics": list(METRICS),
+    }
+    tmp_path = os.path.join(out_dir, "labels.json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        json.dump(labels, fh)
+    os.replace(tmp_path, os.path.join(out_dir, "labels.json"))
+    return out_dir
+
+
+# ---------------- LOOKUP ----------------
+class DiseaseCube:
+    """Read-only view over the memory-mapped historical cube"""
+
+    def __init__(self, values: np.ndarray, counts: np.ndarray, cities: List[str],
+                 diseases: List[str], months: List[str]):
+        self.values = values
+        self.counts = counts
+        self.cities = list(cities)
+        self.diseases = list(diseases)
+        self.months = list(months)
+        self._city_pos = {c.lower(): i for i, c in enumerate(self.cities)}
+        self._disease_pos = {d: i for i, d in enumerate(self.diseases)}
+        self._metric_pos = {m: i for i, m in enumerate(METRICS)}
+
+    @classmethod
+    def open(cls, cube_dir: str) -> "DiseaseCube":
+        with open(os.path.join(cube_dir, "labels.json"), "r", encoding="utf-8") as fh:
+            labels = json.load(fh)
+        values = np.load(os.path.join(cube_dir, "values.npy"), mmap_mode="r")
+        counts = np.load(os.path.join(cube_dir, "counts.npy"), mmap_mode="r")
+        return cls(values, counts, labels["cities"], labels["diseases"], labels["months"])
+
+    def has_city(self, city: str) -> bool:
+        return city.lower() in self._city_pos
+
+    def diseases_for(self, city: str) -> List[str]:
+        """Diseases with at least one record for the city"""
+        c = self._city_pos.get(city.lower())
+        if c is None:
+            return []
+        present = self.counts[c].sum(axis=1) > 0
+        return [d for d, keep in zip(self.diseases, present) if keep]
+
+    def totals(self, city: str, disease: str) -> Dict[str, int]:
+        """All-time sum of every metric for one (city, disease) pair"""
+        c, d = self._city_pos.get(city.lower()), self._disease_pos.get(disease)
+        if c is None or d is None:
+            return {m: 0 for m in METRICS}
+        sums = self.values[c, d].sum(axis=0)
+        return {m: int(v) for m, v in zip(METRICS, sums)}
+
+    def city_totals(self, city: str, metric: str = "Population_Affected") -> Dict[str, int]:
+        """All-time sum of one metric per disease recorded for the city"""
+        c = self._city_pos.get(city.lower())
+        if c is None:
+            return {}
+        sums = self.values[c, :, :, self._metric_pos[metric]].sum(axis=1)
+        present = self.counts[c].sum(axis=1) > 0
+        return {d: int(v) for d, v, keep in zip(self.diseases, sums, present) if keep}
+
+    def monthly(self, city: str, disease: str) -> Tuple[List[str], np.ndarray]:
+        """Month labels and a (months x metrics) array for the months that have records"""
+        c, d = self._city_pos.get(city.lower()), self._disease_pos.get(disease)
+        if c is None or d is None:
+            return [], np.empty((0, len(METRICS)), dtype=np.int64)
+        present = np.flatnonzero(self.counts[c, d] > 0)
+        return [self.months[i] for i in present], np.asarray(self.values[c, d, present])
+
+    def city_monthly(self, city: str, metric: str = "Population_Affected") -> Tuple[List[str], Dict[str, List[int]]]:
+        """Month labels shared by the city's diseases and one value list per disease"""
+        c = self._city_pos.get(city.lower())
+        if c is None:
+            return [], {}
+        present_months = np.flatnonzero(self.counts[c].sum(axis=0) > 0)
+        block = self.values[c][:, present_months, self._metric_pos[metric]]
+        diseases_present = self.counts[c].sum(axis=1) > 0
+        series = {d: block[i].tolist() for i, d in enumerate(self.diseases) if diseases_present[i]}
+        return [self.months[i] for i in present_months], series
+
+
+def load_cube(file_path: str, out_dir: Optional[str] = None, frame: Optional[pd.DataFrame] = None) -> DiseaseCube:
+    """Open the cube for a CSV, re-ingesting first if the CSV changed since it was built.
+
+    ``frame`` may pass an already-loaded disease frame to skip reading it again on ingest.
+    """
+    cube_dir = _cube_dir(file_path, out_dir)
+    labels_path = os.path.join(cube_dir, "labels.json")
+    try:
+        with open(labels_path, "r", encoding="utf-8") as fh:
+            labels = json.load(fh)
+        stale = (labels.get("version") != CUBE_VERSION
+                 or labels.get("source") != source_fingerprint(file_path))
+    except (OSError, ValueError):
+        stale = True
+    if stale:
+        try:
+            ingest_cube(file_path, cube_dir, frame)
+        except OSError:
+            # Unwritable cache directory: keep the cube in memory for this process
+            cube = build_cube(frame if frame is not None else load_disease_frame(file_path))
+            return DiseaseCube(cube["values"], cube["counts"], cube["cities"], cube["diseases"], cube["months"])
+    return DiseaseCube.open(cube_dir)
@@ -0,0 +1,210 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, Tuple
+
+import pandas as pd
+
+# ---------------- SCHEMA ----------------
+REQUIRED_COLUMNS = ["City", "Disease", "Date", "Population_Affected",
+                    "Number_of_Deaths", "Survived", "Doctors_Available",
+                    "Hospitals_Available"]
+
+CATEGORY_COLUMNS = ["City", "State", "Disease"]
+
+COUNT_COLUMNS = ["Population_Affected", "Number_of_Deaths", "Survived",
+                 "Doctors_Available", "Hospitals_Available"]
+
+# Bump when the on-disk layout or dtype handling changes so old caches are rebuilt
+CACHE_VERSION = 1
+CACHE_DIR_NAME = ".disease_cache"
+
+
+# ---------------- CSV PARSING ----------------
+def read_disease_csv(file_path: str) -> pd.DataFrame:
+    """Parse the disease CSV into a typed frame (categorical labels, datetime dates, downcast counts)"""
+    df = pd.read_csv(file_path)
+    return normalize_disease_frame(df)
+
+
+def normalize_disease_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Apply the dashboard's column dtypes to a raw disease frame"""
+    df = df.copy()
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    if "Date" in df.columns:
+        df["Date"] = pd.to_datetime(df["Date"], errors="coerce")
+    for col in COUNT_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce", downcast="integer")
+    return df
+
+
+# ---------------- COLUMNAR CACHE ----------------
+def _file_sha256(file_path: str, chunk_size: int = 1 << 20) -> str:
+    """Hash a file in chunks so large CSVs are not read into memory at once"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _cache_paths(file_path: str, cache_dir: Optional[str] = None) -> Dict[str, str]:
+    """Locate the Parquet file and its metadata sidecar for a given CSV"""
+    source = os.path.abspath(file_path)
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(source), CACHE_DIR_NAME)
+    stem = os.path.splitext(os.path.basename(source))[0]
+    return {
+        "dir": cache_dir,
+        "data": os.path.join(cache_dir, f"{stem}.parquet"),
+        "meta": os.path.join(cache_dir, f"{stem}.meta.json"),
+    }
+
+
+def _read_meta(meta_path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(meta_path, "r", encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(meta_path: str, meta: Dict[str, Any]) -> None:
+    tmp_path = f"{meta_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        json.dump(meta, fh)
+    os.replace(tmp_path, meta_path)
+
+
+def source_fingerprint(file_path: str) -> Dict[str, Any]:
+    """Cheap size/mtime fingerprint of the source CSV"""
+    stat = os.stat(file_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def cached_fingerprint(file_path: str, cache_dir: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Fingerprint recorded with the current columnar cache, if one exists"""
+    return _read_meta(_cache_paths(file_path, cache_dir)["meta"])
+
+
+def load_disease_frame(file_path: str, cache_dir: Optional[str] = None) -> pd.DataFrame:
+    """Load the disease dataset, parsing the CSV only when its contents changed.
+
+    The typed frame is stored as Parquet next to the CSV. The cache is reused while the
+    CSV's size and mtime match; when only the mtime moved, the content hash decides.
+    """
+    paths = _cache_paths(file_path, cache_dir)
+    fingerprint = source_fingerprint(file_path)
+    meta = _read_meta(paths["meta"])
+
+    if meta and meta.get("version") == CACHE_VERSION and os.path.exists(paths["data"]):
+        same_stat = (meta.get("size") == fingerprint["size"]
+                     and meta.get("mtime_ns") == fingerprint["mtime_ns"])
+        if same_stat:
+            try:
+                return pd.read_parquet(paths["data"])
+            except Exception:
+                pass
+        elif meta.get("size") == fingerprint["size"]:
+            # Touched but possibly unchanged: compare contents before re-parsing
+            sha256 = _file_sha256(file_path)
+            if meta.get("sha256") == sha256:
+                try:
+                    df = pd.read_parquet(paths["data"])
+                    _write_meta(paths["meta"], {**meta, **fingerprint})
+                    return df
+                except Exception:
+                    pass
+
+    df = read_disease_csv(file_path)
+    try:
+        os.makedirs(paths["dir"], exist_ok=True)
+        tmp_data = f"{paths['data']}.tmp"
+        df.to_parquet(tmp_data, index=False)
+        os.replace(tmp_data, paths["data"])
+        _write_meta(paths["meta"], {
+            "version": CACHE_VERSION,
+            "sha256": _file_sha256(file_path),
+            **fingerprint,
+        })
+    except (OSError, ImportError, ValueError):
+        # A read-only checkout or missing Parquet engine only costs the cache, not the data
+        pass
+    return df
+
+
+# ---------------- SHARED IN-PROCESS STORE ----------------
+@dataclass(frozen=True)
+class DiseaseDataset:
+    """Immutable bundle of the disease frame and everything derived from it at load time"""
+    frame: pd.DataFrame
+    cities: Tuple[str, ...]
+    cube: Any = None
+    fingerprint: Dict[str, Any] = field(default_factory=dict)
+    loaded_at: float = 0.0
+
+
+_store: Dict[str, DiseaseDataset] = {}
+_store_lock = threading.Lock()
+
+
+def build_dataset(file_path: str, cache_dir: Optional[str] = None) -> DiseaseDataset:
+    """Load the frame and build the memory-mapped cube from it"""
+    from disease_cube import load_cube
+
+    fingerprint = source_fingerprint(file_path)
+    df = load_disease_frame(file_path, cache_dir)
+    cities = tuple(sorted(df["City"].unique().tolist())) if "City" in df.columns else ()
+    has_schema = not df.empty and all(col in df.columns for col in REQUIRED_COLUMNS)
+    cube = load_cube(file_path, frame=df) if has_schema else None
+    return DiseaseDataset(frame=df, cities=cities, cube=cube,
+                          fingerprint=fingerprint, loaded_at=time.time())
+
+
+def get_shared_dataset(file_path: str, cache_dir: Optional[str] = None) -> DiseaseDataset:
+    """Return the process-wide dataset for a CSV, loading it on first use.
+
+    Every caller (all Streamlit sessions and reruns in this process) receives the same
+    object, so memory does not grow with the number of sessions. Callers must treat the
+    frame as read-only; with pandas copy-on-write, slices taken from it stay views.
+    """
+    key = os.path.abspath(file_path)
+    dataset = _store.get(key)
+    if dataset is not None:
+        return dataset
+    with _store_lock:
+        dataset = _store.get(key)
+        if dataset is None:
+            dataset = build_dataset(file_path, cache_dir)
+            _store[key] = dataset
+        return dataset
+
+
+def invalidate_shared_dataset(file_path: Optional[str] = None) -> None:
+    """Drop one dataset (or all of them) so the next access reloads from disk"""
+    with _store_lock:
+        if file_path is None:
+            _store.clear()
+        else:
+            _store.pop(os.path.abspath(file_path), None)
+
+
+def revalidate_shared_dataset(file_path: str) -> bool:
+    """Reload a dataset only if its CSV changed on disk; returns True when it was dropped"""
+    key = os.path.abspath(file_path)
+    dataset = _store.get(key)
+    if dataset is None:
+        return False
+    try:
+        changed = source_fingerprint(file_path) != dataset.fingerprint
+    except OSError:
+        changed = True
+    if changed:
+        invalidate_shared_dataset(file_path)
+    return changed
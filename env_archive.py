@@ -0,0 +1,171 @@
+import csv
+import os
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from disease_data import source_fingerprint
+from environment import EnvironmentSnapshot
+
+# Observations are appended here; monthly means are derived on load
+DEFAULT_ARCHIVE_PATH = "env_archive.csv"
+
+# Columns recognised in the archive, in display order; any subset may be present
+ARCHIVE_VARIABLES = (
+    "temp", "humidity", "pressure", "rain", "wind_speed",
+    "aqi", "pm2_5", "pm10", "o3", "no2", "so2", "co",
+)
+
+VARIABLE_LABELS = {
+    "temp": "Temperature (°C)",
+    "humidity": "Humidity (%)",
+    "pressure": "Pressure (hPa)",
+    "rain": "Rainfall (mm/h)",
+    "wind_speed": "Wind Speed (m/s)",
+    "aqi": "AQI",
+    "pm2_5": "PM2.5 (μg/m³)",
+    "pm10": "PM10 (μg/m³)",
+    "o3": "O₃ (μg/m³)",
+    "no2": "NO₂ (μg/m³)",
+    "so2": "SO₂ (μg/m³)",
+    "co": "CO (μg/m³)",
+}
+
+
+# ---------------- MONTHLY ARCHIVE ----------------
+@dataclass(frozen=True)
+class EnvArchive:
+    """Monthly environmental history as a dense city x month x variable array (NaN = no data)"""
+    values: np.ndarray
+    cities: Tuple[str, ...]
+    months: Tuple[str, ...]
+    variables: Tuple[str, ...]
+
+    @property
+    def empty(self) -> bool:
+        return not np.isfinite(self.values).any()
+
+    def city_position(self, city: str) -> Optional[int]:
+        lowered = city.lower()
+        for i, name in enumerate(self.cities):
+            if name.lower() == lowered:
+                return i
+        return None
+
+
+def monthly_archive(observations: pd.DataFrame) -> EnvArchive:
+    """Average raw observations (City, Date, <variables>) into one value per city and month"""
+    variables = tuple(v for v in ARCHIVE_VARIABLES if v in observations.columns)
+    if observations.empty or not variables:
+        return EnvArchive(np.empty((0, 0, len(variables))), (), (), variables)
+
+    dates = pd.to_datetime(observations["Date"], errors="coerce", utc=True)
+    keep = dates.notna().to_numpy()
+    dates = dates[keep]
+    city_names = observations["City"].astype(str).str.strip().to_numpy()[keep]
+
+    cities = sorted(set(city_names), key=str.lower)
+    month_index = (dates.dt.year * 12 + dates.dt.month - 1).to_numpy(dtype=np.int64)
+    first = int(month_index.min())
+    n_months = int(month_index.max()) - first + 1
+    months = tuple(f"{(first + i) // 12:04d}-{(first + i) % 12 + 1:02d}-01" for i in range(n_months))
+
+    city_codes = pd.Categorical(city_names, categories=cities).codes.astype(np.int64)
+    shape = (len(cities), n_months)
+    flat = np.ravel_multi_index((city_codes, month_index - first), shape)
+    cells = int(np.prod(shape))
+
+    values = np.full(shape + (len(variables),), np.nan)
+    for v, name in enumerate(variables):
+        column = pd.to_numeric(observations[name], errors="coerce").to_numpy(dtype=np.float64)[keep]
+        present = np.isfinite(column)
+        sums = np.bincount(flat[present], weights=column[present], minlength=cells)
+        counts = np.bincount(flat[present], minlength=cells)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            values[..., v] = np.where(counts > 0, sums / np.maximum(counts, 1), np.nan).reshape(shape)
+    return EnvArchive(values, tuple(cities), months, variables)
+
+
+_archives: Dict[str, Tuple[dict, EnvArchive]] = {}
+_archives_lock = threading.Lock()
+
+
+def load_env_archive(path: str = DEFAULT_ARCHIVE_PATH) -> EnvArchive:
+    """Monthly archive for ``path``, re-read only when the file's size or mtime changes.
+
+    A missing file yields an empty archive rather than an error.
+    """
+    key = os.path.abspath(path)
+    try:
+        fingerprint = source_fingerprint(key)
+    except OSError:
+        return monthly_archive(pd.DataFrame(columns=["City", "Date"]))
+    with _archives_lock:
+        cached = _archives.get(key)
+        if cached is not None and cached[0] == fingerprint:
+            return cached[1]
+    archive = monthly_archive(pd.read_csv(key))
+    with _archives_lock:
+        _archives[key] = (fingerprint, archive)
+    return archive
+
+
+# ---------------- RECORDING ----------------
+def snapshot_observation(city: str, snapshot: EnvironmentSnapshot) -> Optional[Dict[str, object]]:
+    """One archive row from a snapshot's current weather and air quality, or None without weather"""
+    if snapshot is None or snapshot.current is None:
+        return None
+    observed = snapshot.current.get("dt") or snapshot.fetched.get("weather") or snapshot.fetched_at
+    row: Dict[str, object] = {
+        "City": city,
+        "Date": datetime.fromtimestamp(observed, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "temp": snapshot.temp,
+        "humidity": snapshot.humidity,
+        "pressure": snapshot.pressure,
+        "rain": snapshot.rain,
+        "wind_speed": snapshot.wind_speed,
+    }
+    aqi_data = snapshot.air_quality
+    if 'error' not in aqi_data:
+        row["aqi"] = aqi_data['aqi_result']['overall_aqi']
+        for name in ("pm2_5", "pm10", "o3", "no2", "so2", "co"):
+            row[name] = aqi_data['components'].get(name)
+    return row
+
+
+_recorded = set()
+_write_lock = threading.Lock()
+
+
+def record_snapshots(snapshots: Dict[str, EnvironmentSnapshot], path: str = DEFAULT_ARCHIVE_PATH) -> int:
+    """Append current observations to the archive, skipping ones this process already wrote.
+
+    Returns the number of rows written.
+    """
+    rows: List[Dict[str, object]] = []
+    key = os.path.abspath(path)
+    with _write_lock:
+        for city, snapshot in snapshots.items():
+            row = snapshot_observation(city, snapshot)
+            if row is None or (key, city.lower(), row["Date"]) in _recorded:
+                continue
+            _recorded.add((key, city.lower(), row["Date"]))
+            rows.append(row)
+        if not rows:
+            return 0
+        write_header = not os.path.exists(key) or os.path.getsize(key) == 0
+        fieldnames = ["City", "Date", *ARCHIVE_VARIABLES]
+        if not write_header:
+            # Follow the existing header so imported archives with other column orders stay aligned
+            with open(key, "r", newline="", encoding="utf-8") as fh:
+                fieldnames = next(csv.reader(fh), fieldnames)
+        with open(key, "a", newline="", encoding="utf-8") as fh:
+            writer = csv.DictWriter(fh, fieldnames=fieldnames, extrasaction="ignore")
+            if write_header:
+                writer.writeheader()
+            writer.writerows(rows)
+    return len(rows)
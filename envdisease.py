@@ -0,0 +1,450 @@
+"""Headless city reports built from the same modules as the dashboard.
+
+    python -m envdisease report --cities all --out reports/
+    python -m envdisease report --cities Delhi,Mumbai --workers 4 --calls-per-minute 60
+
+Environmental data for every city is fetched once in this process, through the shared
+environment cache and a single rate limiter, and appended to the archive. Correlations,
+lead times, anomalies and projections are computed once for the whole dataset. Each
+city's JSON and static HTML report is then built on a process pool whose workers open
+the memory-mapped disease cube instead of copying it.
+"""
+import argparse
+import html
+import json
+import math
+import multiprocessing
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import Optional, Dict, List, Tuple, Any, Callable
+
+import numpy as np
+import pandas as pd
+
+from analytics import AnomalyResult, correlate, lagged_correlation, seasonal_anomalies
+from aqi import get_aqi_category
+from batch_collector import DEFAULT_CALLS_PER_MINUTE, CityEnvironment, collect_environment, summarize_collection
+from charts import aqi_gauge_option, city_trend_chart, point_budget, risk_score_option, risk_timeline_option
+from disease_cube import DiseaseCube, load_cube
+from disease_data import get_shared_dataset
+from env_archive import DEFAULT_ARCHIVE_PATH, VARIABLE_LABELS, load_env_archive, record_snapshots
+from forecasting import default_model_cache, forecast_cases
+from risk import assess_scenarios, forecast_risk_timeline, score_locations
+
+DEFAULT_DATA_PATH = "output_d206b0_corrected.csv"
+DEFAULT_OUT_DIR = "reports"
+# Static reports load echarts from a CDN; the JSON report needs nothing
+ECHARTS_URL = "https://cdn.jsdelivr.net/npm/echarts@5/dist/echarts.min.js"
+RISK_COLORS = {"Low": "#4CAF50", "Moderate": "#FF9800", "High": "#F44336"}
+
+
+# ---------------- HELPERS ----------------
+def city_slug(city: str) -> str:
+    """File-name stem for a city's report"""
+    return re.sub(r"[^a-z0-9]+", "-", city.lower()).strip("-") or "city"
+
+
+def _number(value: Any, digits: Optional[int] = None) -> Optional[float]:
+    """Plain float for JSON, None for missing or NaN"""
+    if value is None:
+        return None
+    value = float(value)
+    if not math.isfinite(value):
+        return None
+    return round(value, digits) if digits is not None else value
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def resolve_cities(spec: str, dataset_cities: List[str]) -> List[str]:
+    """``all`` or a comma-separated list; dataset names are matched case-insensitively"""
+    if spec.strip().lower() == "all":
+        return list(dataset_cities)
+    known = {city.lower(): city for city in dataset_cities}
+    requested = [name.strip() for name in spec.split(",") if name.strip()]
+    return list(dict.fromkeys(known.get(name.lower(), name) for name in requested))
+
+
+# ---------------- DATASET-WIDE ANALYSIS ----------------
+def city_analysis(city: str, correlation, lags, forecasts: Dict[Tuple[str, str], Dict[str, Any]]) -> Dict[str, Any]:
+    """The slice of the dataset-wide results one city's report needs, as plain data"""
+    pearson = correlation.matrix(city, "pearson_r") if correlation is not None else pd.DataFrame()
+    correlations = []
+    if not pearson.empty:
+        stats = {name: correlation.matrix(city, name)
+                 for name in ("pearson_r", "pearson_p", "spearman_r", "spearman_p", "n")}
+        for disease in pearson.index:
+            for variable in pearson.columns:
+                if not np.isfinite(pearson.loc[disease, variable]):
+                    continue
+                row = {"disease": disease, "variable": variable}
+                row.update({name: _number(frame.loc[disease, variable], 4) for name, frame in stats.items()})
+                row["n"] = int(stats["n"].loc[disease, variable])
+                correlations.append(row)
+
+    lead_times = []
+    table = lags.best_table(city) if lags is not None else pd.DataFrame()
+    for row in table.itertuples(index=False):
+        lead_times.append({"disease": row[0], "variable": row[1], "lag_months": int(row[2]),
+                           "r": _number(row[3], 4), "p": _number(row[4], 4)})
+
+    projections = {disease: record for (name, disease), record in forecasts.items() if name.lower() == city.lower()}
+    return {"correlations": correlations, "lead_times": lead_times, "projections": projections}
+
+
+# ---------------- REPORT ----------------
+def environment_section(result: CityEnvironment) -> Dict[str, Any]:
+    """Current conditions, AQI, current risk and the forecast risk timeline for one city"""
+    section: Dict[str, Any] = {"coordinates": None, "error": result.error}
+    snapshot = result.snapshot
+    if result.lat is not None:
+        section["coordinates"] = {"lat": result.lat, "lon": result.lon}
+    if snapshot is None:
+        return section
+
+    section["errors"] = dict(snapshot.errors)
+    section["fetched"] = {name: datetime.fromtimestamp(ts).isoformat(timespec="seconds")
+                          for name, ts in snapshot.fetched.items()}
+    if snapshot.current is not None:
+        section["weather"] = {
+            "temp": _number(snapshot.temp), "humidity": _number(snapshot.humidity),
+            "pressure": _number(snapshot.pressure), "rain": _number(snapshot.rain),
+            "wind_speed": _number(snapshot.wind_speed), "temp_change": _number(snapshot.temp_change, 2),
+        }
+
+    air = snapshot.air_quality
+    if "error" in air:
+        section["air_quality"] = {"error": air["error"]}
+    else:
+        overall = air["aqi_result"]["overall_aqi"]
+        section["air_quality"] = {
+            "aqi": overall,
+            "category": get_aqi_category(overall)[0],
+            "dominant_pollutant": air["aqi_result"]["dominant_pollutant"],
+            "individual_aqis": air["aqi_result"]["individual_aqis"],
+            "components": air["components"],
+        }
+
+    if snapshot.current is None:
+        return section
+    conditions = snapshot.risk_conditions()
+    rows = assess_scenarios(conditions)[0]
+    section["risk"] = [{"disease": row["Disease"], "level": row["Risk"],
+                        "percentage": round(row["Score"] / row["Max_Score"] * 100, 1), "reason": row["Reason"]}
+                       for row in rows]
+
+    if snapshot.forecast is not None:
+        timeline = forecast_risk_timeline(snapshot.forecast, aqi=conditions["aqi"], pm25=conditions["pm25"],
+                                          pm10=conditions["pm10"], dominant_pollutant=conditions["dominant_pollutant"])
+        peaks = {}
+        for disease in timeline.percentage:
+            peak = timeline.peak(disease)
+            if peak:
+                peaks[disease] = {"time": datetime.fromtimestamp(peak[0]).isoformat(timespec="minutes"),
+                                  "percentage": round(peak[1], 1), "level": peak[2]}
+        section["timeline"] = {
+            "times": [datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M") for ts in timeline.times],
+            "percentage": {disease: np.round(values, 1).tolist() for disease, values in timeline.percentage.items()},
+            "peaks": peaks,
+        }
+    return section
+
+
+def disease_section(city: str, cube: Optional[DiseaseCube], anomalies: Optional[AnomalyResult],
+                    projections: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Historical totals, recorded range, outbreak flags and projection per disease"""
+    if cube is None or not cube.has_city(city):
+        return {}
+    diseases = {}
+    for disease in cube.diseases_for(city):
+        months, _ = cube.monthly(city, disease)
+        flags = anomalies.series_flags(city, disease) if anomalies is not None else {}
+        projection = projections.get(disease)
+        diseases[disease] = {
+            "totals": cube.totals(city, disease),
+            "months_recorded": len(months),
+            "first_month": months[0] if months else None,
+            "last_month": months[-1] if months else None,
+            "anomalies": {month: round(z, 2) for month, z in flags.items()},
+            "projection": None if projection is None else {
+                "months": projection["months"],
+                "cases": [_number(v, 1) for v in projection["forecast"]],
+                "model": projection["model"],
+                "holdout_mae": _number(projection["holdout_mae"], 2),
+            },
+        }
+    return diseases
+
+
+def build_report(city: str, environment: CityEnvironment, analysis: Dict[str, Any],
+                 cube: Optional[DiseaseCube], anomalies: Optional[AnomalyResult], generated_at: str) -> Dict[str, Any]:
+    """Everything the dashboard shows for a city, as one JSON-ready dict"""
+    return {
+        "city": city,
+        "generated_at": generated_at,
+        "environment": environment_section(environment),
+        "diseases": disease_section(city, cube, anomalies, analysis["projections"]),
+        "correlations": analysis["correlations"],
+        "lead_times": analysis["lead_times"],
+    }
+
+
+# ---------------- STATIC HTML ----------------
+_PAGE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<script src="{echarts}"></script>
+<style>
+body {{ font-family: sans-serif; margin: 2em auto; max-width: 1100px; color: #222; }}
+table {{ border-collapse: collapse; margin: 0.5em 0 1.5em; font-size: 14px; }}
+th, td {{ border: 1px solid #ddd; padding: 4px 8px; text-align: left; }}
+th {{ background: #f4f4f4; }}
+.chart {{ width: 100%; height: 380px; }}
+.muted {{ color: #777; font-size: 13px; }}
+</style>
+</head>
+<body>
+{body}
+</body>
+</html>
+"""
+
+
+def _table(rows: List[Dict[str, Any]]) -> str:
+    return pd.DataFrame(rows).to_html(index=False, border=0, na_rep="–") if rows else '<p class="muted">No data.</p>'
+
+
+def _chart(chart_id: str, option: Dict[str, Any]) -> str:
+    payload = json.dumps(option, default=_json_default).replace("</", "<\\/")
+    return (f'<div id="{chart_id}" class="chart"></div>\n'
+            f'<script>echarts.init(document.getElementById("{chart_id}")).setOption({payload});</script>')
+
+
+def render_html(report: Dict[str, Any], trend_option: Optional[Dict[str, Any]] = None) -> str:
+    """Static page for a report; charts use the dashboard's echarts options"""
+    city = html.escape(report["city"])
+    env = report["environment"]
+    parts = [f"<h1>{city}</h1>", f'<p class="muted">Generated {html.escape(report["generated_at"])}</p>']
+
+    parts.append("<h2>Current Conditions</h2>")
+    if env.get("error"):
+        parts.append(f"<p>{html.escape(env['error'])}</p>")
+    if env.get("weather"):
+        parts.append(_table([env["weather"]]))
+    air = env.get("air_quality")
+    if air and "error" not in air:
+        parts.append(f"<p>AQI {air['aqi']} ({html.escape(air['category'])}), "
+                     f"dominant pollutant {html.escape(str(air['dominant_pollutant']))}</p>")
+        if air["aqi"] is not None:
+            parts.append(_chart("aqi", aqi_gauge_option(air["aqi"])))
+    elif air:
+        parts.append(f"<p>{html.escape(air['error'])}</p>")
+
+    if env.get("risk"):
+        parts.append("<h2>Disease Risk</h2>")
+        parts.append(_table(env["risk"]))
+        risk = env["risk"]
+        parts.append(_chart("risk", risk_score_option([r["disease"] for r in risk], [r["percentage"] for r in risk],
+                                                      [r["level"] for r in risk], RISK_COLORS)))
+    if env.get("timeline"):
+        timeline = env["timeline"]
+        parts.append("<h2>Risk Timeline (5-day forecast)</h2>")
+        parts.append(_chart("timeline", risk_timeline_option(timeline["times"], timeline["percentage"])))
+        parts.append(_table([{"disease": disease, **peak} for disease, peak in timeline["peaks"].items()]))
+
+    if report["diseases"]:
+        parts.append("<h2>Historical Cases</h2>")
+        if trend_option is not None:
+            parts.append(_chart("trend", trend_option))
+        rows = []
+        for disease, info in report["diseases"].items():
+            projection = info["projection"]
+            rows.append({
+                "Disease": disease,
+                "Population Affected": info["totals"]["Population_Affected"],
+                "Deaths": info["totals"]["Number_of_Deaths"],
+                "Months": info["months_recorded"],
+                "Range": f"{info['first_month'] or '–'} to {info['last_month'] or '–'}",
+                "Outbreak Months": ", ".join(m[:7] for m in info["anomalies"]) or "–",
+                "Next Months": "–" if projection is None else ", ".join(
+                    f"{m[:7]}: {'–' if v is None else f'{v:,.0f}'}" for m, v in zip(projection["months"], projection["cases"])),
+            })
+        parts.append(_table(rows))
+
+    if report["correlations"]:
+        parts.append("<h2>Correlation with Environment</h2>")
+        parts.append(_table([{"Disease": r["disease"], "Variable": VARIABLE_LABELS.get(r["variable"], r["variable"]),
+                              "Spearman r": r["spearman_r"], "p": r["spearman_p"], "Pearson r": r["pearson_r"],
+                              "Months": r["n"]} for r in report["correlations"]]))
+    if report["lead_times"]:
+        parts.append("<h2>Lead Times</h2>")
+        parts.append(_table([{"Disease": r["disease"], "Variable": VARIABLE_LABELS.get(r["variable"], r["variable"]),
+                              "Best Lag (months)": r["lag_months"], "r": r["r"], "p": r["p"]}
+                             for r in report["lead_times"]]))
+
+    return _PAGE.format(title=f"{city} – Environment & Disease Report", echarts=ECHARTS_URL, body="\n".join(parts))
+
+
+# ---------------- PROCESS POOL ----------------
+# Set once per worker by _init_worker
+_worker_cube: Optional[DiseaseCube] = None
+_worker_anomalies: Optional[AnomalyResult] = None
+
+
+def _init_worker(file_path: Optional[str], anomalies: Optional[AnomalyResult]) -> None:
+    """Open the memory-mapped cube once per worker; pages are shared through the OS cache"""
+    global _worker_cube, _worker_anomalies
+    _worker_cube = load_cube(file_path) if file_path is not None else None
+    _worker_anomalies = anomalies
+
+
+def write_city_report(city: str, environment: CityEnvironment, analysis: Dict[str, Any], out_dir: str,
+                      generated_at: str, cube: Optional[DiseaseCube] = None,
+                      anomalies: Optional[AnomalyResult] = None) -> Dict[str, Any]:
+    """Build and write one city's JSON and HTML report; returns a summary row for the index"""
+    cube = cube if cube is not None else _worker_cube
+    anomalies = anomalies if anomalies is not None else _worker_anomalies
+    report = build_report(city, environment, analysis, cube, anomalies, generated_at)
+    trend = city_trend_chart(cube, anomalies, city, point_budget()) if report["diseases"] else None
+
+    stem = os.path.join(out_dir, city_slug(city))
+    with open(stem + ".json", "w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2, default=_json_default)
+    with open(stem + ".html", "w", encoding="utf-8") as fh:
+        fh.write(render_html(report, trend))
+
+    risk = report["environment"].get("risk") or []
+    return {"city": city, "json": stem + ".json", "html": stem + ".html",
+            "max_risk": max((r["percentage"] for r in risk), default=None),
+            "error": report["environment"].get("error")}
+
+
+def generate_reports(cities: List[str], out_dir: str, api_key: str, file_path: str = DEFAULT_DATA_PATH,
+                     archive_path: str = DEFAULT_ARCHIVE_PATH, record: bool = True, workers: Optional[int] = None,
+                     fetch_workers: int = 8, calls_per_minute: Optional[float] = DEFAULT_CALLS_PER_MINUTE,
+                     log: Callable[[str], None] = print) -> Dict[str, Any]:
+    """Write a JSON and HTML report per city plus index.json/index.html; returns the index.
+
+    ``workers`` bounds the report process pool (and the projection refits), ``fetch_workers``
+    the HTTP threads, and ``calls_per_minute`` the shared OWM rate limit. Fetched observations
+    are appended to ``archive_path`` before the analysis unless ``record`` is False.
+    """
+    started = time.perf_counter()
+    os.makedirs(out_dir, exist_ok=True)
+    generated_at = datetime.now().isoformat(timespec="seconds")
+
+    dataset = get_shared_dataset(file_path)
+    cube = dataset.cube
+    cities = list(cities) if cities else list(dataset.cities)
+
+    collected = collect_environment(cities, api_key, max_workers=fetch_workers, calls_per_minute=calls_per_minute)
+    outcome = summarize_collection(collected)
+    log(f"Fetched {len(outcome['ok'])} ok, {len(outcome['partial'])} partial, {len(outcome['failed'])} failed "
+        f"in {time.perf_counter() - started:.1f}s")
+    if record:
+        try:
+            record_snapshots({city: r.snapshot for city, r in collected.items() if r.snapshot is not None}, archive_path)
+        except OSError as e:
+            log(f"Archive not updated: {e}")
+
+    archive = load_env_archive(archive_path)
+    anomalies = seasonal_anomalies(cube) if cube is not None else None
+    correlation = correlate(cube, archive) if cube is not None else None
+    lags = lagged_correlation(cube, archive) if cube is not None else None
+    forecasts = forecast_cases(cube, default_model_cache(file_path), archive, max_workers=workers) if cube is not None else {}
+
+    rows = []
+    jobs = {city: (collected[city], city_analysis(city, correlation, lags, forecasts)) for city in cities}
+    pool_size = max(1, min(workers or os.cpu_count() or 1, len(jobs)))
+    # spawn: the fetch threads above make forking this process unsafe
+    with ProcessPoolExecutor(max_workers=pool_size, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_worker, initargs=(file_path if cube is not None else None, anomalies)) as pool:
+        futures = {pool.submit(write_city_report, city, environment, analysis, out_dir, generated_at): city
+                   for city, (environment, analysis) in jobs.items()}
+        for future in as_completed(futures):
+            city = futures[future]
+            try:
+                rows.append(future.result())
+            except Exception as e:
+                rows.append({"city": city, "json": None, "html": None, "max_risk": None,
+                             "error": f"{type(e).__name__}: {e}"})
+                log(f"{city}: report failed ({e})")
+
+    order = {city: i for i, city in enumerate(cities)}
+    rows.sort(key=lambda row: order[row["city"]])
+    for row in rows:
+        if row["city"] in outcome["failed"] and not row["error"]:
+            errors = collected[row["city"]].snapshot.errors if collected[row["city"]].snapshot else {}
+            row["error"] = "No environmental data: " + ("; ".join(errors.values()) or "nothing fetched")
+    ranking = score_locations({city: r.snapshot for city, r in collected.items()})
+    index = {
+        "generated_at": generated_at,
+        "elapsed_seconds": round(time.perf_counter() - started, 1),
+        "fetch": outcome,
+        "cities": rows,
+        "ranking": json.loads(ranking.to_json(orient="records")) if not ranking.empty else [],
+    }
+    with open(os.path.join(out_dir, "index.json"), "w", encoding="utf-8") as fh:
+        json.dump(index, fh, indent=2, default=_json_default)
+    links = [{"City": f'<a href="{html.escape(os.path.basename(row["html"]))}">{html.escape(row["city"])}</a>'
+              if row["html"] else html.escape(row["city"]),
+              "Max Risk (%)": row["max_risk"], "Note": html.escape(row["error"] or "")} for row in rows]
+    body = (f"<h1>Environment &amp; Disease Reports</h1><p class=\"muted\">Generated {generated_at}</p>"
+            + pd.DataFrame(links).to_html(index=False, border=0, na_rep="–", escape=False)
+            + ("<h2>National Ranking</h2>" + ranking.to_html(index=False, border=0, na_rep="–") if not ranking.empty else ""))
+    with open(os.path.join(out_dir, "index.html"), "w", encoding="utf-8") as fh:
+        fh.write(_PAGE.format(title="Environment & Disease Reports", echarts=ECHARTS_URL, body=body))
+    log(f"Wrote {sum(1 for row in rows if row['json'])}/{len(rows)} reports to {out_dir} "
+        f"in {index['elapsed_seconds']}s")
+    return index
+
+
+# ---------------- CLI ----------------
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="envdisease", description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    report = commands.add_parser("report", help="write per-city JSON and HTML reports")
+    report.add_argument("--cities", default="all", help="'all' (every dataset city) or a comma-separated list")
+    report.add_argument("--out", default=DEFAULT_OUT_DIR, help="output directory")
+    report.add_argument("--data", default=DEFAULT_DATA_PATH, help="disease CSV")
+    report.add_argument("--archive", default=DEFAULT_ARCHIVE_PATH, help="environmental archive CSV")
+    report.add_argument("--no-record", action="store_true", help="read the archive without appending to it")
+    report.add_argument("--workers", type=int, default=None, help="report processes (default: CPU count)")
+    report.add_argument("--fetch-workers", type=int, default=8, help="concurrent HTTP fetch threads")
+    report.add_argument("--calls-per-minute", type=float, default=DEFAULT_CALLS_PER_MINUTE,
+                        help="OpenWeatherMap rate limit shared by all fetches")
+    report.add_argument("--api-key", default=os.getenv("OPENWEATHER_API_KEY"),
+                        help="OpenWeatherMap key (default: $OPENWEATHER_API_KEY)")
+    args = parser.parse_args(argv)
+
+    if not args.api_key:
+        parser.error("no API key: pass --api-key or set OPENWEATHER_API_KEY")
+    try:
+        dataset = get_shared_dataset(args.data)
+    except FileNotFoundError:
+        parser.error(f"disease data file '{args.data}' not found")
+    cities = resolve_cities(args.cities, list(dataset.cities))
+    if not cities:
+        parser.error("no cities to report on")
+
+    index = generate_reports(cities, args.out, args.api_key, args.data, args.archive,
+                             not args.no_record, args.workers, args.fetch_workers, args.calls_per_minute,
+                             log=lambda message: print(message, file=sys.stderr))
+    # Non-zero when any report is missing or any city got no environmental data at all
+    return 0 if all(row["json"] for row in index["cities"]) and not index["fetch"]["failed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
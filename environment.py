@@ -0,0 +1,343 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Callable, Tuple
+
+import requests
+
+from aqi import calculate_comprehensive_aqi
+from owm_client import get_client
+
+# Endpoints that only need coordinates and can be fetched side by side
+ENDPOINTS = ("weather", "forecast", "air_pollution")
+
+
+# ---------------- SINGLE-ENDPOINT FETCHERS ----------------
+def fetch_current_weather(lat: float, lon: float, api_key: str, timeout: float = 10,
+                          deadline: Optional[float] = None) -> dict:
+    """Current conditions from /data/2.5/weather (metric units)"""
+    return get_client(api_key).current_weather(lat, lon, timeout, deadline)
+
+
+def fetch_forecast(lat: float, lon: float, api_key: str, timeout: float = 10,
+                   deadline: Optional[float] = None) -> dict:
+    """40-step 3-hourly forecast from /data/2.5/forecast (metric units)"""
+    return get_client(api_key).forecast(lat, lon, timeout, deadline)
+
+
+def fetch_air_pollution(lat: float, lon: float, api_key: str, timeout: float = 10,
+                        deadline: Optional[float] = None) -> dict:
+    """Raw pollutant concentrations from /data/2.5/air_pollution"""
+    return get_client(api_key).air_pollution(lat, lon, timeout, deadline)
+
+
+def summarize_air_pollution(aqi_data: dict) -> dict:
+    """Turn an air_pollution response into components plus the comprehensive AQI result"""
+    if "list" not in aqi_data or not aqi_data["list"]:
+        return {'error': 'No AQI data available'}
+
+    components = aqi_data["list"][0]["components"]
+    aqi_result = calculate_comprehensive_aqi(components)
+
+    return {
+        'components': components,
+        'aqi_result': aqi_result,
+        'api_aqi': aqi_data["list"][0].get("main", {}).get("aqi", "N/A"),  # API's own AQI
+        'timestamp': aqi_data["list"][0].get("dt", None)
+    }
+
+
+def get_comprehensive_aqi_data(lat: float, lon: float, api_key: str) -> dict:
+    """Fetch and calculate comprehensive AQI data"""
+    try:
+        return summarize_air_pollution(fetch_air_pollution(lat, lon, api_key))
+    except Exception as e:
+        return {'error': f'Error fetching AQI data: {e}'}
+
+
+# ---------------- ENVIRONMENT SNAPSHOT ----------------
+@dataclass
+class EnvironmentSnapshot:
+    """Current weather, forecast and air quality for one location.
+
+    Each endpoint is independent: a failed call leaves its field as None and records
+    the reason in ``errors`` so callers can degrade instead of failing outright.
+    """
+    lat: float
+    lon: float
+    current: Optional[dict] = None
+    forecast: Optional[dict] = None
+    air: Optional[dict] = None
+    errors: Dict[str, str] = field(default_factory=dict)
+    fetched_at: float = 0.0
+    fetched: Dict[str, float] = field(default_factory=dict)
+    stale: tuple = ()
+
+    def age(self, name: str) -> Optional[float]:
+        """Seconds since an endpoint's payload was fetched"""
+        return time.time() - self.fetched[name] if name in self.fetched else None
+
+    @property
+    def temp(self) -> Optional[float]:
+        return self.current["main"]["temp"] if self.current else None
+
+    @property
+    def humidity(self) -> Optional[float]:
+        return self.current["main"]["humidity"] if self.current else None
+
+    @property
+    def pressure(self) -> Optional[float]:
+        return self.current["main"]["pressure"] if self.current else None
+
+    @property
+    def rain(self) -> float:
+        return self.current.get("rain", {}).get("1h", 0) if self.current else 0
+
+    @property
+    def wind_speed(self) -> float:
+        return self.current.get("wind", {}).get("speed", 0) if self.current else 0
+
+    @property
+    def temp_change(self) -> float:
+        """Temperature range over the next 24 h (first 8 forecast steps)"""
+        if not self.forecast or "list" not in self.forecast:
+            return 0
+        temps = [f["main"]["temp"] for f in self.forecast["list"][:8]]
+        return max(temps) - min(temps) if temps else 0
+
+    @property
+    def air_quality(self) -> dict:
+        """Comprehensive AQI summary, or an ``error`` dict when pollution data is missing"""
+        if self.air is None:
+            return {'error': self.errors.get("air_pollution", 'No AQI data available')}
+        return summarize_air_pollution(self.air)
+
+    def risk_conditions(self) -> Dict[str, object]:
+        """Inputs for risk.RISK_RULES, with the dashboard's defaults for missing air quality"""
+        conditions = {
+            "temp": self.temp, "humidity": self.humidity, "rain": self.rain,
+            "wind_speed": self.wind_speed, "temp_change": self.temp_change,
+            "aqi": 0, "pm25": 0, "pm10": 0, "dominant_pollutant": "None",
+        }
+        aqi_data = self.air_quality
+        if 'error' not in aqi_data:
+            components = aqi_data['components']
+            conditions.update({
+                "pm25": components.get('pm2_5', 0),
+                "pm10": components.get('pm10', 0),
+                "aqi": aqi_data['aqi_result']['overall_aqi'] or 0,
+                "dominant_pollutant": aqi_data['aqi_result']['dominant_pollutant'] or "None",
+            })
+        return conditions
+
+
+_FETCHERS: Dict[str, Callable[..., dict]] = {
+    "weather": fetch_current_weather,
+    "forecast": fetch_forecast,
+    "air_pollution": fetch_air_pollution,
+}
+
+_SNAPSHOT_FIELDS = {"weather": "current", "forecast": "forecast", "air_pollution": "air"}
+
+
+def fetch_environment(lat: float, lon: float, api_key: str, timeout: float = 10,
+                      endpoints: tuple = ENDPOINTS, concurrent: bool = True) -> EnvironmentSnapshot:
+    """Fetch the requested endpoints concurrently and collect them into one snapshot.
+
+    ``timeout`` applies to each call; the whole fetch is also bounded by it, so latency is
+    roughly that of the slowest endpoint rather than the sum of all of them. That bound is
+    passed down as the client's retry deadline, so no retry outlives the wait for it. Batch
+    callers that already parallelise across locations pass ``concurrent=False`` to fetch in
+    turn, giving each call the client's full retry budget.
+    """
+    snapshot = EnvironmentSnapshot(lat=lat, lon=lon)
+    if not concurrent:
+        for name in endpoints:
+            try:
+                setattr(snapshot, _SNAPSHOT_FIELDS[name], _FETCHERS[name](lat, lon, api_key, timeout))
+                snapshot.fetched[name] = time.time()
+            except requests.exceptions.RequestException as e:
+                snapshot.errors[name] = f"Network error: {e}"
+            except ValueError as e:
+                snapshot.errors[name] = f"Invalid response: {e}"
+        snapshot.fetched_at = time.time()
+        return snapshot
+
+    deadline = time.monotonic() + timeout
+    pool = ThreadPoolExecutor(max_workers=len(endpoints))
+    try:
+        futures = {pool.submit(_FETCHERS[name], lat, lon, api_key, timeout, deadline): name for name in endpoints}
+        done, not_done = wait(futures, timeout=timeout + 1)
+        for future in not_done:
+            snapshot.errors[futures[future]] = f"Timed out after {timeout}s"
+        for future in done:
+            name = futures[future]
+            try:
+                setattr(snapshot, _SNAPSHOT_FIELDS[name], future.result())
+                snapshot.fetched[name] = time.time()
+            except requests.exceptions.RequestException as e:
+                snapshot.errors[name] = f"Network error: {e}"
+            except ValueError as e:
+                snapshot.errors[name] = f"Invalid response: {e}"
+    finally:
+        # Do not wait for stragglers; their results are no longer wanted
+        pool.shutdown(wait=False, cancel_futures=True)
+    snapshot.fetched_at = time.time()
+    return snapshot
+
+
+# ---------------- SNAPSHOT CACHE ----------------
+# Roughly how often OWM refreshes each endpoint; cached payloads are reused until then
+ENDPOINT_TTLS = {
+    "weather": 10 * 60,
+    "forecast": 3 * 60 * 60,
+    "air_pollution": 60 * 60,
+}
+
+# Past its TTL a payload is still served (marked stale) while a background refresh runs,
+# but never once it is older than this; then the caller waits for a fresh fetch
+MAX_STALENESS = {
+    "weather": 60 * 60,
+    "forecast": 12 * 60 * 60,
+    "air_pollution": 6 * 60 * 60,
+}
+
+
+class EnvironmentCache:
+    """Per-location cache of endpoint payloads, each with its own TTL.
+
+    Sections ask for the endpoints they need; only missing or expired ones are fetched,
+    so one page view costs at most one call per endpoint and repeat views cost none.
+    Expired payloads younger than ``max_staleness`` are returned immediately and refreshed
+    on a background thread (stale-while-revalidate), so viewers do not wait on upstream.
+    """
+
+    def __init__(self, ttls: Optional[Dict[str, float]] = None, precision: int = 4,
+                 max_staleness: Optional[Dict[str, float]] = None, refresh_workers: int = 4):
+        self.ttls = dict(ENDPOINT_TTLS if ttls is None else ttls)
+        self.max_staleness = dict(MAX_STALENESS if max_staleness is None else max_staleness)
+        self.precision = precision
+        self._entries: Dict[Tuple[float, float], Dict[str, Tuple[dict, float]]] = {}
+        self._api_keys: Dict[Tuple[float, float], str] = {}
+        self._refreshing: set = set()
+        self._lock = threading.Lock()
+        self._refresh_pool = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix="env-refresh")
+
+    def _key(self, lat: float, lon: float) -> Tuple[float, float]:
+        return round(lat, self.precision), round(lon, self.precision)
+
+    def _classify(self, key: Tuple[float, float], endpoints: tuple, now: float,
+                  allow_stale: bool) -> Tuple[Dict[str, Tuple[dict, float]], Dict[str, Tuple[dict, float]]]:
+        """Split cached endpoints into fresh and servable-but-stale ones"""
+        fresh, stale = {}, {}
+        with self._lock:
+            cached = self._entries.get(key, {})
+            for name in endpoints:
+                if name not in cached:
+                    continue
+                age = now - cached[name][1]
+                if age < self.ttls.get(name, 0):
+                    fresh[name] = cached[name]
+                elif allow_stale and age < self.max_staleness.get(name, 0):
+                    stale[name] = cached[name]
+        return fresh, stale
+
+    def _store(self, key: Tuple[float, float], snapshot: EnvironmentSnapshot, names: tuple) -> None:
+        with self._lock:
+            entry = self._entries.setdefault(key, {})
+            for name in names:
+                payload = getattr(snapshot, _SNAPSHOT_FIELDS[name])
+                if payload is not None:
+                    entry[name] = (payload, snapshot.fetched[name])
+
+    def _schedule_refresh(self, lat: float, lon: float, api_key: str, names: tuple, timeout: float) -> None:
+        """Refetch ``names`` in the background unless a refresh for them is already running"""
+        key = self._key(lat, lon)
+        with self._lock:
+            names = tuple(name for name in names if (key, name) not in self._refreshing)
+            self._refreshing.update((key, name) for name in names)
+        if not names:
+            return
+
+        def refresh():
+            try:
+                self._store(key, fetch_environment(lat, lon, api_key, timeout, names), names)
+            finally:
+                with self._lock:
+                    self._refreshing.difference_update((key, name) for name in names)
+
+        self._refresh_pool.submit(refresh)
+
+    def get(self, lat: float, lon: float, api_key: str, endpoints: tuple = ENDPOINTS,
+            timeout: float = 10, concurrent: bool = True, allow_stale: bool = True) -> EnvironmentSnapshot:
+        """Snapshot for the given endpoints, fetching only what is missing or too old to serve"""
+        key = self._key(lat, lon)
+        with self._lock:
+            self._api_keys[key] = api_key
+        fresh, stale = self._classify(key, endpoints, time.time(), allow_stale)
+        missing = tuple(name for name in endpoints if name not in fresh and name not in stale)
+
+        if missing:
+            snapshot = fetch_environment(lat, lon, api_key, timeout, missing, concurrent)
+            self._store(key, snapshot, missing)
+        else:
+            snapshot = EnvironmentSnapshot(lat=lat, lon=lon)
+        if stale:
+            self._schedule_refresh(lat, lon, api_key, tuple(stale), timeout)
+
+        for name, (payload, fetched) in list(fresh.items()) + list(stale.items()):
+            setattr(snapshot, _SNAPSHOT_FIELDS[name], payload)
+            snapshot.fetched[name] = fetched
+        snapshot.stale = tuple(stale)
+        snapshot.fetched_at = min(snapshot.fetched.values()) if snapshot.fetched else time.time()
+        return snapshot
+
+    def is_current(self, snapshot: EnvironmentSnapshot) -> bool:
+        """True while every payload in the snapshot is within its TTL and still the cached one.
+
+        A snapshot that was served stale, has aged past a TTL, or whose payloads were since
+        replaced (by a background refresh or another session) is not current; callers holding
+        on to it should call get() again.
+        """
+        if snapshot.stale:
+            return False
+        now = time.time()
+        with self._lock:
+            cached = self._entries.get(self._key(snapshot.lat, snapshot.lon), {})
+            for name, fetched in snapshot.fetched.items():
+                entry = cached.get(name)
+                if entry is None or entry[1] != fetched or now - fetched >= self.ttls.get(name, 0):
+                    return False
+        return True
+
+    def revalidate(self, timeout: float = 10) -> int:
+        """Refresh every cached location in the background, keeping current data servable.
+
+        Returns the number of locations scheduled.
+        """
+        with self._lock:
+            targets = [(key, tuple(entry), self._api_keys.get(key)) for key, entry in self._entries.items()]
+        scheduled = 0
+        for (lat, lon), names, api_key in targets:
+            if api_key and names:
+                self._schedule_refresh(lat, lon, api_key, names, timeout)
+                scheduled += 1
+        return scheduled
+
+    def invalidate(self, lat: Optional[float] = None, lon: Optional[float] = None) -> None:
+        """Forget one location, or everything when no coordinates are given"""
+        with self._lock:
+            if lat is None or lon is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(self._key(lat, lon), None)
+
+
+environment_cache = EnvironmentCache()
+
+
+def get_environment(lat: float, lon: float, api_key: str, endpoints: tuple = ENDPOINTS,
+                    timeout: float = 10) -> EnvironmentSnapshot:
+    """Shared-cache entry point used by every dashboard section"""
+    return environment_cache.get(lat, lon, api_key, endpoints, timeout)
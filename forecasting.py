@@ -0,0 +1,285 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from analytics import align_series
+from disease_cube import METRICS, DiseaseCube
+from disease_data import CACHE_DIR_NAME
+from env_archive import EnvArchive
+
+# Months projected past the last recorded month
+HORIZON = 3
+SEASON = 12
+# Months held out to choose between candidate models
+HOLDOUT = 12
+MODEL_VERSION = 1
+# Weather covariates for the ridge model, lagged by HORIZON so they are known for every projected month
+COVARIATES = ("temp", "humidity", "rain")
+RIDGE_PENALTY = 1.0
+# Below this many pending fits a pool is not worth starting
+MIN_PARALLEL_FITS = 8
+
+HOLT_WINTERS_GRID = [(alpha, beta, gamma)
+                     for alpha in (0.1, 0.3, 0.5, 0.8)
+                     for beta in (0.0, 0.05, 0.2)
+                     for gamma in (0.1, 0.3, 0.5)]
+
+
+# ---------------- MODELS ----------------
+def seasonal_naive(y: np.ndarray, steps: int) -> np.ndarray:
+    """Repeat the last observed season"""
+    season = y[-SEASON:] if len(y) >= SEASON else y
+    return np.resize(season, steps) if len(season) else np.zeros(steps)
+
+
+def _holt_winters_run(y: np.ndarray, alpha: float, beta: float, gamma: float, steps: int) -> Tuple[float, np.ndarray]:
+    """Additive Holt-Winters; returns (one-step SSE, forecast)"""
+    level = y[:SEASON].mean()
+    trend = (y[SEASON:2 * SEASON].mean() - level) / SEASON
+    seasonal = list(y[:SEASON] - level)
+    sse = 0.0
+    for t in range(SEASON, len(y)):
+        s = seasonal[t - SEASON]
+        error = y[t] - (level + trend + s)
+        sse += error * error
+        previous = level
+        level = alpha * (y[t] - s) + (1 - alpha) * (level + trend)
+        trend = beta * (level - previous) + (1 - beta) * trend
+        seasonal.append(gamma * (y[t] - level) + (1 - gamma) * s)
+    h = np.arange(1, steps + 1)
+    season = np.array(seasonal[-SEASON:])
+    return sse, level + h * trend + season[(h - 1) % SEASON]
+
+
+def holt_winters(y: np.ndarray, steps: int) -> Tuple[np.ndarray, Dict[str, float]]:
+    """Additive Holt-Winters with smoothing constants picked from a small grid by one-step SSE"""
+    best = None
+    for alpha, beta, gamma in HOLT_WINTERS_GRID:
+        sse, forecast = _holt_winters_run(y, alpha, beta, gamma, steps)
+        if best is None or sse < best[0]:
+            best = (sse, forecast, {"alpha": alpha, "beta": beta, "gamma": gamma})
+    return best[1], best[2]
+
+
+def _ridge_design(month_of_year: np.ndarray, trend: np.ndarray, covariates: Optional[np.ndarray]) -> np.ndarray:
+    dummies = (month_of_year[:, None] == np.arange(1, SEASON)[None, :]).astype(np.float64)
+    parts = [trend[:, None], dummies]
+    if covariates is not None:
+        parts.append(covariates)
+    return np.hstack(parts)
+
+
+def ridge(y: np.ndarray, month_of_year: np.ndarray, covariates: Optional[np.ndarray], steps: int,
+          penalty: float = RIDGE_PENALTY) -> Tuple[np.ndarray, Dict[str, object]]:
+    """Ridge regression on trend, month dummies and optional lagged covariates.
+
+    ``month_of_year`` and ``covariates`` cover the history plus ``steps`` future rows.
+    """
+    n = len(y)
+    trend = np.arange(n + steps, dtype=np.float64) / SEASON
+    design = _ridge_design(month_of_year, trend, covariates)
+    mean, std = design[:n].mean(axis=0), design[:n].std(axis=0)
+    std[std == 0] = 1.0
+    standardized = (design - mean) / std
+    x, intercept = standardized[:n], y.mean()
+    coef = np.linalg.solve(x.T @ x + penalty * np.eye(x.shape[1]), x.T @ (y - intercept))
+    forecast = intercept + standardized[n:] @ coef
+    return forecast, {"penalty": penalty, "covariates": covariates is not None}
+
+
+def _candidates(y: np.ndarray, month_of_year: np.ndarray, covariates: Optional[np.ndarray],
+                steps: int) -> Dict[str, Tuple[np.ndarray, Dict[str, object]]]:
+    models = {"seasonal_naive": (seasonal_naive(y, steps), {})}
+    if len(y) >= 2 * SEASON:
+        models["holt_winters"] = holt_winters(y, steps)
+    if len(y) >= SEASON + 2:
+        models["ridge"] = ridge(y, month_of_year, None, steps)
+        if covariates is not None:
+            models["ridge_weather"] = ridge(y, month_of_year, covariates, steps)
+    return models
+
+
+def fit_series(y: np.ndarray, first_month: int, covariates: Optional[np.ndarray] = None,
+               horizon: int = HORIZON) -> Dict[str, object]:
+    """Pick the candidate with the lowest MAE over the last HOLDOUT months, refit, forecast.
+
+    ``first_month`` is the calendar month (1-12) of ``y[0]``; ``covariates`` has one row per
+    month of ``y`` plus ``horizon`` future rows.
+    """
+    month_of_year = (first_month - 1 + np.arange(len(y) + horizon)) % SEASON + 1
+    errors = {}
+    if len(y) > HOLDOUT + SEASON:
+        train = len(y) - HOLDOUT
+        train_cov = None if covariates is None else covariates[:len(y)]
+        for name, (forecast, _) in _candidates(y[:train], month_of_year[:len(y)], train_cov, HOLDOUT).items():
+            errors[name] = float(np.mean(np.abs(forecast - y[train:])))
+    best = min(errors, key=errors.get) if errors else "seasonal_naive"
+
+    forecast, params = _candidates(y, month_of_year, covariates, horizon)[best]
+    # Case counts cannot go negative
+    return {"model": best, "params": params, "forecast": np.maximum(forecast, 0).round(1).tolist(),
+            "holdout_mae": errors.get(best), "holdout_errors": errors}
+
+
+def _fit_batch(tasks: List[Tuple[str, np.ndarray, int, Optional[np.ndarray], int]]) -> List[Tuple[str, Dict[str, object]]]:
+    return [(key, fit_series(y, first_month, covariates, horizon)) for key, y, first_month, covariates, horizon in tasks]
+
+
+# ---------------- SERIES PREPARATION ----------------
+def _series_inputs(cube: DiseaseCube, archive: Optional[EnvArchive], metric: str,
+                   horizon: int) -> Dict[Tuple[str, str], Tuple[np.ndarray, int, str, Optional[np.ndarray]]]:
+    """Per (city, disease): gap-filled series, its first calendar month, last month label, covariates"""
+    values = np.asarray(cube.values[..., METRICS.index(metric)], dtype=np.float64)
+    recorded = np.asarray(cube.counts) > 0
+
+    covariate_rows = {}
+    if archive is not None and not archive.empty:
+        variables = [v for v in COVARIATES if v in archive.variables]
+        if variables:
+            _, environment, cities, months = align_series(cube, archive, metric)
+            month_pos = {m: i for i, m in enumerate(months)}
+            picks = [archive.variables.index(v) for v in variables]
+            for c, city in enumerate(cities):
+                covariate_rows[city] = (environment[c][picks].T, month_pos)
+
+    inputs = {}
+    for c, city in enumerate(cube.cities):
+        for d, disease in enumerate(cube.diseases):
+            present = np.flatnonzero(recorded[c, d])
+            if len(present) < 2:
+                continue
+            span = np.arange(present[0], present[-1] + 1)
+            # Interior months without records are interpolated so the seasonal index stays aligned
+            y = np.interp(span, present, values[c, d, present])
+            first_label = cube.months[span[0]]
+
+            covariates = None
+            if city in covariate_rows:
+                environment, month_pos = covariate_rows[city]
+                start = month_pos[first_label] - horizon
+                rows = np.arange(start, start + len(y) + horizon)
+                if rows[0] >= 0 and rows[-1] < len(environment):
+                    lagged = environment[rows]
+                    if np.isfinite(lagged).all():
+                        covariates = lagged
+            inputs[(city, disease)] = (y, int(first_label[5:7]), cube.months[span[-1]], covariates)
+    return inputs
+
+
+def _input_hash(y: np.ndarray, first_month: int, last_label: str, covariates: Optional[np.ndarray], horizon: int) -> str:
+    digest = hashlib.sha256()
+    digest.update(f"{MODEL_VERSION}|{horizon}|{first_month}|{last_label}|".encode())
+    digest.update(np.ascontiguousarray(y, dtype=np.float64).tobytes())
+    if covariates is not None:
+        digest.update(np.ascontiguousarray(covariates, dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+def _future_months(last_label: str, horizon: int) -> List[str]:
+    start = pd.Period(last_label[:7], freq="M") + 1
+    return [p.start_time.strftime("%Y-%m-%d") for p in pd.period_range(start, periods=horizon, freq="M")]
+
+
+# ---------------- MODEL CACHE ----------------
+def default_model_cache(file_path: str) -> str:
+    source = os.path.abspath(file_path)
+    stem = os.path.splitext(os.path.basename(source))[0]
+    return os.path.join(os.path.dirname(source), CACHE_DIR_NAME, f"{stem}_forecasts.json")
+
+
+def _read_models(path: str) -> Dict[str, Dict[str, object]]:
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            stored = json.load(fh)
+        return stored.get("models", {}) if stored.get("version") == MODEL_VERSION else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_models(path: str, models: Dict[str, Dict[str, object]]) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        json.dump({"version": MODEL_VERSION, "models": models}, fh)
+    os.replace(tmp_path, path)
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_fit_lock = threading.Lock()
+# Last result per (cache file, metric, horizon) with the cube and archive it was built from
+_recent: Dict[tuple, Tuple[DiseaseCube, Optional[EnvArchive], Dict[Tuple[str, str], Dict[str, object]]]] = {}
+
+
+def _executor(max_workers: Optional[int]) -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: forking a process that already runs server and fetch threads is unsafe
+            _pool = ProcessPoolExecutor(max_workers=max_workers or os.cpu_count() or 1,
+                                        mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def forecast_cases(cube: DiseaseCube, model_cache: str, archive: Optional[EnvArchive] = None,
+                   metric: str = "Population_Affected", horizon: int = HORIZON,
+                   max_workers: Optional[int] = None) -> Dict[Tuple[str, str], Dict[str, object]]:
+    """Next ``horizon`` months for every (city, disease) series.
+
+    Fitted models are stored in ``model_cache`` keyed by a hash of each series' inputs, so
+    only series whose data (or lagged covariates) changed are refit; refits run on a process
+    pool when there are enough of them. Returns records with ``months``, ``forecast``,
+    ``model`` and ``holdout_mae``; repeated calls with the same cube and archive objects
+    return the previous result without touching the disk.
+    """
+    memo_key = (os.path.abspath(model_cache), metric, horizon)
+    recent = _recent.get(memo_key)
+    if recent is not None and recent[0] is cube and recent[1] is archive:
+        return recent[2]
+
+    inputs = _series_inputs(cube, archive, metric, horizon)
+    hashes = {key: _input_hash(y, first, last, cov, horizon) for key, (y, first, last, cov) in inputs.items()}
+
+    # One writer at a time so concurrent sessions do not fit the same series twice
+    with _fit_lock:
+        stored = _read_models(model_cache)
+        pending = []
+        for (city, disease), digest in hashes.items():
+            if digest not in stored:
+                y, first_month, _, covariates = inputs[(city, disease)]
+                pending.append((f"{city}|{disease}", y, first_month, covariates, horizon))
+        if pending:
+            if len(pending) >= MIN_PARALLEL_FITS:
+                pool = _executor(max_workers)
+                workers = max_workers or os.cpu_count() or 1
+                batches = [pending[i::workers] for i in range(workers) if pending[i::workers]]
+                fitted = [item for batch in pool.map(_fit_batch, batches) for item in batch]
+            else:
+                fitted = _fit_batch(pending)
+            by_key = dict(fitted)
+            for (city, disease), digest in hashes.items():
+                record = by_key.get(f"{city}|{disease}")
+                if record is not None:
+                    stored[digest] = record
+            # Drop models whose inputs no longer occur
+            stored = {digest: stored[digest] for digest in set(hashes.values()) if digest in stored}
+            try:
+                _write_models(model_cache, stored)
+            except OSError:
+                # Unwritable cache directory: results still returned, refit next process
+                pass
+
+    results = {}
+    for key, digest in hashes.items():
+        record = dict(stored[digest])
+        record["months"] = _future_months(inputs[key][2], horizon)
+        results[key] = record
+    _recent[memo_key] = (cube, archive, results)
+    return results
@@ -0,0 +1,169 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional, Tuple, Dict, Iterable, Iterator
+
+from owm_client import get_client
+
+# Offline gazetteer: every city in the bundled disease dataset plus the dashboard's defaults
+GAZETTEER: Dict[str, Tuple[float, float]] = {
+    "amritsar": (31.6340, 74.8723),
+    "chandigarh": (30.7333, 76.7794),
+    "faridabad": (28.4089, 77.3178),
+    "gurdaspur": (32.0409, 75.4061),
+    "gurugram": (28.4595, 77.0266),
+    "jammu": (32.7266, 74.8570),
+    "ludhiana": (30.9010, 75.8573),
+    "manali": (32.2432, 77.1892),
+    "panchkula": (30.6942, 76.8606),
+    "pathankot": (32.2643, 75.6421),
+    "shimla": (31.1048, 77.1734),
+    "srinagar": (34.0837, 74.7973),
+}
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".geocode.sqlite3")
+
+# Coordinates do not move; entries older than this are re-checked in the background
+REFRESH_AFTER = 90 * 24 * 60 * 60
+
+
+# ---------------- PERSISTENT STORE ----------------
+class GeocodeStore:
+    """SQLite-backed city -> (lat, lon) store that survives restarts and cache clears"""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        self.db_path = db_path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS geocode ("
+                " city_key TEXT PRIMARY KEY,"
+                " city TEXT NOT NULL,"
+                " lat REAL NOT NULL,"
+                " lon REAL NOT NULL,"
+                " source TEXT NOT NULL,"
+                " updated_at REAL NOT NULL)"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # A short-lived connection per call keeps the store safe to use from any thread
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def lookup(self, city: str) -> Optional[Tuple[float, float, float]]:
+        """(lat, lon, updated_at) for a city, or None when it has never been resolved"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT lat, lon, updated_at FROM geocode WHERE city_key = ?", (city.strip().lower(),)
+            ).fetchone()
+        return row
+
+    def put(self, city: str, lat: float, lon: float, source: str = "owm") -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO geocode (city_key, city, lat, lon, source, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (city.strip().lower(), city.strip(), lat, lon, source, time.time()),
+            )
+
+    def preload(self, coords: Dict[str, Tuple[float, float]], source: str = "gazetteer") -> None:
+        """Insert entries that are not stored yet; existing (possibly fresher) rows are kept"""
+        now = time.time()
+        rows = [(city.lower(), city, lat, lon, source, now) for city, (lat, lon) in coords.items()]
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO geocode (city_key, city, lat, lon, source, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def missing(self, cities: Iterable[str]) -> list:
+        """Cities from the list that have no stored coordinates"""
+        return [city for city in cities if self.lookup(city) is None]
+
+
+_stores: Dict[str, GeocodeStore] = {}
+_stores_lock = threading.Lock()
+_refreshing = set()
+
+
+def get_geocode_store(db_path: str = DEFAULT_DB_PATH) -> GeocodeStore:
+    """Process-wide store per database file, preloaded with the gazetteer on first use"""
+    with _stores_lock:
+        store = _stores.get(db_path)
+        if store is None:
+            store = GeocodeStore(db_path)
+            store.preload(GAZETTEER)
+            _stores[db_path] = store
+        return store
+
+
+# ---------------- RESOLUTION ----------------
+def _geocode_online(city: str, api_key: str) -> Optional[Tuple[float, float]]:
+    geo_data = get_client(api_key).geocode(city)
+    if geo_data:
+        return geo_data[0]["lat"], geo_data[0]["lon"]
+    return None
+
+
+def _refresh_in_background(store: GeocodeStore, city: str, api_key: str) -> None:
+    key = (store.db_path, city.strip().lower())
+    with _stores_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+
+    def refresh():
+        try:
+            coords = _geocode_online(city, api_key)
+            if coords:
+                store.put(city, *coords)
+        except Exception:
+            # Keep serving the stored coordinates; the next stale lookup tries again
+            pass
+        finally:
+            with _stores_lock:
+                _refreshing.discard(key)
+
+    threading.Thread(target=refresh, name=f"geocode-refresh-{city}", daemon=True).start()
+
+
+def resolve_coordinates(city: str, api_key: str, store: Optional[GeocodeStore] = None,
+                        refresh_after: float = REFRESH_AFTER) -> Tuple[Optional[float], Optional[float]]:
+    """Coordinates from the local store, falling back to the OWM geocoding API once.
+
+    Network errors propagate only when the city is unknown locally.
+    """
+    store = store or get_geocode_store()
+    cached = store.lookup(city)
+    if cached is not None:
+        lat, lon, updated_at = cached
+        if time.time() - updated_at > refresh_after:
+            _refresh_in_background(store, city, api_key)
+        return lat, lon
+
+    coords = _geocode_online(city, api_key)
+    if coords is None:
+        return None, None
+    store.put(city, *coords)
+    return coords
+
+
+def warm_geocode_store(cities: Iterable[str], api_key: str, store: Optional[GeocodeStore] = None) -> list:
+    """Resolve every city that is not stored yet; returns the ones that could not be resolved"""
+    store = store or get_geocode_store()
+    unresolved = []
+    for city in store.missing(cities):
+        try:
+            if resolve_coordinates(city, api_key, store) == (None, None):
+                unresolved.append(city)
+        except Exception:
+            unresolved.append(city)
+    return unresolved
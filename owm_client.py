@@ -0,0 +1,339 @@
+import os
+import random
+import threading
+import time
+from typing import Optional, Dict, Any, Tuple, Callable, Hashable
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Point at a local stand-in (see owm_stub.py) by setting OWM_BASE_URL
+OWM_BASE_URL = os.getenv("OWM_BASE_URL", "https://api.openweathermap.org")
+
+# Upstream responses worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Free OpenWeatherMap plans allow 60 calls per minute
+DEFAULT_CALLS_PER_MINUTE = 60
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Raised without touching the network while the circuit breaker is open"""
+
+
+# ---------------- CIRCUIT BREAKER ----------------
+class CircuitBreaker:
+    """Stop calling upstream after repeated failures, then probe again after a cool-down.
+
+    closed -> open after ``failure_threshold`` consecutive failures; open -> half-open once
+    ``reset_timeout`` seconds have passed. Half-open admits a single probe and keeps failing
+    everyone else fast; a successful probe closes it again, a failed one re-opens it. A probe
+    that never reports back is given up on after another ``reset_timeout``.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_started: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            now = time.monotonic()
+            if now - self._opened_at < self.reset_timeout:
+                return False
+            if self._probe_started is not None and now - self._probe_started < self.reset_timeout:
+                return False
+            self._probe_started = now
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probe_started = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                # Re-arm the cool-down, including after a failed half-open probe
+                self._opened_at = time.monotonic()
+                self._probe_started = None
+
+
+# ---------------- RATE LIMITING ----------------
+class TokenBucket:
+    """Thread-safe token bucket: ``rate_per_minute`` sustained, bursts of up to ``capacity``"""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else max(1.0, rate_per_minute / 6.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def set_rate(self, rate_per_minute: float, capacity: Optional[float] = None) -> None:
+        """Retune the sustained rate and burst size, keeping the tokens already spent spent"""
+        with self._lock:
+            self._refill()
+            self.rate = rate_per_minute / 60.0
+            self.capacity = capacity if capacity is not None else max(1.0, rate_per_minute / 6.0)
+            self._tokens = min(self._tokens, self.capacity)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens: float = 1.0, timeout: Optional[float] = None) -> bool:
+        """Block until ``tokens`` are available and take them.
+
+        Returns False, without waiting it out, once the tokens cannot arrive within ``timeout``.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait_time = (tokens - self._tokens) / self.rate
+            if deadline is not None and time.monotonic() + wait_time > deadline:
+                return False
+            time.sleep(wait_time)
+
+
+# ---------------- REQUEST COALESCING ----------------
+class _InFlight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Collapse concurrent identical calls into one; followers wait for the leader's result.
+
+    Results are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, _InFlight] = {}
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "executed": 0, "coalesced": 0}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            self.stats["calls"] += 1
+            call = self._in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = self._in_flight[key] = _InFlight()
+                self.stats["executed"] += 1
+            else:
+                self.stats["coalesced"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            call.done.set()
+
+    def snapshot_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats, in_flight=len(self._in_flight))
+
+
+# ---------------- CLIENT ----------------
+class OWMClient:
+    """Pooled, retrying client for the OpenWeatherMap endpoints used by the dashboard"""
+
+    def __init__(self, api_key: str, base_url: str = OWM_BASE_URL, pool_size: int = 10,
+                 max_retries: int = 3, backoff_base: float = 0.5, backoff_cap: float = 8.0,
+                 timeout: float = 10, breaker: Optional[CircuitBreaker] = None,
+                 rate_limiter: Optional[TokenBucket] = None):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+        # Shared by everything using this API key, so the plan's quota covers UI and batch calls
+        self.rate_limiter = rate_limiter
+        # Identical requests in flight at the same time (e.g. many sessions on one city) share one call
+        self.single_flight = SingleFlight()
+
+        # Retries are handled here (with jitter and the breaker), not by urllib3
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0, pool_block=True)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Full-jitter exponential backoff, honouring a numeric Retry-After header"""
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_cap)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+
+    @staticmethod
+    def _pause_before_retry(pause: float, deadline: Optional[float]) -> bool:
+        """Sleep ``pause`` seconds, or return False when that would run past ``deadline``"""
+        if deadline is not None and time.monotonic() + pause >= deadline:
+            return False
+        time.sleep(pause)
+        return True
+
+    def get_json(self, path: str, params: Dict[str, Any], timeout: Optional[float] = None,
+                 deadline: Optional[float] = None) -> Any:
+        """GET ``path`` with the API key, coalescing identical concurrent requests"""
+        key = (path, tuple(sorted((k, str(v)) for k, v in params.items())))
+        return self.single_flight.do(key, lambda: self._get_json(path, params, timeout, deadline))
+
+    def _get_json(self, path: str, params: Dict[str, Any], timeout: Optional[float] = None,
+                  deadline: Optional[float] = None) -> Any:
+        """GET ``path`` with the API key, retrying 429/5xx and connection errors.
+
+        ``deadline`` (a ``time.monotonic()`` value) is when the caller stops waiting: each
+        attempt's timeout is cut to the time left, and no retry or wait for a rate-limit token
+        starts that would end after it.
+        """
+        if not self.breaker.allow_request():
+            raise CircuitOpenError(f"OpenWeatherMap circuit open; skipping {path}")
+
+        url = f"{self.base_url}{path}"
+        query = {**params, "appid": self.api_key}
+        timeout = self.timeout if timeout is None else timeout
+
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            if self.rate_limiter is not None:
+                wait_limit = None if deadline is None else deadline - time.monotonic()
+                if not self.rate_limiter.acquire(timeout=wait_limit):
+                    raise requests.exceptions.Timeout(f"Deadline passed waiting for a rate-limit token for {path}")
+            attempt_timeout = timeout
+            if deadline is not None:
+                attempt_timeout = min(timeout, deadline - time.monotonic())
+                if attempt_timeout <= 0:
+                    raise requests.exceptions.Timeout(f"Deadline passed before requesting {path}")
+            try:
+                response = self.session.get(url, params=query, timeout=attempt_timeout)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if last_attempt or not self._pause_before_retry(self._backoff(attempt), deadline):
+                    self.breaker.record_failure()
+                    raise
+                continue
+
+            if response.status_code in RETRY_STATUSES:
+                pause = self._backoff(attempt, response.headers.get("Retry-After"))
+                if last_attempt or not self._pause_before_retry(pause, deadline):
+                    self.breaker.record_failure()
+                    response.raise_for_status()
+                continue
+
+            # Other 4xx (bad key, unknown city) are caller errors, not upstream health
+            self.breaker.record_success()
+            response.raise_for_status()
+            return response.json()
+
+    # Endpoint helpers
+    def geocode(self, city: str, limit: int = 1, timeout: Optional[float] = None) -> list:
+        return self.get_json("/geo/1.0/direct", {"q": city, "limit": limit}, timeout)
+
+    def current_weather(self, lat: float, lon: float, timeout: Optional[float] = None,
+                        deadline: Optional[float] = None) -> dict:
+        return self.get_json("/data/2.5/weather", {"lat": lat, "lon": lon, "units": "metric"}, timeout, deadline)
+
+    def forecast(self, lat: float, lon: float, timeout: Optional[float] = None,
+                 deadline: Optional[float] = None) -> dict:
+        return self.get_json("/data/2.5/forecast", {"lat": lat, "lon": lon, "units": "metric"}, timeout, deadline)
+
+    def air_pollution(self, lat: float, lon: float, timeout: Optional[float] = None,
+                      deadline: Optional[float] = None) -> dict:
+        return self.get_json("/data/2.5/air_pollution", {"lat": lat, "lon": lon}, timeout, deadline)
+
+
+_clients: Dict[Tuple[str, str], OWMClient] = {}
+_clients_lock = threading.Lock()
+# One token bucket per API key: the OWM quota is per key, whatever the base URL or caller
+_buckets: Dict[str, TokenBucket] = {}
+
+
+def _bucket(api_key: str) -> TokenBucket:
+    """The key's token bucket, created at the default plan rate on first use (call under _clients_lock)"""
+    bucket = _buckets.get(api_key)
+    if bucket is None:
+        bucket = _buckets[api_key] = TokenBucket(DEFAULT_CALLS_PER_MINUTE)
+    return bucket
+
+
+def get_client(api_key: str, base_url: str = OWM_BASE_URL) -> OWMClient:
+    """Process-wide client per (API key, base URL) so every caller shares one connection pool.
+
+    Every client for a key draws from that key's token bucket, so interactive and batch
+    calls spend from one quota whichever base URL they go to.
+    """
+    key = (api_key, base_url)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = OWMClient(api_key, base_url, rate_limiter=_bucket(api_key))
+            _clients[key] = client
+        return client
+
+
+def configure_rate_limit(api_key: str, calls_per_minute: float, capacity: Optional[float] = None) -> TokenBucket:
+    """Size the key's token bucket to the OWM plan.
+
+    The bucket is kept for the life of the process and shared by every client for the key.
+    Later calls leave it alone when the limit is unchanged, or retune it in place, so a new
+    batch does not start with a fresh burst on top of calls already made in the last minute.
+    """
+    with _clients_lock:
+        bucket = _bucket(api_key)
+        if bucket.rate != calls_per_minute / 60.0 or (capacity is not None and bucket.capacity != capacity):
+            bucket.set_rate(calls_per_minute, capacity)
+    return bucket
+
+
+def coalescing_stats(api_key: str, base_url: str = OWM_BASE_URL) -> Dict[str, int]:
+    """How many calls the shared client received, sent upstream and coalesced"""
+    return get_client(api_key, base_url).single_flight.snapshot_stats()
@@ -0,0 +1,320 @@
+"""Local stand-in for the OpenWeatherMap endpoints used by the dashboard.
+
+Serves /geo/1.0/direct, /data/2.5/weather, /data/2.5/forecast and /data/2.5/air_pollution
+from recorded fixtures or deterministic synthetic data, with injectable latency, 5xx
+errors and 429s. In record mode, requests without a fixture are proxied to the real API
+and the responses are saved for later replay.
+
+    python owm_stub.py --port 8089 --latency 0.2 --error-rate 0.05
+    python owm_stub.py --record --fixtures owm_fixtures   # needs a real API key in the app
+    OWM_BASE_URL=http://127.0.0.1:8089 streamlit run proj.py
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Dict, Any, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import requests
+
+from geocode import GAZETTEER
+
+UPSTREAM_URL = "https://api.openweathermap.org"
+ENDPOINT_PATHS = ("/geo/1.0/direct", "/data/2.5/weather", "/data/2.5/forecast", "/data/2.5/air_pollution")
+
+
+@dataclass
+class StubConfig:
+    """Behaviour knobs for the stub server"""
+    fixtures_dir: Optional[str] = None
+    record: bool = False
+    upstream: str = UPSTREAM_URL
+    latency: float = 0.0            # seconds added to every response
+    latency_jitter: float = 0.0     # extra uniform random delay on top of ``latency``
+    error_rate: float = 0.0         # fraction of requests answered with 503
+    rate_limit_rate: float = 0.0    # fraction of requests answered with 429
+    quota_per_minute: Optional[int] = None  # hard cap; requests above it get 429
+    seed: Optional[int] = None
+
+
+# ---------------- FIXTURES ----------------
+def _normalize_params(params: Dict[str, str]) -> Dict[str, str]:
+    """Drop the API key and round coordinates so equivalent requests share a fixture"""
+    normalized = {}
+    for key, value in params.items():
+        if key == "appid":
+            continue
+        if key in ("lat", "lon"):
+            try:
+                value = f"{float(value):.4f}"
+            except ValueError:
+                pass
+        elif key == "q":
+            value = value.strip().lower()
+        normalized[key] = value
+    return dict(sorted(normalized.items()))
+
+
+def fixture_path(fixtures_dir: str, path: str, params: Dict[str, str]) -> str:
+    normalized = _normalize_params(params)
+    digest = hashlib.sha1(f"{path}?{urlencode(normalized)}".encode("utf-8")).hexdigest()[:16]
+    return os.path.join(fixtures_dir, path.strip("/").replace("/", "_"), f"{digest}.json")
+
+
+def load_fixture(fixtures_dir: str, path: str, params: Dict[str, str]) -> Optional[Tuple[int, Any]]:
+    try:
+        with open(fixture_path(fixtures_dir, path, params), "r", encoding="utf-8") as fh:
+            fixture = json.load(fh)
+        return fixture["status"], fixture["body"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def save_fixture(fixtures_dir: str, path: str, params: Dict[str, str], status: int, body: Any) -> None:
+    target = fixture_path(fixtures_dir, path, params)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp_path = f"{target}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        json.dump({"path": path, "params": _normalize_params(params), "status": status, "body": body}, fh)
+    os.replace(tmp_path, target)
+
+
+# ---------------- SYNTHETIC DATA ----------------
+def _rng_for(*parts: Any) -> random.Random:
+    """Deterministic generator per location so repeated calls return consistent data"""
+    seed = hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+    return random.Random(int(seed[:12], 16))
+
+
+def _synthetic_conditions(lat: float, lon: float, ts: float, rng: random.Random) -> Dict[str, Any]:
+    day_of_year = time.gmtime(ts).tm_yday
+    hour = (time.gmtime(ts).tm_hour + lon / 15.0) % 24
+    seasonal = 8 * math.sin(2 * math.pi * (day_of_year - 105) / 365)
+    diurnal = 5 * math.sin(2 * math.pi * (hour - 9) / 24)
+    temp = 30 - 0.4 * (abs(lat) - 20) + seasonal + diurnal + rng.uniform(-1.5, 1.5)
+    humidity = int(min(100, max(10, 60 - diurnal * 3 + rng.uniform(-15, 15))))
+    conditions = {
+        "main": {"temp": round(temp, 2), "feels_like": round(temp + 1, 2), "humidity": humidity,
+                 "pressure": int(1010 + rng.uniform(-8, 8))},
+        "wind": {"speed": round(rng.uniform(0.2, 8), 2), "deg": rng.randint(0, 359)},
+        "weather": [{"id": 800, "main": "Clear", "description": "clear sky", "icon": "01d"}],
+        "dt": int(ts),
+    }
+    if humidity > 75 and rng.random() < 0.5:
+        conditions["rain"] = {"1h": round(rng.uniform(0.2, 20), 2)}
+        conditions["weather"] = [{"id": 500, "main": "Rain", "description": "light rain", "icon": "10d"}]
+    return conditions
+
+
+def synthetic_response(path: str, params: Dict[str, str]) -> Tuple[int, Any]:
+    """Plausible OWM-shaped payloads derived from the request parameters"""
+    if path == "/geo/1.0/direct":
+        city = params.get("q", "").split(",")[0].strip()
+        if not city:
+            return 400, {"cod": "400", "message": "Nothing to geocode"}
+        if city.lower() in GAZETTEER:
+            lat, lon = GAZETTEER[city.lower()]
+        else:
+            rng = _rng_for("geo", city.lower())
+            lat, lon = round(rng.uniform(8, 34), 4), round(rng.uniform(69, 89), 4)
+        return 200, [{"name": city.title(), "lat": lat, "lon": lon, "country": "IN"}]
+
+    try:
+        lat, lon = float(params["lat"]), float(params["lon"])
+    except (KeyError, ValueError):
+        return 400, {"cod": "400", "message": "wrong latitude or longitude"}
+    now = time.time()
+    # Change once per 10 minutes, like the upstream current-conditions cadence
+    rng = _rng_for(path, round(lat, 4), round(lon, 4), int(now // 600))
+
+    if path == "/data/2.5/weather":
+        body = _synthetic_conditions(lat, lon, now, rng)
+        body.update({"coord": {"lat": lat, "lon": lon}, "name": "Stub", "cod": 200})
+        return 200, body
+
+    if path == "/data/2.5/forecast":
+        start = (int(now) // 10800 + 1) * 10800
+        steps = []
+        for i in range(40):
+            ts = start + i * 10800
+            step = _synthetic_conditions(lat, lon, ts, rng)
+            step["dt_txt"] = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(ts))
+            steps.append(step)
+        return 200, {"cod": "200", "cnt": len(steps), "list": steps,
+                     "city": {"name": "Stub", "coord": {"lat": lat, "lon": lon}}}
+
+    if path == "/data/2.5/air_pollution":
+        pm25 = rng.uniform(5, 180)
+        components = {
+            "co": round(rng.uniform(200, 2500), 2),
+            "no": round(rng.uniform(0, 20), 2),
+            "no2": round(rng.uniform(5, 90), 2),
+            "o3": round(rng.uniform(10, 160), 2),
+            "so2": round(rng.uniform(2, 60), 2),
+            "pm2_5": round(pm25, 2),
+            "pm10": round(pm25 * rng.uniform(1.2, 2.0), 2),
+            "nh3": round(rng.uniform(0, 30), 2),
+        }
+        api_aqi = 1 + min(4, int(pm25 // 30))
+        return 200, {"coord": {"lat": lat, "lon": lon},
+                     "list": [{"main": {"aqi": api_aqi}, "components": components, "dt": int(now)}]}
+
+    return 404, {"cod": "404", "message": "Internal error"}
+
+
+# ---------------- SERVER ----------------
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], config: StubConfig):
+        super().__init__(address, StubRequestHandler)
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.lock = threading.Lock()
+        self.window_start = time.monotonic()
+        self.window_calls = 0
+        self.stats = {"requests": 0, "fixtures": 0, "synthetic": 0, "recorded": 0, "errors": 0, "rate_limited": 0}
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, key: str) -> None:
+        with self.lock:
+            self.stats[key] += 1
+
+    def draw_fault(self) -> Optional[int]:
+        """Status code of an injected fault for this request, if any"""
+        config = self.config
+        with self.lock:
+            if config.quota_per_minute is not None:
+                now = time.monotonic()
+                if now - self.window_start >= 60:
+                    self.window_start, self.window_calls = now, 0
+                self.window_calls += 1
+                if self.window_calls > config.quota_per_minute:
+                    return 429
+            roll = self.rng.random()
+            delay = config.latency + (self.rng.uniform(0, config.latency_jitter) if config.latency_jitter else 0)
+        if delay > 0:
+            time.sleep(delay)
+        if roll < config.rate_limit_rate:
+            return 429
+        if roll < config.rate_limit_rate + config.error_rate:
+            return 503
+        return None
+
+
+class StubRequestHandler(BaseHTTPRequestHandler):
+    server: StubServer
+
+    def log_message(self, format: str, *args: Any) -> None:
+        # Keep benchmark output clean; counts are available in server.stats
+        pass
+
+    def _send_json(self, status: int, body: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self) -> None:
+        server = self.server
+        config = server.config
+        server.count("requests")
+        parts = urlsplit(self.path)
+        path, params = parts.path, dict(parse_qsl(parts.query))
+
+        if path not in ENDPOINT_PATHS:
+            self._send_json(404, {"cod": "404", "message": "Internal error"})
+            return
+
+        fault = server.draw_fault()
+        if fault == 429:
+            server.count("rate_limited")
+            self._send_json(429, {"cod": 429, "message": "Your account is temporary blocked due to exceeding of requests limitation"},
+                            {"Retry-After": "1"})
+            return
+        if fault is not None:
+            server.count("errors")
+            self._send_json(fault, {"cod": fault, "message": "Service temporarily unavailable"})
+            return
+
+        if config.fixtures_dir:
+            fixture = load_fixture(config.fixtures_dir, path, params)
+            if fixture is not None:
+                server.count("fixtures")
+                self._send_json(*fixture)
+                return
+            if config.record:
+                try:
+                    upstream = requests.get(f"{config.upstream.rstrip('/')}{path}", params=params, timeout=15)
+                    body = upstream.json()
+                except (requests.exceptions.RequestException, ValueError) as e:
+                    self._send_json(502, {"cod": 502, "message": f"Upstream error: {e}"})
+                    return
+                if upstream.status_code == 200:
+                    save_fixture(config.fixtures_dir, path, params, upstream.status_code, body)
+                    server.count("recorded")
+                self._send_json(upstream.status_code, body)
+                return
+
+        server.count("synthetic")
+        self._send_json(*synthetic_response(path, params))
+
+
+def start_stub_server(config: Optional[StubConfig] = None, host: str = "127.0.0.1",
+                      port: int = 0) -> Tuple[StubServer, threading.Thread]:
+    """Run the stub on a background thread (port 0 picks a free port); see ``server.base_url``"""
+    server = StubServer((host, port), config or StubConfig())
+    thread = threading.Thread(target=server.serve_forever, name="owm-stub", daemon=True)
+    thread.start()
+    return server, thread
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local OpenWeatherMap stand-in for offline runs and benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--fixtures", help="directory of recorded responses to replay (and record into)")
+    parser.add_argument("--record", action="store_true", help="proxy fixture misses to --upstream and save them")
+    parser.add_argument("--upstream", default=UPSTREAM_URL)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds of delay per response")
+    parser.add_argument("--latency-jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--quota-per-minute", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.record and not args.fixtures:
+        parser.error("--record needs --fixtures")
+
+    config = StubConfig(fixtures_dir=args.fixtures, record=args.record, upstream=args.upstream,
+                        latency=args.latency, latency_jitter=args.latency_jitter, error_rate=args.error_rate,
+                        rate_limit_rate=args.rate_limit_rate, quota_per_minute=args.quota_per_minute, seed=args.seed)
+    server = StubServer((args.host, args.port), config)
+    print(f"OWM stub listening on {server.base_url} (set OWM_BASE_URL to use it)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(server.stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -10,10 +10,38 @@ import os
 from typing import Optional, Tuple, Dict, Any
 import time
 
+from analytics import MAX_LAG, MIN_PERIODS, correlate, lagged_correlation, seasonal_anomalies
+from aqi import get_aqi_category
+from batch_collector import CityEnvironment, collect_environment
+from bootstrap import get_bootstrap_service
+from charts import (
+    aqi_bar_option, aqi_gauge_option, city_trend_chart, disease_trend_chart, distribution_pie_option,
+    point_budget, precompute_disease_charts, risk_level_bar_option, risk_radar_option, risk_score_option,
+    risk_timeline_option, weather_trend_option,
+)
+from disease_cube import DiseaseCube
+from disease_data import REQUIRED_COLUMNS, get_shared_dataset, revalidate_shared_dataset
+from env_archive import ARCHIVE_VARIABLES, VARIABLE_LABELS, load_env_archive, record_snapshots
+from environment import ENDPOINT_TTLS, ENDPOINTS, EnvironmentSnapshot, environment_cache, get_environment
+from forecasting import default_model_cache, forecast_cases
+from geocode import resolve_coordinates, warm_geocode_store
+from risk import assess_risk, forecast_risk_timeline, score_locations
+
 # ---------------- CONFIG ----------------
+# Shared data is handed to every session as views; copy-on-write keeps those views read-only.
+# pandas >= 3 always copies on write and deprecates the option.
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
 st.set_page_config(page_title="Environment–Disease Correlation Dashboard", layout="wide")
 st.title("🌍 Environment–Disease Correlation Dashboard 🩺")
 
+# Line charts carry at most this many points per x axis, whatever the data frequency
+CHART_POINTS = point_budget()
+
+# How often a running bootstrap job is polled by its own fragment
+BOOTSTRAP_POLL_SECONDS = 2.0
+
 # ---------------- SECURE API KEY HANDLING ----------------
 @st.cache_data(show_spinner=False)
 def get_api_key():
@@ -38,235 +66,72 @@ if not api or api == "your_api_key_here":
     st.stop()
 
 # ---------------- UTILITY FUNCTIONS ----------------
-# Corrected coordinates for Indian cities
-fallback_coords = {
-    "pathankot": (32.2643, 75.6421),
-    "jammu": (32.7266, 74.8570),        # Fixed: Correct Jammu coordinates
-    "shimla": (31.1048, 77.1734),       # Fixed: More precise coordinates
-    "gurdaspur": (32.0409, 75.4061),    # Fixed: More precise coordinates
-    "gurugram": (28.4595, 77.0266)      # Fixed: More precise coordinates
-}
-
-@st.cache_data(ttl=300, show_spinner=False)  # Cache for 5 minutes
 def get_coordinates(city: str) -> Tuple[Optional[float], Optional[float]]:
-    """Centralized coordinate fetching with proper error handling"""
+    """Coordinates from the persistent geocode store (gazetteer + past lookups), geocoding only unknown cities"""
     try:
-        geo_url = f"http://api.openweathermap.org/geo/1.0/direct?q={city}&limit=1&appid={api}"
-        response = requests.get(geo_url, timeout=10)
-        response.raise_for_status()
-        
-        geo_data = response.json()
-        if geo_data:
-            return geo_data[0]["lat"], geo_data[0]["lon"]
-        elif city.lower() in fallback_coords:
-            return fallback_coords[city.lower()]
-        else:
-            return None, None
+        return resolve_coordinates(city, api)
     except requests.exceptions.RequestException as e:
         st.warning(f"API request failed for {city}: {e}")
-        if city.lower() in fallback_coords:
-            return fallback_coords[city.lower()]
         return None, None
     except (KeyError, IndexError, ValueError) as e:
         st.warning(f"Data parsing error for {city}: {e}")
         return None, None
 
-# ---------------- COMPREHENSIVE AQI CALCULATION FUNCTIONS ----------------
-def calculate_aqi(concentration: float, breakpoints: list) -> Optional[int]:
-    """Calculate AQI based on concentration and breakpoints"""
-    if concentration is None or concentration < 0:
-        return None
-    for bp_low, bp_high, aqi_low, aqi_high in breakpoints:
-        if bp_low <= concentration <= bp_high:
-            return round(((aqi_high - aqi_low)/(bp_high - bp_low)) * (concentration - bp_low) + aqi_low)
-    # If concentration exceeds all breakpoints, return max AQI
-    return 500
-
-def calculate_pm25_aqi(concentration: float) -> Optional[int]:
-    """Calculate PM2.5 AQI using EPA breakpoints"""
-    if concentration is None:
-        return None
-    breakpoints_pm25 = [
-        (0.0, 12.0, 0, 50),
-        (12.1, 35.4, 51, 100),
-        (35.5, 55.4, 101, 150),
-        (55.5, 150.4, 151, 200),
-        (150.5, 250.4, 201, 300),
-        (250.5, 350.4, 301, 400),
-        (350.5, 500.4, 401, 500),
-    ]
-    return calculate_aqi(concentration, breakpoints_pm25)
-
-def calculate_pm10_aqi(concentration: float) -> Optional[int]:
-    """Calculate PM10 AQI using EPA breakpoints"""
-    if concentration is None:
-        return None
-    breakpoints_pm10 = [
-        (0, 54, 0, 50),
-        (55, 154, 51, 100),
-        (155, 254, 101, 150),
-        (255, 354, 151, 200),
-        (355, 424, 201, 300),
-        (425, 504, 301, 400),
-        (505, 604, 401, 500),
-    ]
-    return calculate_aqi(concentration, breakpoints_pm10)
-
-def calculate_o3_aqi(concentration_ugm3: float) -> Optional[int]:
-    """Calculate Ozone AQI (8-hour average) - concentration in µg/m³"""
-    if concentration_ugm3 is None:
-        return None
-    
-    # Convert from µg/m³ to ppb: For O3: 1 ppb = 1.96 µg/m³ at 25°C
-    concentration_ppb = concentration_ugm3 / 1.96
-    
-    breakpoints_o3 = [
-        (0, 54, 0, 50),
-        (55, 70, 51, 100),
-        (71, 85, 101, 150),
-        (86, 105, 151, 200),
-        (106, 200, 201, 300),
-        (201, 404, 301, 400),
-        (405, 604, 401, 500),
-    ]
-    return calculate_aqi(concentration_ppb, breakpoints_o3)
-
-def calculate_no2_aqi(concentration: float) -> Optional[int]:
-    """Calculate NO2 AQI (1-hour average) - concentration in µg/m³"""
-    if concentration is None:
-        return None
-    
-    # Convert from µg/m³ to ppb: NO2: 1 ppb = 1.88 µg/m³
-    concentration_ppb = concentration / 1.88
-    
-    breakpoints_no2 = [
-        (0, 53, 0, 50),
-        (54, 100, 51, 100),
-        (101, 360, 101, 150),
-        (361, 649, 151, 200),
-        (650, 1249, 201, 300),
-        (1250, 1649, 301, 400),
-        (1650, 2049, 401, 500),
-    ]
-    return calculate_aqi(concentration_ppb, breakpoints_no2)
-
-def calculate_so2_aqi(concentration: float) -> Optional[int]:
-    """Calculate SO2 AQI (1-hour average) - concentration in µg/m³"""
-    if concentration is None:
-        return None
-    
-    # Convert from µg/m³ to ppb: SO2: 1 ppb = 2.62 µg/m³
-    concentration_ppb = concentration / 2.62
-    
-    breakpoints_so2 = [
-        (0, 35, 0, 50),
-        (36, 75, 51, 100),
-        (76, 185, 101, 150),
-        (186, 304, 151, 200),
-        (305, 604, 201, 300),
-        (605, 804, 301, 400),
-        (805, 1004, 401, 500),
-    ]
-    return calculate_aqi(concentration_ppb, breakpoints_so2)
-
-def calculate_co_aqi(concentration: float) -> Optional[int]:
-    """Calculate CO AQI (8-hour average) - concentration in µg/m³"""
-    if concentration is None:
-        return None
-    
-    # Convert from µg/m³ to ppm: CO: 1 ppm = 1145 µg/m³
-    concentration_ppm = concentration / 1145
-    
-    breakpoints_co = [
-        (0.0, 4.4, 0, 50),
-        (4.5, 9.4, 51, 100),
-        (9.5, 12.4, 101, 150),
-        (12.5, 15.4, 151, 200),
-        (15.5, 30.4, 201, 300),
-        (30.5, 40.4, 301, 400),
-        (40.5, 50.4, 401, 500),
-    ]
-    return calculate_aqi(concentration_ppm, breakpoints_co)
-
-def calculate_comprehensive_aqi(components: dict) -> dict:
-    """Calculate comprehensive AQI considering all pollutants"""
-    aqi_values = {}
-    
-    # Calculate AQI for each pollutant
-    if 'pm2_5' in components and components['pm2_5'] is not None:
-        aqi_values['PM2.5'] = calculate_pm25_aqi(components['pm2_5'])
-    
-    if 'pm10' in components and components['pm10'] is not None:
-        aqi_values['PM10'] = calculate_pm10_aqi(components['pm10'])
-    
-    if 'o3' in components and components['o3'] is not None:
-        aqi_values['O3'] = calculate_o3_aqi(components['o3'])
-    
-    if 'no2' in components and components['no2'] is not None:
-        aqi_values['NO2'] = calculate_no2_aqi(components['no2'])
-    
-    if 'so2' in components and components['so2'] is not None:
-        aqi_values['SO2'] = calculate_so2_aqi(components['so2'])
-    
-    if 'co' in components and components['co'] is not None:
-        aqi_values['CO'] = calculate_co_aqi(components['co'])
-    
-    # Filter out None values
-    valid_aqi_values = {k: v for k, v in aqi_values.items() if v is not None}
-    
-    if not valid_aqi_values:
-        return {'overall_aqi': None, 'dominant_pollutant': None, 'individual_aqis': {}}
-    
-    # Overall AQI is the maximum of all pollutant AQIs
-    overall_aqi = max(valid_aqi_values.values())
-    dominant_pollutant = max(valid_aqi_values, key=valid_aqi_values.get)
-    
-    return {
-        'overall_aqi': overall_aqi,
-        'dominant_pollutant': dominant_pollutant,
-        'individual_aqis': valid_aqi_values
-    }
-
-def get_comprehensive_aqi_data(lat: float, lon: float, api_key: str) -> dict:
-    """Fetch and calculate comprehensive AQI data"""
+def show_staleness(env: EnvironmentSnapshot) -> None:
+    """Note when cached data past its TTL is shown while a background refresh runs"""
+    if env.stale:
+        oldest = max(env.age(name) or 0 for name in env.stale)
+        st.caption(f"⏳ Showing data from {oldest / 60:.0f} min ago ({', '.join(env.stale)}); refreshing in the background.")
+
+def archive_observations(snapshots: Dict[str, EnvironmentSnapshot]) -> None:
+    """Append fetched conditions to the environmental archive used by the correlation matrix"""
     try:
-        aqi_url = f"http://api.openweathermap.org/data/2.5/air_pollution?lat={lat}&lon={lon}&appid={api_key}"
-        response = requests.get(aqi_url, timeout=10)
-        response.raise_for_status()
-        aqi_data = response.json()
-        
-        if "list" not in aqi_data or not aqi_data["list"]:
-            return {'error': 'No AQI data available'}
-        
-        components = aqi_data["list"][0]["components"]
-        aqi_result = calculate_comprehensive_aqi(components)
-        
-        return {
-            'components': components,
-            'aqi_result': aqi_result,
-            'api_aqi': aqi_data["list"][0].get("main", {}).get("aqi", "N/A"),  # API's own AQI
-            'timestamp': aqi_data["list"][0].get("dt", None)
-        }
-        
-    except Exception as e:
-        return {'error': f'Error fetching AQI data: {e}'}
-
-def get_aqi_category(aqi: Optional[int]) -> Tuple[str, str]:
-    """Get AQI category and color"""
-    if aqi is None:
-        return "Unknown", "gray"
-    elif aqi <= 50:
-        return "Good", "green"
-    elif aqi <= 100:
-        return "Moderate", "yellow"
-    elif aqi <= 150:
-        return "Unhealthy for Sensitive Groups", "orange"
-    elif aqi <= 200:
-        return "Unhealthy", "red"
-    elif aqi <= 300:
-        return "Very Unhealthy", "purple"
-    else:
-        return "Hazardous", "maroon"
+        record_snapshots(snapshots, ARCHIVE_PATH)
+    except OSError:
+        # A read-only deployment still works; the archive just stops growing
+        pass
+
+def fragment(func=None, *, run_every: Optional[float] = None):
+    """st.fragment where available (Streamlit >= 1.37), otherwise a plain function"""
+    decorator = getattr(st, "fragment", None)
+    if decorator is None:
+        return func if func is not None else (lambda f: f)
+    if func is None:
+        return decorator(run_every=run_every)
+    return decorator(func, run_every=run_every)
+
+def section_memo(section: str, inputs: tuple, compute, current=None):
+    """Reuse a section's loaded data across reruns while its declared inputs are unchanged.
+
+    ``current`` re-checks a kept value on every run (for snapshots, against the environment
+    cache), so data served stale, past its TTL or since refreshed is loaded again. None
+    (nothing to show) is not kept, so a failed lookup is retried on the next run.
+    """
+    memo = st.session_state.setdefault("section_memo", {})
+    cached = memo.get(section)
+    if cached is not None and cached[0] == inputs and (current is None or current(cached[1])):
+        return cached[1]
+    value = compute()
+    if value is not None:
+        memo[section] = (inputs, value)
+    return value
+
+def data_window(endpoints: tuple) -> tuple:
+    """Current TTL period of each endpoint; section data keyed on it is reloaded when one rolls over"""
+    now = time.time()
+    return tuple(int(now // ENDPOINT_TTLS[name]) for name in endpoints)
+
+def series_flags(city: str, disease: str) -> Dict[str, float]:
+    """Months flagged as outbreak anomalies in a Population_Affected series"""
+    return disease_anomalies.series_flags(city, disease) if disease_anomalies is not None else {}
+
+def chart_zoom(months: list, key: str) -> Optional[Tuple[str, str]]:
+    """Month range picked for a trend chart; narrowing it re-samples the window at full detail"""
+    if len(months) <= 2:
+        return None
+    start, end = st.select_slider("Zoom", options=months, value=(months[0], months[-1]),
+                                  format_func=lambda m: m[:7], key=key)
+    return None if (start, end) == (months[0], months[-1]) else (start, end)
 
 def validate_disease_data(df: pd.DataFrame) -> bool:
     """Validate CSV data structure"""
@@ -274,46 +139,13 @@ def validate_disease_data(df: pd.DataFrame) -> bool:
         st.warning("Disease dataset is empty")
         return False
     
-    required_columns = ["City", "Disease", "Date", "Population_Affected", 
-                       "Number_of_Deaths", "Survived", "Doctors_Available", 
-                       "Hospitals_Available"]
-    
-    missing_columns = [col for col in required_columns if col not in df.columns]
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in df.columns]
     if missing_columns:
         st.error(f"Missing required columns in CSV: {missing_columns}")
         return False
     
     return True
 
-def create_risk_bar_chart(corr_df: pd.DataFrame, color_map: Dict[str, str]) -> Dict[str, Any]:
-    """Create properly configured risk bar chart"""
-    risk_values = [3 if r == "High" else 2 if r == "Moderate" else 1 for r in corr_df["Risk"]]
-    risk_labels = corr_df["Risk"].tolist()
-    
-    # Create axis label mapping without lambda functions
-    y_axis_labels = ["", "Low", "Moderate", "High"]
-    
-    return {
-        "tooltip": {"trigger": "axis"},
-        "xAxis": {"type": "category", "data": corr_df["Disease"].tolist()},
-        "yAxis": {
-            "type": "value", 
-            "max": 3, 
-            "min": 0,
-            "interval": 1,
-            "axisLabel": {
-                "show": True
-            }
-        },
-        "series": [{
-            "name": "Risk Level",
-            "type": "bar",
-            "data": [{"value": val, "itemStyle": {"color": color_map[risk]}} 
-                    for val, risk in zip(risk_values, risk_labels)],
-            "label": {"show": True, "position": "top"}
-        }]
-    }
-
 # Pollutant full names
 pollutant_names = {
     "pm25": "Fine Particulate Matter (PM2.5)",
@@ -331,32 +163,59 @@ pollutant_names = {
 }
 
 # ---------------- LOAD AND VALIDATE DATA ----------------
-@st.cache_data(show_spinner=False)
-def load_disease_data(file_path: str) -> Tuple[pd.DataFrame, list]:
-    """Load and validate disease data"""
+def load_disease_data(file_path: str) -> Tuple[pd.DataFrame, list, Optional[DiseaseCube]]:
+    """Load and validate disease data from the process-wide shared store (no per-session copy)"""
     try:
-        disease_df = pd.read_csv(file_path)
-        if validate_disease_data(disease_df):
-            disease_cities = sorted(disease_df["City"].unique())
-            return disease_df, disease_cities
+        dataset = get_shared_dataset(file_path)
+        if validate_disease_data(dataset.frame):
+            return dataset.frame, list(dataset.cities), dataset.cube
         else:
-            return pd.DataFrame(), []
+            return pd.DataFrame(), [], None
     except FileNotFoundError:
         st.warning(f"Disease data file '{file_path}' not found. Some features may be limited.")
-        return pd.DataFrame(), []
+        return pd.DataFrame(), [], None
     except Exception as e:
         st.error(f"Error loading disease data: {e}")
-        return pd.DataFrame(), []
+        return pd.DataFrame(), [], None
 
 file_path = "output_d206b0_corrected.csv"
-disease_df, disease_cities = load_disease_data(file_path)
+ARCHIVE_PATH = "env_archive.csv"
+
+def load_case_forecasts() -> Dict[Tuple[str, str], Dict[str, Any]]:
+    """Next-3-month projections per (city, disease) from the persisted model cache"""
+    try:
+        return forecast_cases(disease_cube, default_model_cache(file_path), load_env_archive(ARCHIVE_PATH))
+    except Exception as e:
+        st.warning(f"Case projections unavailable: {e}")
+        return {}
+
+disease_df, disease_cities, disease_cube = load_disease_data(file_path)
+# Seasonal outbreak flags; recomputed only when the cube is rebuilt
+disease_anomalies = seasonal_anomalies(disease_cube) if disease_cube is not None else None
+case_forecasts = {}
+if disease_cube is not None:
+    # Fitted models are reused from disk; only series whose data changed are refit
+    with st.spinner("Updating case projections..."):
+        case_forecasts = load_case_forecasts()
+    # Disease-side charts for every city are built once per data load; reruns only look them up
+    precompute_disease_charts(disease_cube, disease_anomalies, case_forecasts, CHART_POINTS)
+
+# Make sure every dataset city resolves offline; only cities missing from the store hit the API
+@st.cache_resource(show_spinner=False)
+def warm_dataset_coordinates(cities: Tuple[str, ...]) -> list:
+    return warm_geocode_store(cities, api)
+
+warm_dataset_coordinates(tuple(disease_cities))
 
 # ---------------- SIDEBAR ----------------
 st.sidebar.header("📍 Location & Options")
 
 # Add refresh button
 if st.sidebar.button("🔄 Refresh Data"):
-    st.cache_data.clear()
+    # Revalidate rather than wipe: current data stays on screen while fresh data loads
+    environment_cache.revalidate()
+    revalidate_shared_dataset(file_path)
+    st.session_state.pop("section_memo", None)
     st.rerun()
 
 # City for Weather & AQI
@@ -365,15 +224,23 @@ weather_aqi_city = st.sidebar.text_input("Weather/AQI City", "Pathankot")
 # Separate city for disease data
 disease_city = st.sidebar.selectbox("Disease Data City", disease_cities if disease_cities else ["No Data"])
 
-# Checkboxes for sections
+# Checkboxes for sections; hidden sections are never executed
 show_home = st.sidebar.checkbox("Home", value=True)
 show_weather = st.sidebar.checkbox("Show Weather Data", value=True)
 show_aqi = st.sidebar.checkbox("Show AQI Data", value=True)
 show_disease = st.sidebar.checkbox("Show Disease Data", value=True)
 show_correlation = st.sidebar.checkbox("Show Environmental & Disease Correlation", value=True)
+show_national = st.sidebar.checkbox("Show National Risk Overview", value=False)
+
+# Values a section may depend on; each section below declares the ones it reads
+section_inputs = {
+    "weather_aqi_city": weather_aqi_city,
+    "disease_city": disease_city,
+    "cities": tuple(disease_cities),
+}
 
 # ---------------- HOME SECTION ----------------
-if show_home:
+def render_home() -> None:
     st.title("🌿 Environmental Disease Risk Dashboard")
     
     st.markdown("""
@@ -422,83 +289,71 @@ if show_home:
     st.stop()
 
 # ---------------- WEATHER SECTION ----------------
-if show_weather:
+def load_weather(city: str) -> Optional[Tuple[EnvironmentSnapshot, Optional[pd.DataFrame]]]:
+    """Forecast snapshot and table for the weather section (None when the city cannot be located)"""
+    lat, lon = get_coordinates(city)
+    if lat is None or lon is None:
+        return None
+    env = get_environment(lat, lon, api, ("forecast",))
+    if env.forecast is None:
+        raise requests.exceptions.RequestException(env.errors.get("forecast", "Forecast unavailable"))
+    if "list" not in env.forecast:
+        return env, None
+
+    weather_list = []
+    for entry in env.forecast["list"]:
+        weather_list.append({
+            "Date & Time": datetime.fromtimestamp(entry["dt"]).strftime("%Y-%m-%d %H:%M:%S"),
+            "Temperature (°C)": round(entry["main"]["temp"], 1),
+            "Humidity (%)": entry["main"]["humidity"],
+            "Weather Prediction": entry["weather"][0]["description"].title()
+        })
+    weather_df = pd.DataFrame(weather_list)
+    weather_df["Temp Range"] = weather_df["Temperature (°C)"].apply(
+        lambda t: "Cold (<15°C)" if t < 15 else "Moderate (15-30°C)" if t < 30 else "Hot (>30°C)"
+    )
+    weather_df["Humidity Range"] = weather_df["Humidity (%)"].apply(
+        lambda h: "Low (<40%)" if h < 40 else "Medium (40-70%)" if h < 70 else "High (>70%)"
+    )
+    return env, weather_df
+
+@fragment
+def render_weather(weather_aqi_city: str) -> None:
     try:
-        lat, lon = get_coordinates(weather_aqi_city)
+        with st.spinner(f"Fetching weather data for {weather_aqi_city}..."):
+            loaded = section_memo("weather", (weather_aqi_city,), lambda: load_weather(weather_aqi_city),
+                                  lambda kept: environment_cache.is_current(kept[0]))
 
-        if lat is None or lon is None:
+        if loaded is None:
             st.error(f"Could not determine coordinates for {weather_aqi_city}.")
         else:
-            with st.spinner(f"Fetching weather data for {weather_aqi_city}..."):
-                weather_url = f"https://api.openweathermap.org/data/2.5/forecast?lat={lat}&lon={lon}&appid={api}&units=metric"
-                weather_response = requests.get(weather_url, timeout=10)
-                weather_response.raise_for_status()
-                weather_data = weather_response.json()
-
-                if "list" not in weather_data:
-                    st.error("Weather data not found.")
-                else:
-                    weather_list = []
-                    for entry in weather_data["list"]:
-                        weather_list.append({
-                            "Date & Time": datetime.fromtimestamp(entry["dt"]).strftime("%Y-%m-%d %H:%M:%S"),
-                            "Temperature (°C)": round(entry["main"]["temp"], 1),
-                            "Humidity (%)": entry["main"]["humidity"],
-                            "Weather Prediction": entry["weather"][0]["description"].title()
-                        })
-
-                    weather_df = pd.DataFrame(weather_list)
-
-                    st.subheader(f"🌦 Weather Forecast - {weather_aqi_city}")
-                    st.dataframe(weather_df, use_container_width=True)
-
-                    # Line Chart
-                    weather_option = {
-                        "tooltip": {"trigger": "axis"},
-                        "legend": {"data": ["Temperature (°C)", "Humidity (%)"]},
-                        "xAxis": {"type": "category", "data": weather_df["Date & Time"].tolist()},
-                        "yAxis": {"type": "value"},
-                        "series": [
-                            {"name": "Temperature (°C)", "type": "line", "data": weather_df["Temperature (°C)"].tolist()},
-                            {"name": "Humidity (%)", "type": "line", "data": weather_df["Humidity (%)"].tolist()}
-                        ]
-                    }
-                    st.markdown("#### 📈 Temperature & Humidity Trend")
-                    st_echarts(options=weather_option, height="400px")
-
-                    # Temperature Distribution Pie Chart
-                    weather_df["Temp Range"] = weather_df["Temperature (°C)"].apply(
-                        lambda t: "Cold (<15°C)" if t < 15 else "Moderate (15-30°C)" if t < 30 else "Hot (>30°C)"
-                    )
-                    temp_counts = weather_df["Temp Range"].value_counts().to_dict()
-                    temp_pie = {
-                        "tooltip": {"trigger": "item"},
-                        "series": [{
-                            "name": "Temperature Range",
-                            "type": "pie",
-                            "radius": "50%",
-                            "data": [{"value": v, "name": k} for k, v in temp_counts.items()]
-                        }]
-                    }
-                    st.markdown("#### 🌡 Temperature Distribution")
-                    st_echarts(temp_pie, height="350px")
-
-                    # Humidity Distribution Pie Chart
-                    weather_df["Humidity Range"] = weather_df["Humidity (%)"].apply(
-                        lambda h: "Low (<40%)" if h < 40 else "Medium (40-70%)" if h < 70 else "High (>70%)"
-                    )
-                    hum_counts = weather_df["Humidity Range"].value_counts().to_dict()
-                    hum_pie = {
-                        "tooltip": {"trigger": "item"},
-                        "series": [{
-                            "name": "Humidity Range",
-                            "type": "pie",
-                            "radius": "50%",
-                            "data": [{"value": v, "name": k} for k, v in hum_counts.items()]
-                        }]
-                    }
-                    st.markdown("#### 💧 Humidity Distribution")
-                    st_echarts(hum_pie, height="350px")
+            env, weather_df = loaded
+            show_staleness(env)
+
+            if weather_df is None:
+                st.error("Weather data not found.")
+            else:
+                st.subheader(f"🌦 Weather Forecast - {weather_aqi_city}")
+                st.dataframe(weather_df.drop(columns=["Temp Range", "Humidity Range"]), use_container_width=True)
+
+                # Line Chart
+                weather_option = weather_trend_option(weather_df["Date & Time"].tolist(),
+                                                      weather_df["Temperature (°C)"].tolist(),
+                                                      weather_df["Humidity (%)"].tolist())
+                st.markdown("#### 📈 Temperature & Humidity Trend")
+                st_echarts(options=weather_option, height="400px")
+
+                # Temperature Distribution Pie Chart
+                temp_counts = weather_df["Temp Range"].value_counts().to_dict()
+                temp_pie = distribution_pie_option("Temperature Range", temp_counts)
+                st.markdown("#### 🌡 Temperature Distribution")
+                st_echarts(temp_pie, height="350px")
+
+                # Humidity Distribution Pie Chart
+                hum_counts = weather_df["Humidity Range"].value_counts().to_dict()
+                hum_pie = distribution_pie_option("Humidity Range", hum_counts)
+                st.markdown("#### 💧 Humidity Distribution")
+                st_echarts(hum_pie, height="350px")
 
     except requests.exceptions.RequestException as e:
         st.error(f"Network error fetching weather: {e}")
@@ -506,156 +361,127 @@ if show_weather:
         st.error(f"Error fetching weather: {e}")
 
 # ---------------- COMPREHENSIVE AQI SECTION ----------------
-if show_aqi:
+def load_aqi(city: str) -> Optional[EnvironmentSnapshot]:
+    """Air pollution snapshot for the AQI section (None when the city cannot be located)"""
+    lat, lon = get_coordinates(city)
+    if lat is None or lon is None:
+        return None
+    return get_environment(lat, lon, api, ("air_pollution",))
+
+@fragment
+def render_aqi(weather_aqi_city: str) -> None:
     try:
-        lat, lon = get_coordinates(weather_aqi_city)
+        with st.spinner(f"Fetching comprehensive AQI data for {weather_aqi_city}..."):
+            aqi_env = section_memo("aqi", (weather_aqi_city,), lambda: load_aqi(weather_aqi_city),
+                                   environment_cache.is_current)
 
-        if lat is None or lon is None:
+        if aqi_env is None:
             st.error(f"Could not get coordinates for AQI data for {weather_aqi_city}.")
         else:
-            with st.spinner(f"Fetching comprehensive AQI data for {weather_aqi_city}..."):
-                aqi_data = get_comprehensive_aqi_data(lat, lon, api)
+            show_staleness(aqi_env)
+            aqi_data = aqi_env.air_quality
+            
+            if 'error' in aqi_data:
+                st.error(aqi_data['error'])
+            else:
+                components = aqi_data['components']
+                aqi_result = aqi_data['aqi_result']
+                api_aqi = aqi_data['api_aqi']
                 
-                if 'error' in aqi_data:
-                    st.error(aqi_data['error'])
-                else:
-                    components = aqi_data['components']
-                    aqi_result = aqi_data['aqi_result']
-                    api_aqi = aqi_data['api_aqi']
-                    
-                    st.subheader(f"🌫 Comprehensive Air Quality - {weather_aqi_city}")
-                    
-                    # Main AQI metrics
-                    col1, col2, col3, col4 = st.columns(4)
-                    with col1:
-                        calculated_aqi = aqi_result['overall_aqi']
-                        st.metric("🧮 Calculated AQI", calculated_aqi or "N/A")
-                    with col2:
-                        # Convert API AQI (1-5 scale) to standard AQI scale for comparison
-                        api_aqi_converted = "N/A"
-                        if api_aqi != "N/A" and api_aqi is not None:
-                            api_scale_map = {1: "0-50", 2: "51-100", 3: "101-150", 4: "151-200", 5: "201-300"}
-                            api_aqi_converted = api_scale_map.get(api_aqi, str(api_aqi))
-                        st.metric("🌐 API AQI Scale", f"{api_aqi} ({api_aqi_converted})")
-                    with col3:
-                        st.metric("🏆 Dominant Pollutant", aqi_result['dominant_pollutant'] or "N/A")
-                    with col4:
-                        if calculated_aqi:
-                            category, color = get_aqi_category(calculated_aqi)
-                            st.markdown(f"**Category:** <span style='color:{color}; font-weight:bold;'>{category}</span>", unsafe_allow_html=True)
-                        else:
-                            st.write("**Category:** Unknown")
-                    
-                    # Individual pollutant AQIs
-                    if aqi_result['individual_aqis']:
-                        st.markdown("#### 📊 Individual Pollutant AQIs")
-                        pollutant_data = []
-                        for pollutant, aqi_val in aqi_result['individual_aqis'].items():
-                            # Get concentration from components
-                            component_key = pollutant.lower().replace('.', '_')
-                            concentration = components.get(component_key, 0)
-                            category, _ = get_aqi_category(aqi_val)
-                            
-                            pollutant_data.append({
-                                "Pollutant": pollutant,
-                                "AQI": aqi_val,
-                                "Category": category,
-                                "Concentration (µg/m³)": f"{concentration:.1f}"
-                            })
-                        
-                        pollutant_df = pd.DataFrame(pollutant_data)
-                        st.dataframe(pollutant_df, use_container_width=True)
-                        
-                        # Individual pollutant bar chart
-                        # Prepare data with colors for each AQI value
-                        bar_data = []
-                        for pollutant, aqi_val in aqi_result['individual_aqis'].items():
-                            _, color = get_aqi_category(aqi_val)
-                            bar_data.append({
-                                "value": aqi_val,
-                                "itemStyle": {"color": color}
-                            })
+                st.subheader(f"🌫 Comprehensive Air Quality - {weather_aqi_city}")
+                
+                # Main AQI metrics
+                col1, col2, col3, col4 = st.columns(4)
+                with col1:
+                    calculated_aqi = aqi_result['overall_aqi']
+                    st.metric("🧮 Calculated AQI", calculated_aqi or "N/A")
+                with col2:
+                    # Convert API AQI (1-5 scale) to standard AQI scale for comparison
+                    api_aqi_converted = "N/A"
+                    if api_aqi != "N/A" and api_aqi is not None:
+                        api_scale_map = {1: "0-50", 2: "51-100", 3: "101-150", 4: "151-200", 5: "201-300"}
+                        api_aqi_converted = api_scale_map.get(api_aqi, str(api_aqi))
+                    st.metric("🌐 API AQI Scale", f"{api_aqi} ({api_aqi_converted})")
+                with col3:
+                    st.metric("🏆 Dominant Pollutant", aqi_result['dominant_pollutant'] or "N/A")
+                with col4:
+                    if calculated_aqi:
+                        category, color = get_aqi_category(calculated_aqi)
+                        st.markdown(f"**Category:** <span style='color:{color}; font-weight:bold;'>{category}</span>", unsafe_allow_html=True)
+                    else:
+                        st.write("**Category:** Unknown")
+                
+                # Individual pollutant AQIs
+                if aqi_result['individual_aqis']:
+                    st.markdown("#### 📊 Individual Pollutant AQIs")
+                    pollutant_data = []
+                    for pollutant, aqi_val in aqi_result['individual_aqis'].items():
+                        # Get concentration from components
+                        component_key = pollutant.lower().replace('.', '_')
+                        concentration = components.get(component_key, 0)
+                        category, _ = get_aqi_category(aqi_val)
                         
-                        bar_chart = {
-                            "tooltip": {"trigger": "axis", "formatter": "{b}: {c} AQI"},
-                            "xAxis": {"type": "category", "data": list(aqi_result['individual_aqis'].keys())},
-                            "yAxis": {"type": "value", "name": "AQI"},
-                            "series": [{
-                                "type": "bar",
-                                "data": bar_data
-                            }]
-                        }
-                        st.markdown("#### 📊 AQI by Pollutant")
-                        st_echarts(options=bar_chart, height="400px")
-                    
-                    # All pollutant concentrations table
-                    st.markdown("#### 🧪 All Pollutant Concentrations")
-                    all_pollutants = []
-                    pollutant_mapping = {
-                        'pm2_5': 'PM2.5',
-                        'pm10': 'PM10',
-                        'o3': 'Ozone (O₃)',
-                        'no2': 'Nitrogen Dioxide (NO₂)',
-                        'so2': 'Sulfur Dioxide (SO₂)',
-                        'co': 'Carbon Monoxide (CO)'
-                    }
-                    
-                    for key, name in pollutant_mapping.items():
-                        concentration = components.get(key, 0)
-                        unit = "mg/m³" if key == 'co' else "µg/m³"
-                        all_pollutants.append({
-                            "Pollutant": name,
-                            "Concentration": f"{concentration:.1f} {unit}",
-                            "Raw Value": concentration
+                        pollutant_data.append({
+                            "Pollutant": pollutant,
+                            "AQI": aqi_val,
+                            "Category": category,
+                            "Concentration (µg/m³)": f"{concentration:.1f}"
                         })
                     
-                    all_pollutants_df = pd.DataFrame(all_pollutants)
-                    st.dataframe(all_pollutants_df[["Pollutant", "Concentration"]], use_container_width=True)
-
-                    # AQI Gauge
-                    if calculated_aqi and calculated_aqi > 0:
-                        gauge_chart = {
-                            "tooltip": {"formatter": "{a} <br/>{b} : {c}"},
-                            "series": [{
-                                "name": "Calculated AQI",
-                                "type": "gauge",
-                                "min": 0,
-                                "max": 500,
-                                "detail": {"formatter": f"{calculated_aqi}"},
-                                "data": [{"value": calculated_aqi, "name": "AQI"}],
-                                "axisLine": {
-                                    "lineStyle": {
-                                        "color": [
-                                            [0.1, "#4CAF50"],   # Good
-                                            [0.2, "#FFEB3B"],   # Moderate
-                                            [0.3, "#FF9800"],   # Unhealthy for Sensitive
-                                            [0.4, "#F44336"],   # Unhealthy
-                                            [0.6, "#9C27B0"],   # Very Unhealthy
-                                            [1, "#8B0000"]      # Hazardous
-                                        ]
-                                    }
-                                }
-                            }]
-                        }
-                        st.markdown("#### 📟 AQI Gauge")
-                        st_echarts(gauge_chart, height="350px")
-                    else:
-                        st.warning("AQI gauge not available - insufficient data for calculation.")
+                    pollutant_df = pd.DataFrame(pollutant_data)
+                    st.dataframe(pollutant_df, use_container_width=True)
+                    
+                    # Individual pollutant bar chart, one colour per AQI category
+                    bar_chart = aqi_bar_option(aqi_result['individual_aqis'])
+                    st.markdown("#### 📊 AQI by Pollutant")
+                    st_echarts(options=bar_chart, height="400px")
+                
+                # All pollutant concentrations table
+                st.markdown("#### 🧪 All Pollutant Concentrations")
+                all_pollutants = []
+                pollutant_mapping = {
+                    'pm2_5': 'PM2.5',
+                    'pm10': 'PM10',
+                    'o3': 'Ozone (O₃)',
+                    'no2': 'Nitrogen Dioxide (NO₂)',
+                    'so2': 'Sulfur Dioxide (SO₂)',
+                    'co': 'Carbon Monoxide (CO)'
+                }
+                
+                for key, name in pollutant_mapping.items():
+                    concentration = components.get(key, 0)
+                    unit = "mg/m³" if key == 'co' else "µg/m³"
+                    all_pollutants.append({
+                        "Pollutant": name,
+                        "Concentration": f"{concentration:.1f} {unit}",
+                        "Raw Value": concentration
+                    })
+                
+                all_pollutants_df = pd.DataFrame(all_pollutants)
+                st.dataframe(all_pollutants_df[["Pollutant", "Concentration"]], use_container_width=True)
+
+                # AQI Gauge
+                if calculated_aqi and calculated_aqi > 0:
+                    gauge_chart = aqi_gauge_option(calculated_aqi)
+                    st.markdown("#### 📟 AQI Gauge")
+                    st_echarts(gauge_chart, height="350px")
+                else:
+                    st.warning("AQI gauge not available - insufficient data for calculation.")
 
-                    # AQI Comparison
-                    if calculated_aqi and api_aqi != "N/A":
-                        st.markdown("#### 🔍 AQI Comparison Analysis")
-                        st.info(f"""
-                        **Our Comprehensive Calculation**: {calculated_aqi} AQI (considers all pollutants)
-                        
-                        **API Simple Scale**: {api_aqi}/5 (simplified 1-5 rating)
-                        
-                        **Why they differ:**
-                        - Our calculation uses EPA standard breakpoints for each pollutant
-                        - API uses a simplified 1-5 scale 
-                        - We consider the dominant pollutant (currently: {aqi_result['dominant_pollutant']})
-                        - Real-time vs averaged measurements may vary
-                        """)
+                # AQI Comparison
+                if calculated_aqi and api_aqi != "N/A":
+                    st.markdown("#### 🔍 AQI Comparison Analysis")
+                    st.info(f"""
+                    **Our Comprehensive Calculation**: {calculated_aqi} AQI (considers all pollutants)
+                    
+                    **API Simple Scale**: {api_aqi}/5 (simplified 1-5 rating)
+                    
+                    **Why they differ:**
+                    - Our calculation uses EPA standard breakpoints for each pollutant
+                    - API uses a simplified 1-5 scale 
+                    - We consider the dominant pollutant (currently: {aqi_result['dominant_pollutant']})
+                    - Real-time vs averaged measurements may vary
+                    """)
 
     except requests.exceptions.RequestException as e:
         st.error(f"Network error fetching AQI data: {e}")
@@ -665,48 +491,48 @@ if show_aqi:
             st.exception(e)
 
 # ---------------- DISEASE SECTION ----------------
-if show_disease:
+@fragment
+def render_disease(disease_city: str) -> None:
     if not disease_df.empty:
-        city_data = disease_df[disease_df["City"].str.lower() == disease_city.lower()]
-        if not city_data.empty:
+        if disease_cube is not None and disease_cube.has_city(disease_city):
             st.subheader(f"🩺 Disease Data for: {disease_city}")
 
-            # Group by Disease
-            diseases = city_data["Disease"].unique()
-            for disease in diseases:
-                disease_data = city_data[city_data["Disease"] == disease]
+            # Totals and monthly series come straight from the city x disease x month cube
+            for disease in disease_cube.diseases_for(disease_city):
                 st.markdown(f"### 🧬 {disease}")
 
-                # Summary Table with safe aggregation
-                total_cases = disease_data["Population_Affected"].sum()
-                total_deaths = disease_data["Number_of_Deaths"].sum()
-                total_survived = disease_data["Survived"].sum()
-                total_doctors = disease_data["Doctors_Available"].sum()
-                total_hospitals = disease_data["Hospitals_Available"].sum()
-
+                totals = disease_cube.totals(disease_city, disease)
                 summary = pd.DataFrame([
-                    {"Factor": "Population Affected", "Value": f"{total_cases:,}"},
-                    {"Factor": "Number of Deaths", "Value": f"{total_deaths:,}"},
-                    {"Factor": "Survived", "Value": f"{total_survived:,}"},
-                    {"Factor": "Doctors Available", "Value": f"{total_doctors:,}"},
-                    {"Factor": "Hospitals Available", "Value": f"{total_hospitals:,}"}
+                    {"Factor": "Population Affected", "Value": f"{totals['Population_Affected']:,}"},
+                    {"Factor": "Number of Deaths", "Value": f"{totals['Number_of_Deaths']:,}"},
+                    {"Factor": "Survived", "Value": f"{totals['Survived']:,}"},
+                    {"Factor": "Doctors Available", "Value": f"{totals['Doctors_Available']:,}"},
+                    {"Factor": "Hospitals Available", "Value": f"{totals['Hospitals_Available']:,}"}
                 ])
                 st.dataframe(summary, use_container_width=True)
 
-                # Trend Graph with proper data handling
-                if len(disease_data) > 1:
-                    chart_option = {
-                        "tooltip": {"trigger": "axis"},
-                        "legend": {"data": ["Population Affected", "Deaths", "Survived"]},
-                        "xAxis": {"type": "category", "data": disease_data["Date"].tolist()},
-                        "yAxis": {"type": "value"},
-                        "series": [
-                            {"name": "Population Affected", "type": "line", "data": disease_data["Population_Affected"].tolist()},
-                            {"name": "Deaths", "type": "line", "data": disease_data["Number_of_Deaths"].tolist()},
-                            {"name": "Survived", "type": "line", "data": disease_data["Survived"].tolist()}
-                        ]
-                    }
+                # Monthly trend graph, extended by the cached 3-month projection
+                months, monthly = disease_cube.monthly(disease_city, disease)
+                if len(months) > 1:
+                    projection = case_forecasts.get((disease_city, disease))
+                    zoom = chart_zoom(months, f"zoom_disease_{disease_city}_{disease}")
+
+                    chart_option = disease_trend_chart(disease_cube, disease_anomalies, disease_city, disease,
+                                                       CHART_POINTS, projection, zoom)
                     st_echarts(chart_option, height="400px")
+                    if projection:
+                        projection_df = pd.DataFrame({
+                            "Month": [m[:7] for m in projection["months"]],
+                            "Projected Population Affected": [f"{v:,.0f}" for v in projection["forecast"]],
+                        })
+                        st.dataframe(projection_df, use_container_width=True)
+                        mae = projection.get("holdout_mae")
+                        st.caption(f"Model: {projection['model'].replace('_', ' ')}"
+                                   + (f" (mean absolute error {mae:,.0f} on the last 12 months held out)" if mae is not None else ""))
+                    flagged = series_flags(disease_city, disease)
+                    if flagged:
+                        st.caption(f"📍 {len(flagged)} month(s) more than {disease_anomalies.threshold} robust SDs above "
+                                   f"the same month's multi-year median: {', '.join(m[:7] for m in flagged)}")
                 else:
                     st.info("Insufficient data points for trend analysis.")
         else:
@@ -715,73 +541,175 @@ if show_disease:
         st.error("Disease dataset not loaded. Please check the CSV file path and format.")
 
 # ---------------- ENVIRONMENTAL & DISEASE CORRELATION ----------------
-if show_correlation:
+def load_conditions(city: str) -> Optional[EnvironmentSnapshot]:
+    """Full snapshot for the live risk assessment, archived as it is fetched (None when the city cannot be located)"""
+    lat, lon = get_coordinates(city)
+    if lat is None or lon is None:
+        return None
+    # Shared snapshot: endpoints already fetched by the sections above come from the cache
+    env = get_environment(lat, lon, api)
+    if env.current is None:
+        raise requests.exceptions.RequestException(env.errors.get("weather", "Current weather unavailable"))
+    archive_observations({city: env})
+    return env
+
+def bootstrap_intervals(job, correlation, disease_city: str, polled: bool = False) -> None:
+    """Bootstrap CI table for the city's Pearson matrix, or the job's progress while it runs.
+
+    ``polled`` marks a fragment rerunning on a timer for a job that was still running.
+    """
+    if job.cancelled:
+        # The archive gained a city, month or variable; follow the run that replaced this one
+        job = get_bootstrap_service().current() or job
+    if polled and job.done:
+        # One full rerun stops the polling and shows the intervals outside this fragment
+        # (Recent Historical Cases) as well
+        st.rerun(scope="app")
+    if job.error:
+        st.caption(f"Bootstrap intervals unavailable: {job.error}")
+        return
+    if not job.done or job.result is None:
+        st.caption(f"⏳ Bootstrap confidence intervals computing "
+                   f"({job.replicates_done:,} replicates so far); they appear here once finished.")
+        return
+    boot = job.result
+    pearson = correlation.matrix(disease_city, "pearson_r")
+    ci_rows = []
+    for dis in pearson.index:
+        for var in pearson.columns:
+            low, high = boot.correlation_interval(disease_city, dis, var)
+            if np.isfinite(pearson.loc[dis, var]) and np.isfinite(low):
+                ci_rows.append({"Disease": dis, "Variable": VARIABLE_LABELS.get(var, var),
+                                "Pearson r": round(float(pearson.loc[dis, var]), 2),
+                                f"{boot.confidence:.0%} CI": f"{low:.2f} to {high:.2f}",
+                                "Excludes 0": bool(low > 0 or high < 0)})
+    if ci_rows:
+        with st.expander(f"Bootstrap {boot.confidence:.0%} confidence intervals"):
+            st.dataframe(pd.DataFrame(ci_rows), use_container_width=True)
+
+@fragment
+def render_correlation(weather_aqi_city: str, disease_city: str) -> None:
+    bootstrap_job = None
     try:
         # Disease variation over time chart for selected disease city
         if not disease_df.empty:
-            city_disease_data = disease_df[disease_df["City"].str.lower() == disease_city.lower()]
-            if not city_disease_data.empty:
+            trend_months, trend_series = disease_cube.city_monthly(disease_city) if disease_cube is not None else ([], {})
+            if trend_months:
                 st.markdown(f"### 📅 Disease Variation Over Time in {disease_city}")
 
-                # Group by Date & Disease to track population affected
-                disease_trend = city_disease_data.groupby(["Date", "Disease"])["Population_Affected"].sum().reset_index()
+                # Monthly population affected per disease, one line series each
+                trend_zoom = chart_zoom(trend_months, f"zoom_city_trend_{disease_city}")
+                trend_chart = city_trend_chart(disease_cube, disease_anomalies, disease_city, CHART_POINTS, trend_zoom)
+                st_echarts(options=trend_chart, height="400px")
+
+            # Statistical correlation between monthly cases and the local environmental archive
+            st.markdown(f"#### 📐 Historical Correlation Matrix - {disease_city}")
+            env_archive = load_env_archive(ARCHIVE_PATH)
+            correlation = correlate(disease_cube, env_archive) if disease_cube is not None else None
+            # Confidence intervals run on the process pool; the job is reused until the archive's layout changes
+            bootstrap_job = get_bootstrap_service().submit(disease_cube, env_archive) if disease_cube is not None else None
+            if correlation is None or not any(c.lower() == disease_city.lower() for c in correlation.cities):
+                st.info(f"No environmental history for {disease_city} in `{ARCHIVE_PATH}` yet. "
+                        "Observations are appended as cities are fetched, or import monthly rows "
+                        f"(City, Date, {', '.join(ARCHIVE_VARIABLES)}).")
+            else:
+                method = st.radio("Coefficient", ["Spearman", "Pearson"], horizontal=True, key="corr_method")
+                stat = method.lower()
+                coeffs = correlation.matrix(disease_city, f"{stat}_r")
+                p_values = correlation.matrix(disease_city, f"{stat}_p")
+                counts = correlation.matrix(disease_city, "n")
+                corr_vars = list(coeffs.columns)
+                corr_diseases = list(coeffs.index)
+                corr_heatmap = {
+                    "tooltip": {"position": "top"},
+                    "grid": {"left": 110, "bottom": 90},
+                    "xAxis": {"type": "category", "data": [VARIABLE_LABELS.get(v, v) for v in corr_vars],
+                              "axisLabel": {"rotate": 30}, "splitArea": {"show": True}},
+                    "yAxis": {"type": "category", "data": corr_diseases, "splitArea": {"show": True}},
+                    "visualMap": {
+                        "min": -1, "max": 1, "calculable": True, "orient": "horizontal", "left": "center", "bottom": 0,
+                        "inRange": {"color": ["#2196F3", "#FFFFFF", "#F44336"]}
+                    },
+                    "series": [{
+                        "name": f"{method} r",
+                        "type": "heatmap",
+                        # NaN (too few shared months) is left out so the cell stays blank
+                        "data": [[x, y, round(float(coeffs.iloc[y, x]), 2)]
+                                 for x in range(len(corr_vars)) for y in range(len(corr_diseases))
+                                 if np.isfinite(coeffs.iloc[y, x])],
+                        "label": {"show": True}
+                    }]
+                }
+                st_echarts(options=corr_heatmap, height=f"{max(260, 60 * len(corr_diseases) + 150)}px")
+
+                corr_table = coeffs.round(2).astype(str) + np.where(p_values < 0.05, " *", "")
+                corr_table = corr_table.where(np.isfinite(coeffs), "–")
+                corr_table.columns = [VARIABLE_LABELS.get(v, v) for v in corr_vars]
+                st.dataframe(corr_table, use_container_width=True)
+                st.caption(f"{method} coefficient of monthly population affected against monthly mean conditions; "
+                           f"* p < 0.05. Based on {int(counts.values.max())} overlapping months at most "
+                           f"(pairs with fewer than {MIN_PERIODS} are left blank).")
+
+                if bootstrap_job is not None:
+                    # Polls the running job on its own, so the intervals appear without a full rerun
+                    poll = None if bootstrap_job.done else BOOTSTRAP_POLL_SECONDS
+                    fragment(bootstrap_intervals, run_every=poll)(bootstrap_job, correlation, disease_city,
+                                                                  polled=poll is not None and hasattr(st, "fragment"))
+
+                # Lead times: environment k months earlier against this month's cases
+                st.markdown(f"#### ⏳ Environment → Disease Lead Times (0–{MAX_LAG} months)")
+                lags = lagged_correlation(disease_cube, env_archive)
+                lag_table = lags.best_table(disease_city)
+                if lag_table.empty:
+                    st.info("Not enough overlapping months to estimate lead times yet.")
+                else:
+                    lag_table["Variable"] = lag_table["Variable"].map(lambda v: VARIABLE_LABELS.get(v, v))
+                    st.dataframe(lag_table.round({"r": 2, "p": 4}), use_container_width=True)
 
-                if not disease_trend.empty:
-                    trend_chart = {
+                    lag_variable = st.selectbox("Lag profile for", corr_vars,
+                                                format_func=lambda v: VARIABLE_LABELS.get(v, v), key="lag_variable")
+                    profile = lags.profile(disease_city, lag_variable)
+                    lag_chart = {
                         "tooltip": {"trigger": "axis"},
-                        "legend": {"data": list(disease_trend["Disease"].unique())},
-                        "xAxis": {"type": "category", "data": sorted(disease_trend["Date"].unique().tolist())},
-                        "yAxis": {"type": "value"},
-                        "series": []
+                        "legend": {"data": list(profile)},
+                        "xAxis": {"type": "category", "name": "Lag (months)", "data": [int(k) for k in lags.lags]},
+                        "yAxis": {"type": "value", "min": -1, "max": 1, "name": "r"},
+                        "series": [
+                            {"name": dis, "type": "line",
+                             "data": [round(float(v), 3) if np.isfinite(v) else None for v in values]}
+                            for dis, values in profile.items()
+                        ]
                     }
-
-                    # Add one line series per disease
-                    for dis in disease_trend["Disease"].unique():
-                        disease_series = disease_trend[disease_trend["Disease"] == dis]
-                        trend_chart["series"].append({
-                            "name": dis,
-                            "type": "line",
-                            "smooth": True,
-                            "data": disease_series.sort_values("Date")["Population_Affected"].tolist()
-                        })
-
-                    st_echarts(options=trend_chart, height="400px")
+                    st_echarts(options=lag_chart, height="320px")
+                    st.caption("A best lag of k means conditions k months earlier track this month's cases most closely. "
+                               "p-values are per lag and do not correct for picking the best of several.")
 
         # Fetch current environmental data for correlation
         st.markdown(f"### 🌍 Environmental & Disease Correlation Analysis")
         
-        lat, lon = get_coordinates(weather_aqi_city)
-        
-        if lat is None or lon is None:
+        # Depends on the Weather/AQI city only; a new Disease Data City reuses it
+        with st.spinner("Fetching environmental conditions..."):
+            env = section_memo("live_risk", (weather_aqi_city,), lambda: load_conditions(weather_aqi_city),
+                               environment_cache.is_current)
+
+        if env is None:
             st.error(f"Could not get coordinates for {weather_aqi_city}.")
         else:
             with st.spinner("Analyzing environmental conditions..."):
-                # Get current weather data
-                weather_url = f"https://api.openweathermap.org/data/2.5/weather?q={weather_aqi_city}&appid={api}&units=metric"
-                w_response = requests.get(weather_url, timeout=10)
-                w_response.raise_for_status()
-                w_data = w_response.json()
-                
+                show_staleness(env)
+
                 # Extract weather parameters with safe defaults
-                temp = w_data["main"]["temp"]
-                humidity = w_data["main"]["humidity"]
-                rain = w_data.get("rain", {}).get("1h", 0)
-                pressure = w_data["main"]["pressure"]
-                wind_speed = w_data.get("wind", {}).get("speed", 0)
-                
-                # Get temperature variability from forecast
-                forecast_url = f"https://api.openweathermap.org/data/2.5/forecast?q={weather_aqi_city}&appid={api}&units=metric"
-                forecast_response = requests.get(forecast_url, timeout=10)
-                temp_change = 0
-                if forecast_response.status_code == 200:
-                    forecast_data = forecast_response.json()
-                    if "list" in forecast_data:
-                        temps = [f["main"]["temp"] for f in forecast_data["list"][:8]]
-                        if temps:
-                            temp_change = max(temps) - min(temps)
-
-                # Get comprehensive AQI data
-                aqi_data = get_comprehensive_aqi_data(lat, lon, api)
+                temp = env.temp
+                humidity = env.humidity
+                rain = env.rain
+                pressure = env.pressure
+                wind_speed = env.wind_speed
+
+                # Temperature variability from the forecast (0 when the forecast call failed)
+                temp_change = env.temp_change
+
+                # Comprehensive AQI data
+                aqi_data = env.air_quality
                 
                 latest_pm25 = latest_pm10 = latest_aqi = 0
                 dominant_pollutant = "None"
@@ -811,261 +739,31 @@ if show_correlation:
                 ])
                 st.dataframe(env_summary, use_container_width=True)
 
-                # Enhanced Disease Risk Assessment Based on Environmental Data
-                correlation_results = []
-
-                # 1. Dengue Risk Assessment (Enhanced)
-                dengue_score = 0
-                dengue_factors = []
-                
-                if 25 <= temp <= 32:
-                    dengue_score += 3
-                    dengue_factors.append("Optimal temperature for mosquito breeding")
-                elif 20 <= temp <= 35:
-                    dengue_score += 2
-                    dengue_factors.append("Favorable temperature")
-                elif temp > 35:
-                    dengue_score += 1
-                    dengue_factors.append("High temperature (reduced mosquito activity)")
-                
-                if humidity > 80:
-                    dengue_score += 3
-                    dengue_factors.append("Very high humidity (ideal for mosquitoes)")
-                elif humidity > 70:
-                    dengue_score += 2
-                    dengue_factors.append("High humidity")
-                elif humidity > 60:
-                    dengue_score += 1
-                    dengue_factors.append("Moderate humidity")
-                
-                if rain > 15:
-                    dengue_score += 3
-                    dengue_factors.append("Heavy rainfall (breeding sites)")
-                elif rain > 5:
-                    dengue_score += 2
-                    dengue_factors.append("Moderate rainfall")
-                elif rain > 1:
-                    dengue_score += 1
-                    dengue_factors.append("Light rainfall")
-                
-                if wind_speed < 1:
-                    dengue_score += 1
-                    dengue_factors.append("Low wind (stagnant conditions)")
-                
-                if latest_aqi > 100:
-                    dengue_score += 1
-                    dengue_factors.append("Poor air quality (weakened immunity)")
-                
-                if dengue_score >= 6:
-                    dengue_risk = "High"
-                elif dengue_score >= 3:
-                    dengue_risk = "Moderate"
-                else:
-                    dengue_risk = "Low"
-                
-                correlation_results.append({
-                    "Disease": "Dengue",
-                    "Risk": dengue_risk,
-                    "Score": dengue_score,
-                    "Max_Score": 11,
-                    "Reason": f"Score: {dengue_score}/11 - {', '.join(dengue_factors) if dengue_factors else 'No major risk factors'}"
-                })
-
-                # 2. Heat Stroke Risk Assessment (Enhanced)
-                heat_score = 0
-                heat_factors = []
-                
-                if temp > 42:
-                    heat_score += 4
-                    heat_factors.append("Extreme dangerous heat")
-                elif temp > 38:
-                    heat_score += 3
-                    heat_factors.append("Very high temperature")
-                elif temp > 35:
-                    heat_score += 2
-                    heat_factors.append("High temperature")
-                elif temp > 32:
-                    heat_score += 1
-                    heat_factors.append("Warm temperature")
-                
-                if humidity > 80:
-                    heat_score += 3
-                    heat_factors.append("Very high humidity (reduced cooling)")
-                elif humidity > 70:
-                    heat_score += 2
-                    heat_factors.append("High humidity")
-                elif humidity > 50:
-                    heat_score += 1
-                    heat_factors.append("Moderate humidity")
-                
-                if wind_speed < 1:
-                    heat_score += 2
-                    heat_factors.append("Very low wind (no cooling)")
-                elif wind_speed < 3:
-                    heat_score += 1
-                    heat_factors.append("Low wind")
-                
-                if latest_aqi > 150:
-                    heat_score += 1
-                    heat_factors.append("Poor air quality (additional stress)")
-                
-                # Heat index calculation (simplified)
-                heat_index = temp + (0.5 * humidity/100 * temp)
-                if heat_index > 40:
-                    heat_score += 2
-                    heat_factors.append(f"High heat index ({heat_index:.1f}°C)")
-                
-                if heat_score >= 7:
-                    heatstroke_risk = "High"
-                elif heat_score >= 3:
-                    heatstroke_risk = "Moderate"
-                else:
-                    heatstroke_risk = "Low"
-                
-                correlation_results.append({
-                    "Disease": "Heat Stroke",
-                    "Risk": heatstroke_risk,
-                    "Score": heat_score,
-                    "Max_Score": 12,
-                    "Reason": f"Score: {heat_score}/12 - {', '.join(heat_factors) if heat_factors else 'No major risk factors'}"
-                })
-
-                # 3. Asthma Risk Assessment (Enhanced with comprehensive AQI)
-                asthma_score = 0
-                asthma_factors = []
-                
-                if latest_aqi > 200:
-                    asthma_score += 4
-                    asthma_factors.append("Very unhealthy AQI")
-                elif latest_aqi > 150:
-                    asthma_score += 3
-                    asthma_factors.append("Unhealthy AQI")
-                elif latest_aqi > 100:
-                    asthma_score += 2
-                    asthma_factors.append("Unhealthy for sensitive groups")
-                elif latest_aqi > 50:
-                    asthma_score += 1
-                    asthma_factors.append("Moderate AQI")
-                
-                if latest_pm25 > 75:
-                    asthma_score += 3
-                    asthma_factors.append("Very high PM2.5")
-                elif latest_pm25 > 55:
-                    asthma_score += 2
-                    asthma_factors.append("High PM2.5")
-                elif latest_pm25 > 35:
-                    asthma_score += 1
-                    asthma_factors.append("Elevated PM2.5")
-                
-                if latest_pm10 > 150:
-                    asthma_score += 2
-                    asthma_factors.append("Very high PM10")
-                elif latest_pm10 > 100:
-                    asthma_score += 1
-                    asthma_factors.append("High PM10")
-                
-                if dominant_pollutant in ["O3", "NO2", "SO2"]:
-                    asthma_score += 2
-                    asthma_factors.append(f"Dominant pollutant is {dominant_pollutant}")
-                
-                if temp_change > 15:
-                    asthma_score += 3
-                    asthma_factors.append("Very high temperature variation")
-                elif temp_change > 10:
-                    asthma_score += 2
-                    asthma_factors.append("High temperature variation")
-                elif temp_change > 5:
-                    asthma_score += 1
-                    asthma_factors.append("Moderate temperature variation")
-                
-                if humidity > 85:
-                    asthma_score += 2
-                    asthma_factors.append("Very high humidity")
-                elif humidity < 30:
-                    asthma_score += 1
-                    asthma_factors.append("Very low humidity (dry air)")
-                
-                if wind_speed > 10:
-                    asthma_score += 1
-                    asthma_factors.append("High wind (dust/allergens)")
-                
-                if asthma_score >= 8:
-                    asthma_risk = "High"
-                elif asthma_score >= 4:
-                    asthma_risk = "Moderate"
-                else:
-                    asthma_risk = "Low"
-                
-                correlation_results.append({
-                    "Disease": "Asthma",
-                    "Risk": asthma_risk,
-                    "Score": asthma_score,
-                    "Max_Score": 18,
-                    "Reason": f"Score: {asthma_score}/18 - {', '.join(asthma_factors) if asthma_factors else 'No major risk factors'}"
-                })
-
-                # 4. Respiratory Infections Risk Assessment (New)
-                respiratory_score = 0
-                respiratory_factors = []
-                
-                if latest_aqi > 150:
-                    respiratory_score += 3
-                    respiratory_factors.append("Poor air quality")
-                elif latest_aqi > 100:
-                    respiratory_score += 2
-                    respiratory_factors.append("Moderate air quality")
-                
-                if temp < 15:
-                    respiratory_score += 2
-                    respiratory_factors.append("Cold temperature")
-                elif temp > 35:
-                    respiratory_score += 1
-                    respiratory_factors.append("Hot temperature (stress)")
-                
-                if humidity > 80:
-                    respiratory_score += 2
-                    respiratory_factors.append("Very high humidity (mold/bacteria)")
-                elif humidity < 30:
-                    respiratory_score += 1
-                    respiratory_factors.append("Very low humidity (dry airways)")
-                
-                if temp_change > 10:
-                    respiratory_score += 2
-                    respiratory_factors.append("High temperature variation")
-                
-                if wind_speed < 1:
-                    respiratory_score += 1
-                    respiratory_factors.append("Poor air circulation")
-                
-                if respiratory_score >= 5:
-                    respiratory_risk = "High"
-                elif respiratory_score >= 3:
-                    respiratory_risk = "Moderate"
-                else:
-                    respiratory_risk = "Low"
-                
-                correlation_results.append({
-                    "Disease": "Respiratory Infections",
-                    "Risk": respiratory_risk,
-                    "Score": respiratory_score,
-                    "Max_Score": 10,
-                    "Reason": f"Score: {respiratory_score}/10 - {', '.join(respiratory_factors) if respiratory_factors else 'No major risk factors'}"
-                })
+                # Enhanced Disease Risk Assessment Based on Environmental Data (rules live in risk.RISK_RULES)
+                correlation_results = assess_risk(
+                    temp=temp, humidity=humidity, rain=rain, wind_speed=wind_speed,
+                    aqi=latest_aqi, pm25=latest_pm25, pm10=latest_pm10,
+                    dominant_pollutant=dominant_pollutant, temp_change=temp_change
+                )
 
                 # Display Results with Historical Context
                 st.markdown(f"#### 🔬 Comprehensive Disease Risk Assessment for {weather_aqi_city}")
                 
                 # Add historical disease context if available for the same city
                 if not disease_df.empty:
-                    historical_data = disease_df[disease_df["City"].str.lower() == weather_aqi_city.lower()]
-                    if not historical_data.empty:
+                    if disease_cube is not None and disease_cube.has_city(weather_aqi_city):
                         st.info(f"📊 Historical disease data available for {weather_aqi_city}. Risk assessment considers current environmental conditions and historical patterns.")
                         
                         # Show recent disease trends for this city
-                        recent_cases = historical_data.groupby("Disease")["Population_Affected"].sum().to_dict()
+                        recent_cases = disease_cube.city_totals(weather_aqi_city, "Population_Affected")
                         st.markdown("**📈 Recent Historical Cases:**")
+                        boot = bootstrap_job.result if bootstrap_job is not None and bootstrap_job.done else None
                         for disease, cases in recent_cases.items():
-                            st.write(f"• {disease}: {cases:,} cases")
+                            low, high = boot.total_interval(weather_aqi_city, disease) if boot is not None else (np.nan, np.nan)
+                            if np.isfinite(low):
+                                st.write(f"• {disease}: {cases:,} cases ({boot.confidence:.0%} CI {low:,.0f}–{high:,.0f})")
+                            else:
+                                st.write(f"• {disease}: {cases:,} cases")
                     else:
                         st.info(f"🌍 Using environmental data from {weather_aqi_city}. No historical disease data available for this specific city.")
 
@@ -1085,65 +783,50 @@ if show_correlation:
 
                 # Risk Level Bar Chart
                 st.markdown("#### 📊 Disease Risk Levels")
-                risk_chart = create_risk_bar_chart(corr_df, color_map)
+                risk_chart = risk_level_bar_option(corr_df["Disease"].tolist(), corr_df["Risk"].tolist(), color_map)
                 st_echarts(options=risk_chart, height="400px")
 
                 # Risk Score Comparison
                 st.markdown("#### 📈 Risk Score Comparison")
-                # Prepare data with colors for each risk level
-                score_data = []
-                for score, risk in zip(corr_df["Risk_Percentage"], corr_df["Risk"]):
-                    score_data.append({
-                        "value": score,
-                        "itemStyle": {"color": color_map[risk]}
-                    })
-                
-                score_chart = {
-                    "tooltip": {"trigger": "axis"},
-                    "xAxis": {"type": "category", "data": corr_df["Disease"].tolist()},
-                    "yAxis": {"type": "value", "name": "Risk Percentage (%)"},
-                    "series": [{
-                        "name": "Risk Score",
-                        "type": "bar",
-                        "data": score_data,
-                        "label": {"show": True, "position": "top", "formatter": "{c}%"}
-                    }]
-                }
+                score_chart = risk_score_option(corr_df["Disease"].tolist(), corr_df["Risk_Percentage"].tolist(),
+                                                corr_df["Risk"].tolist(), color_map)
                 st_echarts(options=score_chart, height="400px")
 
                 # Risk Distribution Pie Chart
                 risk_counts = corr_df["Risk"].value_counts().to_dict()
-                pie_chart = {
-                    "tooltip": {"trigger": "item"},
-                    "series": [{
-                        "name": "Risk Distribution",
-                        "type": "pie",
-                        "radius": "50%",
-                        "data": [{"value": v, "name": k, "itemStyle": {"color": color_map[k]}} for k, v in risk_counts.items()]
-                    }]
-                }
+                pie_chart = distribution_pie_option("Risk Distribution", risk_counts, color_map)
                 st.markdown("#### 🥧 Overall Risk Distribution")
                 st_echarts(options=pie_chart, height="350px")
 
                 # Enhanced Radar Chart
-                radar_chart = {
-                    "tooltip": {},
-                    "legend": {"data": ["Risk Percentage"]},
-                    "radar": {
-                        "indicator": [{"name": row["Disease"], "max": 100} for _, row in corr_df.iterrows()]
-                    },
-                    "series": [{
-                        "name": "Risk Assessment",
-                        "type": "radar",
-                        "data": [{
-                            "value": corr_df["Risk_Percentage"].tolist(),
-                            "name": "Risk Percentage"
-                        }]
-                    }]
-                }
+                radar_chart = risk_radar_option(corr_df["Disease"].tolist(), corr_df["Risk_Percentage"].tolist())
                 st.markdown("#### 🕸 Disease Risk Radar")
                 st_echarts(options=radar_chart, height="400px")
 
+                # Risk timeline over the full forecast horizon
+                if env.forecast and env.forecast.get("list"):
+                    timeline = forecast_risk_timeline(env.forecast, aqi=latest_aqi, pm25=latest_pm25,
+                                                      pm10=latest_pm10, dominant_pollutant=dominant_pollutant)
+                    step_labels = [datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M") for ts in timeline.times]
+                    timeline_chart = risk_timeline_option(
+                        step_labels, {dis: values.tolist() for dis, values in timeline.percentage.items()})
+                    st.markdown("#### ⏱ Risk Timeline (5-day forecast)")
+                    st_echarts(options=timeline_chart, height="400px")
+
+                    peak_rows = []
+                    for dis in timeline.percentage:
+                        peak = timeline.peak(dis)
+                        if peak:
+                            peak_time, peak_pct, peak_level = peak
+                            peak_rows.append({
+                                "Disease": dis,
+                                "Peak Risk Time": datetime.fromtimestamp(peak_time).strftime("%Y-%m-%d %H:%M"),
+                                "Peak Risk Score (%)": peak_pct,
+                                "Peak Risk Level": peak_level
+                            })
+                    st.dataframe(pd.DataFrame(peak_rows), use_container_width=True)
+                    st.caption("Forecast steps use forecast temperature, humidity, rain and wind with a rolling 24 h temperature range; air quality is held at current levels.")
+
                 # Enhanced written summary
                 st.markdown("### 📝 Detailed Environmental-Disease Correlation Summary")
                 st.markdown(f"**🌍 Analysis for {weather_aqi_city}** based on current comprehensive environmental conditions:")
@@ -1235,6 +918,101 @@ if show_correlation:
         if st.checkbox("Show Debug Info"):
             st.exception(e)
 
+# ---------------- NATIONAL RISK OVERVIEW ----------------
+@fragment
+def render_national(cities: Tuple[str, ...]) -> None:
+    st.markdown("### 🗺 National Risk Overview")
+
+    # Offline: flags from the historical series, no API calls needed
+    if disease_anomalies is not None:
+        st.markdown("#### 🚨 Current Outbreak Anomalies")
+        current_anomalies = disease_anomalies.current(recent_months=3)
+        if current_anomalies.empty:
+            st.success("No city × disease series is above its seasonal baseline in its latest 3 recorded months.")
+        else:
+            st.dataframe(current_anomalies, use_container_width=True)
+        st.caption(f"Months with cases more than {disease_anomalies.threshold} robust SDs (MAD) above the "
+                   "same calendar month's multi-year median, within each series' latest 3 recorded months.")
+    if not cities:
+        st.error("Disease dataset not loaded, so there is no city list to assess.")
+    else:
+        st.caption(f"Current and 5-day peak risk for all {len(cities)} dataset cities, fetched in parallel.")
+        progress_slot = st.empty()
+        ranking_slot = st.empty()
+
+        def fetch_all() -> Dict[str, CityEnvironment]:
+            """Collect every city, updating the progress bar and the ranked table as each arrives"""
+            progress = progress_slot.progress(0.0, text="Fetching environmental data...")
+            arrived = {}
+
+            def show_city_result(result: CityEnvironment) -> None:
+                arrived[result.city] = result.snapshot
+                progress.progress(len(arrived) / len(cities), text=f"Fetched {len(arrived)}/{len(cities)} cities")
+                partial = score_locations(arrived)
+                if not partial.empty:
+                    ranking_slot.dataframe(partial, use_container_width=True)
+
+            collected = collect_environment(list(cities), api, on_result=show_city_result)
+            progress_slot.empty()
+            archive_observations({city: r.snapshot for city, r in collected.items() if r.snapshot is not None})
+            return collected
+
+        try:
+            # Cities that failed are retried once per TTL period rather than on every rerun
+            collected = section_memo("national", (cities,) + data_window(ENDPOINTS), fetch_all,
+                                     lambda kept: all(environment_cache.is_current(r.snapshot)
+                                                      for r in kept.values() if r.snapshot is not None))
+
+            national_df = score_locations({city: r.snapshot for city, r in collected.items()})
+            failed = [city for city, r in collected.items() if r.snapshot is None or r.snapshot.current is None]
+            if failed:
+                st.warning(f"No current weather for: {', '.join(failed)}")
+
+            if not national_df.empty:
+                ranking_slot.dataframe(national_df, use_container_width=True)
+
+                # City x disease grid of current risk percentage
+                grid_diseases = [col[:-len(" Risk")] for col in national_df.columns if col.endswith(" Risk")]
+                grid_cities = national_df["City"].tolist()
+                heatmap = {
+                    "tooltip": {"position": "top"},
+                    "grid": {"left": 120, "bottom": 60},
+                    "xAxis": {"type": "category", "data": grid_diseases, "splitArea": {"show": True}},
+                    "yAxis": {"type": "category", "data": grid_cities[::-1], "splitArea": {"show": True}},
+                    "visualMap": {
+                        "min": 0, "max": 100, "calculable": True, "orient": "horizontal", "left": "center", "bottom": 0,
+                        "inRange": {"color": ["#4CAF50", "#FF9800", "#F44336"]}
+                    },
+                    "series": [{
+                        "name": "Risk Score (%)",
+                        "type": "heatmap",
+                        "data": [[x, y, float(national_df.loc[len(grid_cities) - 1 - y, f"{dis} (%)"])]
+                                 for x, dis in enumerate(grid_diseases) for y in range(len(grid_cities))],
+                        "label": {"show": True}
+                    }]
+                }
+                st.markdown("#### 🌡 City × Disease Risk Grid")
+                st_echarts(options=heatmap, height=f"{max(300, 40 * len(grid_cities) + 120)}px")
+        except Exception as e:
+            st.error(f"Error building national overview: {e}")
+
+# ---------------- LAYOUT ----------------
+# (visible, render function, declared inputs). Each section loads its data through section_memo keyed on
+# those inputs, so a sidebar change refetches only the sections that read the changed value; the disease-side
+# charts and analytics are cached per city. Widgets inside a section rerun only that section.
+SECTIONS = [
+    (show_home, render_home, ()),
+    (show_weather, render_weather, ("weather_aqi_city",)),
+    (show_aqi, render_aqi, ("weather_aqi_city",)),
+    (show_disease, render_disease, ("disease_city",)),
+    (show_correlation, render_correlation, ("weather_aqi_city", "disease_city")),
+    (show_national, render_national, ("cities",)),
+]
+
+for visible, render, inputs in SECTIONS:
+    if visible:
+        render(*(section_inputs[name] for name in inputs))
+
 # ---------------- FOOTER ----------------
 st.markdown("---")
 st.markdown(
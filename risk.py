@@ -0,0 +1,338 @@
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, List, Mapping, Tuple
+
+import numpy as np
+import pandas as pd
+
+# ---------------- RULE TABLE ----------------
+@dataclass(frozen=True)
+class Tier:
+    """One scoring condition: ``variable <op> value`` adds ``points`` and names a factor.
+
+    ``op`` is one of ">", ">=", "<", "<=", "between" (inclusive, value=(low, high)) or "in"
+    (value is a collection). ``factor`` may use ``{value}`` to embed the variable's value.
+    """
+    variable: str
+    op: str
+    value: Any
+    points: int
+    factor: str
+
+
+@dataclass(frozen=True)
+class DiseaseRule:
+    """Scoring rules for one disease.
+
+    Each group is an if/elif chain: only the first matching tier in a group scores.
+    """
+    disease: str
+    groups: Tuple[Tuple[Tier, ...], ...]
+    high_at: int
+    moderate_at: int
+    max_score: int
+
+
+RISK_RULES: Tuple[DiseaseRule, ...] = (
+    DiseaseRule("Dengue", groups=(
+        (Tier("temp", "between", (25, 32), 3, "Optimal temperature for mosquito breeding"),
+         Tier("temp", "between", (20, 35), 2, "Favorable temperature"),
+         Tier("temp", ">", 35, 1, "High temperature (reduced mosquito activity)")),
+        (Tier("humidity", ">", 80, 3, "Very high humidity (ideal for mosquitoes)"),
+         Tier("humidity", ">", 70, 2, "High humidity"),
+         Tier("humidity", ">", 60, 1, "Moderate humidity")),
+        (Tier("rain", ">", 15, 3, "Heavy rainfall (breeding sites)"),
+         Tier("rain", ">", 5, 2, "Moderate rainfall"),
+         Tier("rain", ">", 1, 1, "Light rainfall")),
+        (Tier("wind_speed", "<", 1, 1, "Low wind (stagnant conditions)"),),
+        (Tier("aqi", ">", 100, 1, "Poor air quality (weakened immunity)"),),
+    ), high_at=6, moderate_at=3, max_score=11),
+
+    DiseaseRule("Heat Stroke", groups=(
+        (Tier("temp", ">", 42, 4, "Extreme dangerous heat"),
+         Tier("temp", ">", 38, 3, "Very high temperature"),
+         Tier("temp", ">", 35, 2, "High temperature"),
+         Tier("temp", ">", 32, 1, "Warm temperature")),
+        (Tier("humidity", ">", 80, 3, "Very high humidity (reduced cooling)"),
+         Tier("humidity", ">", 70, 2, "High humidity"),
+         Tier("humidity", ">", 50, 1, "Moderate humidity")),
+        (Tier("wind_speed", "<", 1, 2, "Very low wind (no cooling)"),
+         Tier("wind_speed", "<", 3, 1, "Low wind")),
+        (Tier("aqi", ">", 150, 1, "Poor air quality (additional stress)"),),
+        (Tier("heat_index", ">", 40, 2, "High heat index ({value:.1f}°C)"),),
+    ), high_at=7, moderate_at=3, max_score=12),
+
+    DiseaseRule("Asthma", groups=(
+        (Tier("aqi", ">", 200, 4, "Very unhealthy AQI"),
+         Tier("aqi", ">", 150, 3, "Unhealthy AQI"),
+         Tier("aqi", ">", 100, 2, "Unhealthy for sensitive groups"),
+         Tier("aqi", ">", 50, 1, "Moderate AQI")),
+        (Tier("pm25", ">", 75, 3, "Very high PM2.5"),
+         Tier("pm25", ">", 55, 2, "High PM2.5"),
+         Tier("pm25", ">", 35, 1, "Elevated PM2.5")),
+        (Tier("pm10", ">", 150, 2, "Very high PM10"),
+         Tier("pm10", ">", 100, 1, "High PM10")),
+        (Tier("dominant_pollutant", "in", ("O3", "NO2", "SO2"), 2, "Dominant pollutant is {value}"),),
+        (Tier("temp_change", ">", 15, 3, "Very high temperature variation"),
+         Tier("temp_change", ">", 10, 2, "High temperature variation"),
+         Tier("temp_change", ">", 5, 1, "Moderate temperature variation")),
+        (Tier("humidity", ">", 85, 2, "Very high humidity"),
+         Tier("humidity", "<", 30, 1, "Very low humidity (dry air)")),
+        (Tier("wind_speed", ">", 10, 1, "High wind (dust/allergens)"),),
+    ), high_at=8, moderate_at=4, max_score=18),
+
+    DiseaseRule("Respiratory Infections", groups=(
+        (Tier("aqi", ">", 150, 3, "Poor air quality"),
+         Tier("aqi", ">", 100, 2, "Moderate air quality")),
+        (Tier("temp", "<", 15, 2, "Cold temperature"),
+         Tier("temp", ">", 35, 1, "Hot temperature (stress)")),
+        (Tier("humidity", ">", 80, 2, "Very high humidity (mold/bacteria)"),
+         Tier("humidity", "<", 30, 1, "Very low humidity (dry airways)")),
+        (Tier("temp_change", ">", 10, 2, "High temperature variation"),),
+        (Tier("wind_speed", "<", 1, 1, "Poor air circulation"),),
+    ), high_at=5, moderate_at=3, max_score=10),
+)
+
+# Inputs every rule set may reference; heat_index is derived from temp and humidity
+CONDITION_VARIABLES = ("temp", "humidity", "rain", "wind_speed", "aqi", "pm25", "pm10",
+                       "dominant_pollutant", "temp_change")
+
+
+# ---------------- VECTORIZED EVALUATION ----------------
+@dataclass
+class RuleResult:
+    """Scores for one disease over N scenarios"""
+    disease: str
+    score: np.ndarray              # int, shape (N,)
+    level: np.ndarray              # object: "Low" / "Moderate" / "High"
+    factor_masks: List[Tuple[Tier, np.ndarray]]  # matched tier per scenario, in rule order
+    max_score: int
+
+    @property
+    def percentage(self) -> np.ndarray:
+        return np.round(self.score / self.max_score * 100, 1)
+
+
+def prepare_conditions(conditions: Mapping[str, Any]) -> Dict[str, np.ndarray]:
+    """Broadcast condition inputs to 1-D arrays and add derived variables"""
+    numeric = {name: np.asarray(conditions[name], dtype=np.float64)
+               for name in CONDITION_VARIABLES if name != "dominant_pollutant" and name in conditions}
+    arrays = dict(numeric)
+    if "dominant_pollutant" in conditions:
+        arrays["dominant_pollutant"] = np.asarray(conditions["dominant_pollutant"], dtype=object)
+    names = list(arrays)
+    broadcast = np.broadcast_arrays(*[np.atleast_1d(arrays[name]) for name in names])
+    arrays = {name: np.asarray(values) for name, values in zip(names, broadcast)}
+
+    if "temp" in arrays and "humidity" in arrays:
+        # Simplified heat index; same operation order as the original scalar formula
+        temp, humidity = arrays["temp"], arrays["humidity"]
+        arrays["heat_index"] = temp + (0.5 * humidity / 100 * temp)
+    return arrays
+
+
+def _tier_mask(tier: Tier, values: np.ndarray) -> np.ndarray:
+    if tier.op == ">":
+        return values > tier.value
+    if tier.op == ">=":
+        return values >= tier.value
+    if tier.op == "<":
+        return values < tier.value
+    if tier.op == "<=":
+        return values <= tier.value
+    if tier.op == "between":
+        low, high = tier.value
+        return (values >= low) & (values <= high)
+    if tier.op == "in":
+        return np.isin(values, list(tier.value))
+    raise ValueError(f"Unknown rule operator: {tier.op}")
+
+
+def evaluate_rule(rule: DiseaseRule, arrays: Dict[str, np.ndarray]) -> RuleResult:
+    """Score one disease for every scenario at once"""
+    n = len(next(iter(arrays.values())))
+    score = np.zeros(n, dtype=np.int64)
+    factor_masks = []
+    for group in rule.groups:
+        taken = np.zeros(n, dtype=bool)
+        for tier in group:
+            mask = _tier_mask(tier, arrays[tier.variable]) & ~taken
+            score += mask * tier.points
+            taken |= mask
+            factor_masks.append((tier, mask))
+    level = np.where(score >= rule.high_at, "High", np.where(score >= rule.moderate_at, "Moderate", "Low")).astype(object)
+    return RuleResult(rule.disease, score, level, factor_masks, rule.max_score)
+
+
+def evaluate_rules(conditions: Mapping[str, Any], rules: Tuple[DiseaseRule, ...] = RISK_RULES) -> Dict[str, RuleResult]:
+    """Evaluate every disease's rules over arrays (or scalars) of conditions in one pass"""
+    arrays = prepare_conditions(conditions)
+    return {rule.disease: evaluate_rule(rule, arrays) for rule in rules}
+
+
+# ---------------- SCENARIO OUTPUT ----------------
+def factor_texts(result: RuleResult, arrays: Dict[str, np.ndarray], i: int) -> List[str]:
+    """Human-readable factors that scored for scenario ``i``"""
+    return [tier.factor.format(value=arrays[tier.variable][i])
+            for tier, mask in result.factor_masks if mask[i]]
+
+
+def assess_scenarios(conditions: Mapping[str, Any], rules: Tuple[DiseaseRule, ...] = RISK_RULES,
+                     with_reasons: bool = True) -> List[List[Dict[str, Any]]]:
+    """Per-scenario rows shaped like the dashboard's risk table (Disease, Risk, Score, Max_Score, Reason)"""
+    arrays = prepare_conditions(conditions)
+    results = [evaluate_rule(rule, arrays) for rule in rules]
+    n = len(next(iter(arrays.values())))
+    scenarios = []
+    for i in range(n):
+        rows = []
+        for result in results:
+            score = int(result.score[i])
+            row = {"Disease": result.disease, "Risk": result.level[i], "Score": score, "Max_Score": result.max_score}
+            if with_reasons:
+                factors = factor_texts(result, arrays, i)
+                row["Reason"] = (f"Score: {score}/{result.max_score} - "
+                                 f"{', '.join(factors) if factors else 'No major risk factors'}")
+            rows.append(row)
+        scenarios.append(rows)
+    return scenarios
+
+
+def assess_risk(temp: float, humidity: float, rain: float, wind_speed: float, aqi: float,
+                pm25: float, pm10: float, dominant_pollutant: Optional[str], temp_change: float,
+                rules: Tuple[DiseaseRule, ...] = RISK_RULES) -> List[Dict[str, Any]]:
+    """Risk rows for a single set of current conditions"""
+    return assess_scenarios({
+        "temp": temp, "humidity": humidity, "rain": rain, "wind_speed": wind_speed, "aqi": aqi,
+        "pm25": pm25, "pm10": pm10, "dominant_pollutant": dominant_pollutant, "temp_change": temp_change,
+    }, rules)[0]
+
+
+# ---------------- FORECAST HORIZON ----------------
+# 3-hourly steps per 24 h, the window behind the current "Temp Variation" figure
+STEPS_PER_DAY = 8
+
+
+def rolling_range(values: np.ndarray, window: int = STEPS_PER_DAY) -> np.ndarray:
+    """Max - min over each step and the ``window - 1`` steps after it (shorter at the end)"""
+    values = np.asarray(values, dtype=np.float64)
+    if values.size == 0:
+        return values
+    padded = np.concatenate([values, np.full(window - 1, np.nan)])
+    windows = np.lib.stride_tricks.sliding_window_view(padded, window)
+    return np.nanmax(windows, axis=1) - np.nanmin(windows, axis=1)
+
+
+def forecast_conditions(forecast: dict, aqi: float = 0, pm25: float = 0, pm10: float = 0,
+                        dominant_pollutant: Optional[str] = "None") -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """Condition arrays for every step of a /data/2.5/forecast response.
+
+    The forecast has no air quality, so the current AQI, PM values and dominant pollutant
+    are held constant over the horizon. Rain is converted from mm per 3 h to mm/h.
+    """
+    steps = forecast.get("list", []) if forecast else []
+    n = len(steps)
+    times = np.fromiter((step["dt"] for step in steps), dtype=np.int64, count=n)
+    temp = np.fromiter((step["main"]["temp"] for step in steps), dtype=np.float64, count=n)
+    conditions = {
+        "temp": temp,
+        "humidity": np.fromiter((step["main"]["humidity"] for step in steps), dtype=np.float64, count=n),
+        "rain": np.fromiter((step.get("rain", {}).get("3h", 0) for step in steps), dtype=np.float64, count=n) / 3,
+        "wind_speed": np.fromiter((step.get("wind", {}).get("speed", 0) for step in steps), dtype=np.float64, count=n),
+        "temp_change": rolling_range(temp),
+        "aqi": np.full(n, aqi, dtype=np.float64),
+        "pm25": np.full(n, pm25, dtype=np.float64),
+        "pm10": np.full(n, pm10, dtype=np.float64),
+        "dominant_pollutant": np.full(n, dominant_pollutant, dtype=object),
+    }
+    return times, conditions
+
+
+@dataclass
+class RiskTimeline:
+    """Per-step risk over a forecast horizon for one location"""
+    times: np.ndarray                    # unix seconds, shape (steps,)
+    percentage: Dict[str, np.ndarray]    # disease -> risk score % per step
+    level: Dict[str, np.ndarray]         # disease -> "Low"/"Moderate"/"High" per step
+
+    def peak(self, disease: str) -> Optional[Tuple[int, float, str]]:
+        """(time, risk %, level) of the first step with the highest score"""
+        values = self.percentage.get(disease)
+        if values is None or values.size == 0:
+            return None
+        i = int(np.argmax(values))
+        return int(self.times[i]), float(values[i]), str(self.level[disease][i])
+
+
+def forecast_risk_timelines(forecasts: List[dict], air: List[Dict[str, Any]],
+                            rules: Tuple[DiseaseRule, ...] = RISK_RULES) -> List[RiskTimeline]:
+    """Score every step of many forecasts with one rule evaluation.
+
+    ``air`` holds, per forecast, the current ``aqi``, ``pm25``, ``pm10`` and
+    ``dominant_pollutant`` to hold constant over that forecast's horizon.
+    """
+    per_location = [forecast_conditions(forecast, **conditions) for forecast, conditions in zip(forecasts, air)]
+    if not per_location:
+        return []
+    lengths = [len(times) for times, _ in per_location]
+    if sum(lengths) == 0:
+        return [RiskTimeline(times, {}, {}) for times, _ in per_location]
+
+    merged = {name: np.concatenate([conditions[name] for _, conditions in per_location])
+              for name in per_location[0][1]}
+    results = evaluate_rules(merged, rules)
+    bounds = np.cumsum([0] + lengths)
+
+    timelines = []
+    for (times, _), start, stop in zip(per_location, bounds[:-1], bounds[1:]):
+        timelines.append(RiskTimeline(
+            times=times,
+            percentage={disease: result.percentage[start:stop] for disease, result in results.items()},
+            level={disease: result.level[start:stop] for disease, result in results.items()},
+        ))
+    return timelines
+
+
+def forecast_risk_timeline(forecast: dict, aqi: float = 0, pm25: float = 0, pm10: float = 0,
+                           dominant_pollutant: Optional[str] = "None",
+                           rules: Tuple[DiseaseRule, ...] = RISK_RULES) -> RiskTimeline:
+    """Risk timeline for a single forecast"""
+    air = {"aqi": aqi, "pm25": pm25, "pm10": pm10, "dominant_pollutant": dominant_pollutant}
+    return forecast_risk_timelines([forecast], [air], rules)[0]
+
+
+# ---------------- MULTI-LOCATION SCORING ----------------
+AIR_CONDITIONS = ("aqi", "pm25", "pm10", "dominant_pollutant")
+
+
+def score_locations(snapshots: Mapping[str, Any], rules: Tuple[DiseaseRule, ...] = RISK_RULES) -> pd.DataFrame:
+    """Current and forecast-peak risk for many locations, one row per location.
+
+    ``snapshots`` maps a location name to an environment snapshot (anything with
+    ``current``, ``forecast`` and ``risk_conditions()``). Locations without current weather
+    are skipped. Current conditions for all locations are scored in one rule evaluation,
+    and every forecast step of every location in another.
+    """
+    usable = {name: snap for name, snap in snapshots.items() if snap is not None and snap.current}
+    if not usable:
+        return pd.DataFrame()
+
+    names = list(usable)
+    current = [usable[name].risk_conditions() for name in names]
+    stacked = {key: np.array([c[key] for c in current], dtype=object if key == "dominant_pollutant" else np.float64)
+               for key in current[0]}
+    results = evaluate_rules(stacked, rules)
+
+    timelines = forecast_risk_timelines([usable[name].forecast or {} for name in names],
+                                        [{key: c[key] for key in AIR_CONDITIONS} for c in current], rules)
+
+    rows = []
+    for i, name in enumerate(names):
+        row = {"City": name}
+        for disease, result in results.items():
+            row[f"{disease} (%)"] = float(result.percentage[i])
+            row[f"{disease} Risk"] = result.level[i]
+            peak = timelines[i].peak(disease)
+            row[f"{disease} Peak (%)"] = peak[1] if peak else np.nan
+        row["Max Risk (%)"] = max(float(result.percentage[i]) for result in results.values())
+        rows.append(row)
+    return pd.DataFrame(rows).sort_values("Max Risk (%)", ascending=False, kind="stable").reset_index(drop=True)
@@ -0,0 +1,44 @@
+import os
+import sys
+
+import pytest
+
+# The modules live flat in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def stub():
+    """Start local OWM stub servers (see owm_stub.py) with the given StubConfig fields"""
+    from owm_stub import StubConfig, start_stub_server
+
+    servers = []
+
+    def start(**config):
+        server, _ = start_stub_server(StubConfig(seed=1, **config))
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def stub_api(stub, monkeypatch):
+    """Route the shared OWM clients (environment and geocoding calls) to a local stub"""
+    import environment
+    import geocode
+    import owm_client
+
+    monkeypatch.setattr(owm_client, "_clients", {})
+    monkeypatch.setattr(owm_client, "_buckets", {})
+
+    def start(**config):
+        server = stub(**config)
+        for module in (environment, geocode):
+            monkeypatch.setattr(module, "get_client", lambda api_key: owm_client.get_client(api_key, server.base_url))
+        return server
+
+    return start
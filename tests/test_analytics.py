@@ -0,0 +1,144 @@
+import numpy as np
+import pytest
+
+from analytics import (ANOMALY_THRESHOLD, MAD_SCALE, MIN_PERIODS, align_series, betainc, correlate,
+                       lagged_correlation, rank_along_last, seasonal_anomalies, t_two_sided_p)
+from disease_cube import METRICS, DiseaseCube
+from env_archive import EnvArchive
+
+AFFECTED = METRICS.index("Population_Affected")
+
+
+def monthly_labels(first_year, first_month, n):
+    return [f"{first_year + (first_month - 1 + i) // 12:04d}-{(first_month - 1 + i) % 12 + 1:02d}-01" for i in range(n)]
+
+
+def synthetic_sources(rng, n_months=60):
+    """A cube and an archive on offset month ranges, with gaps, ties and a city only in the archive.
+
+    The archive starts three months before the cube, and disease tracks the archive's
+    temperature three months earlier.
+    """
+    cities, diseases, variables = ["Delhi", "Pune", "Agra"], ["Dengue", "Malaria"], ("temp", "humidity", "aqi")
+    env = rng.normal(25, 5, (len(cities), n_months + 3, len(variables)))
+    env[rng.random(env.shape) < 0.15] = np.nan
+    lead = np.nan_to_num(env[:, None, :n_months, 0], nan=25.0)
+    affected = np.rint(np.clip(lead * rng.uniform(1, 4, (len(cities), len(diseases), 1))
+                               + rng.normal(0, 8, (len(cities), len(diseases), n_months)), 0, None))
+    counts = (rng.random(affected.shape) > 0.2).astype(np.int64)
+    values = np.zeros(affected.shape + (len(METRICS),), dtype=np.int64)
+    values[..., AFFECTED] = np.where(counts > 0, affected, 0)
+    cube = DiseaseCube(values, counts, cities, diseases, monthly_labels(2019, 4, n_months))
+
+    surat = np.full((1, n_months + 3, len(variables)), 20.0)
+    archive = EnvArchive(np.concatenate([env[[2, 0, 1]], surat]), ("agra", "Delhi", "Pune", "Surat"),
+                         tuple(monthly_labels(2019, 1, n_months + 3)), variables)
+    return cube, archive
+
+
+def test_betainc_and_t_p_values_match_scipy():
+    special = pytest.importorskip("scipy.special")
+    stats = pytest.importorskip("scipy.stats")
+    rng = np.random.default_rng(0)
+    a, b, x = rng.uniform(0.1, 60, 5000), rng.uniform(0.1, 60, 5000), rng.uniform(0, 1, 5000)
+    np.testing.assert_allclose(betainc(a, b, x), special.betainc(a, b, x), rtol=1e-9, atol=1e-14)
+    assert betainc(2.0, 3.0, 0.0) == 0.0 and betainc(2.0, 3.0, 1.0) == 1.0
+
+    t, df = rng.normal(0, 4, 5000), rng.integers(1, 200, 5000).astype(np.float64)
+    np.testing.assert_allclose(t_two_sided_p(t, df), 2 * stats.t.sf(np.abs(t), df), rtol=1e-9, atol=1e-14)
+    assert t_two_sided_p(np.inf, 10.0) == 0.0
+
+
+def test_ranks_match_scipy_average_ranks():
+    stats = pytest.importorskip("scipy.stats")
+    rng = np.random.default_rng(1)
+    values = rng.integers(0, 6, (4, 5, 30)).astype(np.float64)
+    ranks = rank_along_last(values)
+    np.testing.assert_array_equal(ranks, stats.rankdata(values, axis=-1))
+
+    values[0, 0, ::4] = np.nan
+    ranks = rank_along_last(values)
+    assert np.isnan(ranks[0, 0, ::4]).all()
+    valid = np.isfinite(values[0, 0])
+    np.testing.assert_array_equal(ranks[0, 0][valid], stats.rankdata(values[0, 0][valid]))
+
+
+def test_correlate_matches_scipy_pair_by_pair():
+    stats = pytest.importorskip("scipy.stats")
+    cube, archive = synthetic_sources(np.random.default_rng(2))
+    result = correlate(cube, archive)
+    disease, environment, cities, _ = align_series(cube, archive)
+
+    assert cities == ("Delhi", "Pune", "Agra")
+    for c in range(len(cities)):
+        for d in range(len(cube.diseases)):
+            for v in range(len(archive.variables)):
+                y, x = disease[c, d], environment[c, v]
+                both = np.isfinite(x) & np.isfinite(y)
+                assert result.n[c, d, v] == both.sum()
+                pearson = stats.pearsonr(x[both], y[both])
+                spearman = stats.spearmanr(x[both], y[both])
+                np.testing.assert_allclose(result.pearson_r[c, d, v], pearson.statistic, rtol=1e-10)
+                np.testing.assert_allclose(result.pearson_p[c, d, v], pearson.pvalue, rtol=1e-8, atol=1e-300)
+                np.testing.assert_allclose(result.spearman_r[c, d, v], spearman.statistic, rtol=1e-10)
+                np.testing.assert_allclose(result.spearman_p[c, d, v], spearman.pvalue, rtol=1e-8, atol=1e-300)
+
+
+def test_pairs_with_too_few_shared_months_have_no_coefficient():
+    cube, archive = synthetic_sources(np.random.default_rng(3), n_months=8)
+    result = correlate(cube, archive, min_periods=20)
+    assert np.isnan(result.pearson_r).all() and np.isnan(result.spearman_p).all()
+
+
+def shifted_pearson(x, y, lag, min_periods):
+    """Pearson r of y[t] against x[t - lag] over the months both have"""
+    x = np.concatenate([np.full(lag, np.nan), x[:len(x) - lag]])
+    both = np.isfinite(x) & np.isfinite(y)
+    if both.sum() < min_periods or np.std(x[both]) == 0 or np.std(y[both]) == 0:
+        return np.nan, both.sum()
+    return np.corrcoef(x[both], y[both])[0, 1], both.sum()
+
+
+def test_fft_lag_correlation_matches_direct_shifted_pearson():
+    cube, archive = synthetic_sources(np.random.default_rng(4))
+    result = lagged_correlation(cube, archive, max_lag=12)
+    disease, environment, cities, _ = align_series(cube, archive)
+
+    assert list(result.lags) == list(range(13))
+    for c in range(len(cities)):
+        for d in range(len(cube.diseases)):
+            for v in range(len(archive.variables)):
+                expected = [shifted_pearson(environment[c, v], disease[c, d], lag, MIN_PERIODS) for lag in range(13)]
+                np.testing.assert_allclose(result.r[c, d, v], [r for r, _ in expected], rtol=1e-8, atol=1e-10)
+                assert list(result.n[c, d, v]) == [n for _, n in expected]
+                best = int(np.nanargmax(np.abs([r for r, _ in expected])))
+                assert result.best_lag[c, d, v] == best
+    # Disease was generated from temperature three months earlier
+    temp = archive.variables.index("temp")
+    assert (result.best_lag[..., temp] == 3).all()
+
+
+def test_seasonal_anomalies_match_a_per_series_loop():
+    rng = np.random.default_rng(5)
+    cube, _ = synthetic_sources(rng, n_months=50)
+    # A few outbreaks, and one calendar month never recorded for a series
+    cube.values[0, 0, [10, 31], AFFECTED] *= 6
+    cube.counts[1, 1, 2::12] = 0
+    result = seasonal_anomalies(cube)
+
+    for c in range(len(cube.cities)):
+        for d in range(len(cube.diseases)):
+            series = np.where(cube.counts[c, d] > 0, cube.values[c, d, :, AFFECTED], np.nan).astype(np.float64)
+            calendar = np.array([int(m[5:7]) for m in cube.months])
+            for i, month in enumerate(calendar):
+                same = series[calendar == month]
+                same = same[np.isfinite(same)]
+                if np.isnan(series[i]):
+                    assert np.isnan(result.z[c, d, i]) and not result.flags[c, d, i]
+                    continue
+                median = np.median(same)
+                scale = max(np.median(np.abs(same - median)) * MAD_SCALE, 1.0)
+                assert result.baseline[c, d, i] == median
+                np.testing.assert_allclose(result.z[c, d, i], (series[i] - median) / scale, rtol=1e-12)
+                assert result.flags[c, d, i] == ((series[i] - median) / scale > ANOMALY_THRESHOLD)
+    assert {"2020-02-01", "2021-11-01"} <= set(result.series_flags("Delhi", "Dengue"))
@@ -0,0 +1,52 @@
+import math
+
+import numpy as np
+
+from aqi import (POLLUTANTS, _BREAKPOINT_ARRAYS, calculate_aqi, calculate_aqi_batch, calculate_comprehensive_aqi,
+                 calculate_comprehensive_aqi_batch)
+
+
+def readings(breakpoints, rng):
+    """Band edges, values between bands, half-way points, negatives and values past the top"""
+    edges = [value for low, high, _, _ in breakpoints for value in (low, high, (low + high) / 2)]
+    gaps = [high + 0.05 for _, high, _, _ in breakpoints]
+    top = breakpoints[-1][1]
+    return np.array(edges + gaps + [-1.0, top * 2] + list(rng.uniform(0, top * 1.2, 500)))
+
+
+def test_batch_matches_the_scalar_breakpoint_search():
+    rng = np.random.default_rng(0)
+    for key, (_, _, breakpoints) in POLLUTANTS.items():
+        values = readings(breakpoints, rng)
+        batch = calculate_aqi_batch(values, _BREAKPOINT_ARRAYS[key])
+        for value, result in zip(values, batch):
+            expected = calculate_aqi(float(value), breakpoints)
+            if expected is None:
+                assert math.isnan(result), (key, value)
+            else:
+                assert result == expected, (key, value)
+    assert math.isnan(calculate_aqi_batch(np.array([np.nan]), _BREAKPOINT_ARRAYS["pm2_5"])[0])
+
+
+def test_comprehensive_batch_matches_the_scalar_result_per_location():
+    rng = np.random.default_rng(1)
+    n = 300
+    components = {key: rng.uniform(0, breakpoints[-1][1] * 1.1, n) for key, (_, _, breakpoints) in POLLUTANTS.items()}
+    # Missing readings, and one location with nothing valid at all
+    components["o3"][::7] = np.nan
+    components["co"][::5] = np.nan
+    for key in components:
+        components[key][0] = np.nan
+    components["pm10"][1] = -3.0
+
+    batch = calculate_comprehensive_aqi_batch(components)
+    for i in range(n):
+        row = {key: (None if np.isnan(values[i]) else float(values[i])) for key, values in components.items()}
+        expected = calculate_comprehensive_aqi(row)
+        if expected["overall_aqi"] is None:
+            assert math.isnan(batch["overall_aqi"][i]) and batch["dominant_pollutant"][i] is None
+            continue
+        assert batch["overall_aqi"][i] == expected["overall_aqi"]
+        assert batch["dominant_pollutant"][i] == expected["dominant_pollutant"]
+        individual = {label: values[i] for label, values in batch["individual_aqis"].items() if not np.isnan(values[i])}
+        assert individual == expected["individual_aqis"]
@@ -0,0 +1,57 @@
+import time
+
+import pytest
+
+from batch_collector import collect_environment, summarize_collection
+from environment import ENDPOINTS, EnvironmentCache
+from geocode import GAZETTEER, GeocodeStore
+from owm_client import configure_rate_limit
+
+CITIES = list(GAZETTEER)[:6]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = GeocodeStore(str(tmp_path / "geocode.sqlite3"))
+    store.preload(GAZETTEER)
+    return store
+
+
+def test_collects_every_city_into_the_shared_cache(stub_api, store):
+    server = stub_api()
+    cache = EnvironmentCache()
+    arrived = []
+
+    results = collect_environment(CITIES + [CITIES[0]], "key", cache=cache, store=store,
+                                  calls_per_minute=6000, on_result=lambda r: arrived.append(r.city))
+
+    assert list(results) == CITIES
+    assert sorted(arrived) == sorted(CITIES)
+    assert summarize_collection(results)["ok"] == CITIES
+    assert server.stats["requests"] == len(CITIES) * len(ENDPOINTS)
+
+    # A second run within the TTLs is served from the cache
+    collect_environment(CITIES, "key", cache=cache, store=store, calls_per_minute=6000)
+    assert server.stats["requests"] == len(CITIES) * len(ENDPOINTS)
+
+
+def test_calls_are_held_to_the_token_bucket(stub_api, store):
+    stub_api()
+    configure_rate_limit("key", 600, capacity=5)
+    started = time.monotonic()
+    # None keeps the configured limit: 18 calls on a burst of 5 need 13 more tokens at 10 per second
+    results = collect_environment(CITIES, "key", cache=EnvironmentCache(), store=store, calls_per_minute=None)
+    elapsed = time.monotonic() - started
+
+    assert summarize_collection(results)["ok"] == CITIES
+    assert 1.2 < elapsed < 5
+
+
+def test_unlocatable_and_unreachable_cities_are_reported(stub_api, store):
+    stub_api(error_rate=1.0)
+    results = collect_environment([CITIES[0], "Atlantis"], "key", cache=EnvironmentCache(), store=store,
+                                  calls_per_minute=6000, timeout=1)
+    # The stub has no gazetteer entry for Atlantis and answers geocoding with 503 as well
+    assert results["Atlantis"].snapshot is None and results["Atlantis"].error
+    assert not results[CITIES[0]].has_data
+    assert summarize_collection(results)["failed"] == [CITIES[0], "Atlantis"]
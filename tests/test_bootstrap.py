@@ -0,0 +1,132 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import bootstrap
+from bootstrap import BootstrapService, _bootstrap_chunk, _share
+from disease_cube import METRICS, DiseaseCube
+from env_archive import EnvArchive
+
+MONTHS = tuple(p.start_time.strftime("%Y-%m-%d") for p in pd.period_range("2020-01", periods=36, freq="M"))
+
+
+@pytest.fixture(autouse=True)
+def _fast_cancel_poll(monkeypatch):
+    monkeypatch.setattr(bootstrap, "CANCEL_POLL_SECONDS", 0.02)
+
+
+def synthetic_inputs(cities=("Amritsar", "Delhi", "Pune"), seed=7):
+    rng = np.random.default_rng(seed)
+    diseases = ["Asthma", "Dengue"]
+    values = rng.integers(50, 500, size=(len(cities), len(diseases), len(MONTHS), len(METRICS)))
+    counts = np.ones(values.shape[:3], dtype=np.int32)
+    counts[0, 1, :6] = 0
+    cube = DiseaseCube(values, counts, list(cities), diseases, list(MONTHS))
+    archive = EnvArchive(rng.normal(25, 5, size=(len(cities), len(MONTHS), 2)), tuple(cities), MONTHS,
+                         ("temp", "humidity"))
+    return cube, archive
+
+
+def shared_blocks():
+    """Names of the shared-memory blocks that exist right now (Linux), or None"""
+    if not os.path.isdir("/dev/shm"):
+        return None
+    return {name for name in os.listdir("/dev/shm") if name.startswith("psm_")}
+
+
+def test_mean_chunk_matches_a_direct_resample():
+    series = np.random.default_rng(1).normal(100, 10, size=(3, 2, 24))
+    series[1, 0, :5] = np.nan
+    block, handle = _share(series)
+    try:
+        kind, start, means = _bootstrap_chunk("mean", (handle,), 1, 3, seed=5, round_index=2,
+                                              replicates=50, min_periods=6)
+    finally:
+        block.close()
+        block.unlink()
+
+    rng = np.random.default_rng(bootstrap._chunk_seed(5, "mean", 1, 2))
+    idx = rng.integers(0, 24, size=(50, 24))
+    expected = np.array([[[np.nanmean(series[c, d, idx[b]]) for b in range(50)] for d in range(2)]
+                         for c in (1, 2)])
+    assert (kind, start) == ("mean", 1)
+    np.testing.assert_allclose(means, expected)
+
+
+def test_intervals_are_reproducible_for_a_seed():
+    cube, archive = synthetic_inputs()
+    results = []
+    for _ in range(2):
+        service = BootstrapService(max_workers=2, seed=3, round_size=50, max_replicates=100)
+        try:
+            job = service.submit(cube, archive)
+            assert job.wait(120) is not None, job.error
+            results.append(job.result)
+        finally:
+            service.shutdown()
+
+    first, second = results
+    np.testing.assert_array_equal(first.r_low, second.r_low)
+    np.testing.assert_array_equal(first.mean_high, second.mean_high)
+    # The interval brackets the point estimate it was drawn around
+    mean = first.mean[1, 0]
+    assert first.mean_low[1, 0] <= mean <= first.mean_high[1, 0]
+    low, high = first.total_interval("delhi", "Asthma")
+    assert low <= cube.totals("Delhi", "Asthma")["Population_Affected"] <= high
+
+
+def test_same_layout_reuses_the_job_and_a_new_one_cancels_it():
+    cube, archive = synthetic_inputs()
+    service = BootstrapService(max_workers=2, tolerance=0.0, round_size=50, max_replicates=10 ** 6)
+    shm_before = shared_blocks()
+    try:
+        job = service.submit(cube, archive)
+        shifted = EnvArchive(archive.values + 0.1, archive.cities, archive.months, archive.variables)
+        assert service.submit(cube, shifted) is job
+
+        deadline = time.monotonic() + 60
+        while job.replicates_done == 0 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        wider = synthetic_inputs(cities=("Amritsar", "Delhi", "Pune", "Shimla"))[1]
+        replacement = service.submit(cube, wider)
+
+        assert replacement is not job and job.cancelled
+        assert service.current() is replacement
+        job.wait(30)
+        assert job.done and job.result is None and job.error is None
+        replacement.cancel()
+        replacement.wait(30)
+        assert replacement.done
+    finally:
+        service.shutdown()
+    if shm_before is not None:
+        # Both runs released their shared-memory blocks
+        assert shared_blocks() - shm_before == set()
+
+
+def test_cancelled_job_submits_no_more_chunks(monkeypatch):
+    cube, archive = synthetic_inputs()
+    service = BootstrapService(max_workers=1, chunk_size=1, tolerance=0.0, round_size=20, max_replicates=10 ** 6)
+    submitted = []
+    executor = service._executor()
+    original_submit = executor.submit
+
+    def submit(*args, **kwargs):
+        submitted.append(args[1:3])
+        return original_submit(*args, **kwargs)
+
+    monkeypatch.setattr(executor, "submit", submit)
+    try:
+        job = service.submit(cube, archive)
+        deadline = time.monotonic() + 60
+        while job.replicates_done == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        job.cancel()
+        count = len(submitted)
+        assert job.wait(30) is None and job.done
+        assert len(submitted) <= count + 1
+    finally:
+        service.shutdown()
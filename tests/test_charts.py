@@ -0,0 +1,111 @@
+import math
+
+import numpy as np
+
+from charts import (OptionCache, aqi_gauge_option, city_trend_chart, disease_trend_chart, downsample, lttb_indices,
+                    option_cache, precompute_disease_charts, weather_trend_option)
+from disease_cube import METRICS, DiseaseCube
+
+
+def reference_lttb(data, threshold):
+    """Steinarsson's Largest-Triangle-Three-Buckets, point by point as in the thesis pseudocode"""
+    n = len(data)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+    every = (n - 2) / (threshold - 2)
+    a, sampled = 0, [0]
+    for i in range(threshold - 2):
+        avg_start = int(math.floor((i + 1) * every)) + 1
+        avg_end = min(int(math.floor((i + 2) * every)) + 1, n)
+        avg_x = sum(range(avg_start, avg_end)) / (avg_end - avg_start)
+        avg_y = sum(data[avg_start:avg_end]) / (avg_end - avg_start)
+
+        max_area, next_a = -1.0, None
+        for j in range(int(math.floor(i * every)) + 1, int(math.floor((i + 1) * every)) + 1):
+            area = abs((a - avg_x) * (data[j] - data[a]) - (a - j) * (avg_y - data[a])) * 0.5
+            if area > max_area:
+                max_area, next_a = area, j
+        sampled.append(next_a)
+        a = next_a
+    sampled.append(n - 1)
+    return sampled
+
+
+def test_lttb_matches_the_reference_algorithm():
+    rng = np.random.default_rng(0)
+    for n in (5, 17, 100, 999, 5000):
+        y = np.cumsum(rng.normal(0, 1, n)) + 5 * np.sin(np.arange(n) / 20)
+        for threshold in (3, 4, 10, n // 3, n - 1):
+            if not 3 <= threshold < n:
+                continue
+            picked = lttb_indices(y, threshold)
+            assert picked.tolist() == reference_lttb(y.tolist(), threshold), (n, threshold)
+            assert len(picked) == threshold and picked[0] == 0 and picked[-1] == n - 1
+            assert (np.diff(picked) > 0).all()
+
+
+def test_lttb_passes_short_series_through():
+    assert lttb_indices(np.arange(10.0), 10).tolist() == list(range(10))
+    assert lttb_indices(np.arange(10.0), 2).tolist() == list(range(10))
+
+
+def test_downsample_keeps_a_shared_axis_and_pinned_labels():
+    rng = np.random.default_rng(1)
+    labels = [f"L{i:04d}" for i in range(2000)]
+    series = {"a": rng.normal(size=2000).tolist(), "b": [None if i % 9 == 0 else float(i) for i in range(2000)]}
+    kept_labels, kept = downsample(labels, series, budget=100, keep=["L0777", "missing"])
+
+    assert "L0777" in kept_labels and kept_labels[0] == "L0000" and kept_labels[-1] == "L1999"
+    assert len(kept_labels) <= 101
+    positions = [labels.index(label) for label in kept_labels]
+    for name in series:
+        assert kept[name] == [series[name][i] for i in positions]
+    assert downsample(labels[:50], {k: v[:50] for k, v in series.items()}, budget=100)[0] == labels[:50]
+
+
+def small_cube(scale=1):
+    values = np.zeros((1, 1, 30, len(METRICS)), dtype=np.int64)
+    values[0, 0, :, METRICS.index("Population_Affected")] = np.arange(30) * scale
+    months = [f"{2021 + i // 12}-{i % 12 + 1:02d}-01" for i in range(30)]
+    return DiseaseCube(values, np.ones((1, 1, 30), dtype=np.int64), ["Delhi"], ["Dengue"], months)
+
+
+def test_memoized_options_match_a_fresh_build_and_are_shared():
+    option_cache.clear()
+    args = (["09:00", "12:00"], [21.5, 24.0], [60, 55])
+    first = weather_trend_option(*args)
+    assert first == weather_trend_option.__wrapped__(*args)
+    # Equal inputs from another rerun hit the same dict; different inputs build anew
+    assert weather_trend_option(list(args[0]), list(args[1]), list(args[2])) is first
+    assert weather_trend_option(args[0], [21.5, 25.0], args[2]) is not first
+    assert aqi_gauge_option(120) == aqi_gauge_option.__wrapped__(120)
+
+
+def test_disease_charts_are_reused_until_the_cube_is_replaced():
+    option_cache.clear()
+    cube = small_cube()
+    assert precompute_disease_charts(cube, None, {}, budget=100) == 2
+    chart = disease_trend_chart(cube, None, "delhi", "Dengue", 100)
+    assert disease_trend_chart(cube, None, "Delhi", "Dengue", 100) is chart
+    assert city_trend_chart(cube, None, "Delhi", 100) is city_trend_chart(cube, None, "Delhi", 100)
+
+    replaced = small_cube(scale=2)
+    rebuilt = disease_trend_chart(replaced, None, "Delhi", "Dengue", 100)
+    assert rebuilt is not chart
+    assert rebuilt["series"][0]["data"] == (np.arange(30) * 2).tolist()
+
+
+def test_option_cache_evicts_the_least_recently_used_entry():
+    cache = OptionCache(max_entries=2)
+    built = []
+
+    def build(name):
+        return lambda: built.append(name) or {"name": name}
+
+    cache.get_or_build(("a",), (), build("a"))
+    cache.get_or_build(("b",), (), build("b"))
+    cache.get_or_build(("a",), (), build("a"))
+    cache.get_or_build(("c",), (), build("c"))
+    cache.get_or_build(("a",), (), build("a"))
+    cache.get_or_build(("b",), (), build("b"))
+    assert built == ["a", "b", "c", "b"]
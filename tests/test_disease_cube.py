@@ -0,0 +1,67 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from disease_cube import METRICS, DiseaseCube, build_cube, load_cube
+from disease_data import normalize_disease_frame, read_disease_csv
+
+RAW = pd.DataFrame({
+    "City": ["Delhi", "Delhi", "Delhi", "Pune", None],
+    "Disease": ["Dengue", "Dengue", "Dengue", "Malaria", "Dengue"],
+    "Date": ["2023-01-05", "", "2023-03-10", "not a date", "2023-01-01"],
+    "Population_Affected": ["10", "5", "n/a", "7", "3"],
+    "Number_of_Deaths": [1, 1, 2, 1, 1],
+    "Survived": [9, 4, 3, 6, 2],
+    "Doctors_Available": [4, 4, 4, 4, 4],
+    "Hospitals_Available": [2, 2, 2, 2, 2],
+})
+
+
+def test_malformed_rows_are_left_out_and_missing_counts_add_zero():
+    cube = build_cube(normalize_disease_frame(RAW))
+
+    assert cube["cities"] == ["Delhi"]
+    assert cube["diseases"] == ["Dengue"]
+    assert cube["months"] == ["2023-01-01", "2023-02-01", "2023-03-01"]
+    assert cube["counts"][0, 0].tolist() == [1, 0, 1]
+    affected = METRICS.index("Population_Affected")
+    assert cube["values"][0, 0, :, affected].tolist() == [10, 0, 0]
+    assert cube["values"][0, 0, :, METRICS.index("Number_of_Deaths")].tolist() == [1, 0, 2]
+
+
+def test_cube_with_no_usable_rows_is_empty():
+    cube = build_cube(normalize_disease_frame(RAW.iloc[[1, 3]]))
+    assert cube["values"].shape == (0, 0, 0, len(METRICS))
+    assert cube["months"] == []
+
+
+def test_load_cube_survives_a_blank_date_in_the_csv(tmp_path):
+    csv_path = tmp_path / "disease.csv"
+    RAW.to_csv(csv_path, index=False)
+    cube = load_cube(str(csv_path), out_dir=str(tmp_path / "cube"))
+    assert cube.totals("delhi", "Dengue")["Population_Affected"] == 10
+    months, monthly = cube.monthly("Delhi", "Dengue")
+    assert months == ["2023-01-01", "2023-03-01"]
+    assert np.asarray(monthly).shape == (2, len(METRICS))
+
+
+def test_city_disease_lookups_match_filtering_the_frame():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    df = read_disease_csv(os.path.join(root, "output_d206b0_corrected.csv"))
+    built = build_cube(df)
+    cube = DiseaseCube(built["values"], built["counts"], built["cities"], built["diseases"], built["months"])
+
+    for city in df["City"].unique()[:3]:
+        # The full-table scan the disease and correlation sections used to run per rerun
+        city_df = df[df["City"].str.lower() == city.upper().lower()]
+        assert cube.diseases_for(city.upper()) == sorted(city_df["Disease"].unique().tolist())
+        assert cube.city_totals(city.upper()) == {
+            disease: int(total) for disease, total in city_df.groupby("Disease", observed=True)["Population_Affected"].sum().items()}
+        for disease in cube.diseases_for(city):
+            disease_df = city_df[city_df["Disease"] == disease]
+            assert cube.totals(city, disease) == {m: int(disease_df[m].sum()) for m in METRICS}
+            monthly = disease_df.groupby(disease_df["Date"].dt.to_period("M"))[list(METRICS)].sum()
+            months, values = cube.monthly(city, disease)
+            assert months == [p.start_time.strftime("%Y-%m-%d") for p in monthly.index]
+            assert np.array_equal(values, monthly.to_numpy())
@@ -0,0 +1,88 @@
+import os
+
+import pandas as pd
+
+import disease_data
+from disease_data import (cached_fingerprint, get_shared_dataset, invalidate_shared_dataset, load_disease_frame,
+                          read_disease_csv, revalidate_shared_dataset)
+
+CSV = """Disease,City,State,Date,Population_Affected,Number_of_Deaths,Survived,Doctors_Available,Hospitals_Available
+Dengue,Delhi,Delhi,2023-01-01,120,3,117,40,6
+Malaria,Pune,Maharashtra,2023-02-01,80,1,79,22,4
+"""
+
+
+def write_csv(path, text=CSV):
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def count_parses(monkeypatch):
+    parses = []
+    original = disease_data.read_disease_csv
+
+    def read(file_path):
+        parses.append(file_path)
+        return original(file_path)
+
+    monkeypatch.setattr(disease_data, "read_disease_csv", read)
+    return parses
+
+
+def test_cached_frame_matches_the_parsed_csv(tmp_path, monkeypatch):
+    csv_path = write_csv(tmp_path / "disease.csv")
+    parses = count_parses(monkeypatch)
+
+    first = load_disease_frame(csv_path)
+    second = load_disease_frame(csv_path)
+
+    assert len(parses) == 1
+    pd.testing.assert_frame_equal(second, read_disease_csv(csv_path))
+    pd.testing.assert_frame_equal(first, second)
+    assert isinstance(second["City"].dtype, pd.CategoricalDtype)
+    assert cached_fingerprint(csv_path)["size"] == os.path.getsize(csv_path)
+
+
+def test_touched_csv_with_the_same_contents_is_not_reparsed(tmp_path, monkeypatch):
+    csv_path = write_csv(tmp_path / "disease.csv")
+    load_disease_frame(csv_path)
+    parses = count_parses(monkeypatch)
+
+    stat = os.stat(csv_path)
+    os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    load_disease_frame(csv_path)
+
+    assert parses == []
+    assert cached_fingerprint(csv_path)["mtime_ns"] == stat.st_mtime_ns + 10 ** 9
+
+
+def test_changed_csv_is_reparsed(tmp_path, monkeypatch):
+    csv_path = write_csv(tmp_path / "disease.csv")
+    load_disease_frame(csv_path)
+    parses = count_parses(monkeypatch)
+
+    # Same size, different contents
+    write_csv(tmp_path / "disease.csv", CSV.replace("120,3,117", "121,2,117"))
+    stat = os.stat(csv_path)
+    os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    df = load_disease_frame(csv_path)
+
+    assert len(parses) == 1
+    assert df["Population_Affected"].tolist() == [121, 80]
+
+
+def test_every_caller_gets_the_same_shared_dataset(tmp_path):
+    csv_path = write_csv(tmp_path / "disease.csv")
+    try:
+        first = get_shared_dataset(csv_path)
+        assert get_shared_dataset(csv_path) is first
+        assert first.cities == ("Delhi", "Pune")
+        assert first.cube.totals("delhi", "Dengue")["Population_Affected"] == 120
+
+        assert not revalidate_shared_dataset(csv_path)
+        write_csv(tmp_path / "disease.csv", CSV + "Dengue,Agra,Uttar Pradesh,2023-03-01,5,0,5,3,1\n")
+        assert revalidate_shared_dataset(csv_path)
+        reloaded = get_shared_dataset(csv_path)
+        assert reloaded is not first and "Agra" in reloaded.cities
+    finally:
+        invalidate_shared_dataset(csv_path)
@@ -0,0 +1,41 @@
+import json
+import os
+import subprocess
+import sys
+
+from batch_collector import CityEnvironment, summarize_collection
+from environment import EnvironmentSnapshot
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Nothing listens on the discard port, so every call fails with a connection error
+UNREACHABLE_URL = "http://127.0.0.1:9"
+
+
+def test_summarize_collection_counts_cities_without_data_as_failed():
+    errors = {"weather": "Network error", "forecast": "Network error", "air_pollution": "Network error"}
+    results = {
+        "none": CityEnvironment("none", 31.6, 74.9, EnvironmentSnapshot(31.6, 74.9, errors=dict(errors))),
+        "some": CityEnvironment("some", 31.6, 74.9, EnvironmentSnapshot(
+            31.6, 74.9, current={"main": {}}, errors={"forecast": "Network error"}, fetched={"weather": 1.0})),
+        "all": CityEnvironment("all", 31.6, 74.9, EnvironmentSnapshot(
+            31.6, 74.9, current={"main": {}}, fetched={"weather": 1.0, "forecast": 1.0, "air_pollution": 1.0})),
+        "unlocated": CityEnvironment("unlocated", error="Could not determine coordinates"),
+    }
+    assert summarize_collection(results) == {"ok": ["all"], "partial": ["some"], "failed": ["none", "unlocated"]}
+
+
+def test_report_exits_non_zero_when_the_api_is_unreachable(tmp_path):
+    env = dict(os.environ, OWM_BASE_URL=UNREACHABLE_URL)
+    out = tmp_path / "reports"
+    completed = subprocess.run(
+        [sys.executable, "-m", "envdisease", "report", "--cities", "Amritsar", "--out", str(out),
+         "--archive", str(tmp_path / "archive.csv"), "--no-record", "--workers", "1",
+         "--calls-per-minute", "6000", "--api-key", "test"],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=300,
+    )
+    assert completed.returncode != 0, completed.stderr
+    assert "0 ok, 0 partial, 1 failed" in completed.stderr
+
+    index = json.loads((out / "index.json").read_text(encoding="utf-8"))
+    assert index["fetch"]["failed"] == ["Amritsar"]
+    assert index["cities"][0]["error"].startswith("No environmental data")
@@ -0,0 +1,162 @@
+import time
+
+import requests
+
+import environment
+from environment import EnvironmentCache, EnvironmentSnapshot, fetch_environment
+
+
+def fake_fetch(calls):
+    def fetch(lat, lon, api_key, timeout=10, endpoints=environment.ENDPOINTS, concurrent=True):
+        calls.append(endpoints)
+        snapshot = EnvironmentSnapshot(lat=lat, lon=lon)
+        for name in endpoints:
+            setattr(snapshot, environment._SNAPSHOT_FIELDS[name], {"endpoint": name})
+            snapshot.fetched[name] = time.time()
+        return snapshot
+    return fetch
+
+
+def wait_for_refresh(cache, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while cache._refreshing and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_snapshot_stops_being_current_once_stale_and_again_after_refresh(monkeypatch):
+    calls = []
+    monkeypatch.setattr(environment, "fetch_environment", fake_fetch(calls))
+    cache = EnvironmentCache(ttls={"weather": 0.2}, max_staleness={"weather": 60})
+
+    first = cache.get(31.6, 74.9, "key", ("weather",))
+    assert cache.is_current(first)
+
+    time.sleep(0.25)
+    assert not cache.is_current(first)
+
+    stale = cache.get(31.6, 74.9, "key", ("weather",))
+    assert stale.stale == ("weather",)
+    assert not cache.is_current(stale)
+
+    wait_for_refresh(cache)
+    refreshed = cache.get(31.6, 74.9, "key", ("weather",))
+    assert refreshed.stale == ()
+    assert refreshed.fetched["weather"] > first.fetched["weather"]
+    assert cache.is_current(refreshed)
+    assert len(calls) == 2
+
+
+def test_snapshot_is_not_current_after_invalidation(monkeypatch):
+    monkeypatch.setattr(environment, "fetch_environment", fake_fetch([]))
+    cache = EnvironmentCache()
+    snapshot = cache.get(31.6, 74.9, "key", ("weather",))
+    cache.invalidate()
+    assert not cache.is_current(snapshot)
+
+
+def test_endpoints_are_fetched_side_by_side(stub_api):
+    server = stub_api(latency=0.3)
+    started = time.monotonic()
+    snapshot = fetch_environment(31.6, 74.9, "key", timeout=5)
+    elapsed = time.monotonic() - started
+
+    assert snapshot.errors == {}
+    assert set(snapshot.fetched) == set(environment.ENDPOINTS)
+    assert server.stats["requests"] == 3
+    # One round trip of latency, not three in a row
+    assert elapsed < 0.8
+    assert "aqi_result" in snapshot.air_quality
+
+
+def test_a_failed_endpoint_does_not_sink_the_others(stub_api, monkeypatch):
+    stub_api()
+
+    def broken(*args):
+        raise requests.exceptions.ConnectionError("refused")
+
+    monkeypatch.setitem(environment._FETCHERS, "forecast", broken)
+    snapshot = fetch_environment(31.6, 74.9, "key", timeout=5)
+
+    assert snapshot.forecast is None and snapshot.errors["forecast"].startswith("Network error")
+    assert snapshot.current is not None and snapshot.air is not None
+
+
+def test_sections_share_cached_endpoints_and_fetch_only_what_is_missing(monkeypatch):
+    calls = []
+    monkeypatch.setattr(environment, "fetch_environment", fake_fetch(calls))
+    cache = EnvironmentCache()
+
+    cache.get(31.6, 74.9, "key", ("forecast",))
+    cache.get(31.6, 74.9, "key", ("air_pollution",))
+    # Nearby coordinates round to the same location
+    full = cache.get(31.60001, 74.90001, "key")
+    cache.get(31.6, 74.9, "key")
+
+    assert calls == [("forecast",), ("air_pollution",), ("weather",)]
+    assert set(full.fetched) == set(environment.ENDPOINTS)
+
+
+def test_each_endpoint_expires_on_its_own_ttl(monkeypatch):
+    calls = []
+    monkeypatch.setattr(environment, "fetch_environment", fake_fetch(calls))
+    cache = EnvironmentCache(ttls={"weather": 0.1, "forecast": 60, "air_pollution": 60}, max_staleness={})
+
+    cache.get(31.6, 74.9, "key")
+    time.sleep(0.15)
+    cache.get(31.6, 74.9, "key")
+
+    assert calls == [environment.ENDPOINTS, ("weather",)]
+
+
+def slow_fetch(calls, delay):
+    fetch = fake_fetch(calls)
+
+    def slow(*args, **kwargs):
+        time.sleep(delay)
+        return fetch(*args, **kwargs)
+    return slow
+
+
+def test_stale_data_is_served_at_once_and_refreshed_once_in_the_background(monkeypatch):
+    calls = []
+    monkeypatch.setattr(environment, "fetch_environment", fake_fetch(calls))
+    cache = EnvironmentCache(ttls={"weather": 0.1}, max_staleness={"weather": 60})
+    first = cache.get(31.6, 74.9, "key", ("weather",))
+    time.sleep(0.15)
+
+    monkeypatch.setattr(environment, "fetch_environment", slow_fetch(calls, 0.3))
+    started = time.monotonic()
+    served = [cache.get(31.6, 74.9, "key", ("weather",)) for _ in range(5)]
+    assert time.monotonic() - started < 0.1
+    assert all(s.stale == ("weather",) and s.fetched == first.fetched for s in served)
+
+    wait_for_refresh(cache)
+    # Five stale reads scheduled a single refresh
+    assert len(calls) == 2
+    assert cache.get(31.6, 74.9, "key", ("weather",)).stale == ()
+
+
+def test_data_past_max_staleness_is_fetched_before_returning(monkeypatch):
+    calls = []
+    monkeypatch.setattr(environment, "fetch_environment", fake_fetch(calls))
+    cache = EnvironmentCache(ttls={"weather": 0.05}, max_staleness={"weather": 0.1})
+    cache.get(31.6, 74.9, "key", ("weather",))
+    time.sleep(0.15)
+
+    snapshot = cache.get(31.6, 74.9, "key", ("weather",))
+    assert snapshot.stale == () and snapshot.age("weather") < 0.05
+    assert len(calls) == 2
+
+
+def test_revalidate_refreshes_every_location_without_dropping_it(monkeypatch):
+    calls = []
+    monkeypatch.setattr(environment, "fetch_environment", fake_fetch(calls))
+    cache = EnvironmentCache()
+    cache.get(31.6, 74.9, "key", ("weather",))
+    cache.get(28.6, 77.2, "key", ("forecast",))
+
+    assert cache.revalidate() == 2
+    # Still servable while the refresh runs
+    assert cache.get(31.6, 74.9, "key", ("weather",)).current is not None
+    wait_for_refresh(cache)
+    assert sorted(calls[2:]) == [("forecast",), ("weather",)]
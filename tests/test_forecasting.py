@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+import forecasting
+from disease_cube import METRICS, DiseaseCube
+from forecasting import fit_series, forecast_cases
+
+AFFECTED = METRICS.index("Population_Affected")
+CITIES, DISEASES = ["Delhi", "Pune", "Agra"], ["Dengue", "Malaria", "Typhoid"]
+
+
+def make_cube(seed=0, n_months=40):
+    rng = np.random.default_rng(seed)
+    season = 30 + 20 * np.sin(np.arange(n_months) * 2 * np.pi / 12)
+    values = np.zeros((len(CITIES), len(DISEASES), n_months, len(METRICS)), dtype=np.int64)
+    values[..., AFFECTED] = np.rint(season * rng.uniform(0.5, 2, (len(CITIES), len(DISEASES), 1))
+                                    + rng.normal(0, 4, (len(CITIES), len(DISEASES), n_months))).clip(0)
+    counts = np.ones(values.shape[:-1], dtype=np.int64)
+    counts[0, 1, 5:8] = 0
+    months = [f"{2020 + i // 12}-{i % 12 + 1:02d}-01" for i in range(n_months)]
+    return DiseaseCube(values, counts, CITIES, DISEASES, months)
+
+
+@pytest.fixture
+def fits(monkeypatch):
+    """Record which series each forecast_cases call refits (in process, so the recorder sees them)"""
+    fitted = []
+    fit_batch = forecasting._fit_batch
+
+    def recording(tasks):
+        fitted.extend(key for key, *_ in tasks)
+        return fit_batch(tasks)
+    monkeypatch.setattr(forecasting, "_fit_batch", recording)
+    monkeypatch.setattr(forecasting, "_recent", {})
+    monkeypatch.setattr(forecasting, "MIN_PARALLEL_FITS", len(CITIES) * len(DISEASES) + 1)
+    return fitted
+
+
+def test_cached_models_match_fitting_each_series_directly(tmp_path, fits):
+    cube = make_cube()
+    results = forecast_cases(cube, str(tmp_path / "models.json"))
+
+    assert len(fits) == len(CITIES) * len(DISEASES)
+    for (city, disease), record in results.items():
+        c, d = CITIES.index(city), DISEASES.index(disease)
+        present = np.flatnonzero(cube.counts[c, d])
+        y = np.interp(np.arange(present[0], present[-1] + 1), present, cube.values[c, d, present, AFFECTED])
+        expected = fit_series(y, 1)
+        assert record["model"] == expected["model"]
+        assert record["forecast"] == expected["forecast"]
+        assert record["months"] == ["2023-05-01", "2023-06-01", "2023-07-01"]
+
+
+def test_only_series_with_changed_inputs_are_refit(tmp_path, fits):
+    path = str(tmp_path / "models.json")
+    first = forecast_cases(make_cube(), path)
+    fits.clear()
+
+    # A new cube object with the same data reads every model back from the cache
+    assert forecast_cases(make_cube(), path) == first
+    assert fits == []
+
+    changed = make_cube()
+    changed.values[2, 0, -1, AFFECTED] += 50
+    results = forecast_cases(changed, path)
+    assert fits == ["Agra|Dengue"]
+    assert {key: r for key, r in results.items() if key != ("Agra", "Dengue")} == \
+        {key: r for key, r in first.items() if key != ("Agra", "Dengue")}
+
+
+def test_same_cube_object_returns_the_previous_result(tmp_path, fits):
+    cube = make_cube()
+    path = str(tmp_path / "models.json")
+    first = forecast_cases(cube, path)
+    (tmp_path / "models.json").unlink()
+    assert forecast_cases(cube, path) is first
+
+
+def test_pool_refits_match_in_process_fits(tmp_path, monkeypatch):
+    monkeypatch.setattr(forecasting, "_recent", {})
+    in_process = forecast_cases(make_cube(), str(tmp_path / "serial.json"))
+    monkeypatch.setattr(forecasting, "MIN_PARALLEL_FITS", 1)
+    pooled = forecast_cases(make_cube(), str(tmp_path / "pooled.json"), max_workers=2)
+    assert pooled == in_process
@@ -0,0 +1,65 @@
+import pytest
+import requests
+
+import geocode
+from geocode import GAZETTEER, GeocodeStore, resolve_coordinates, warm_geocode_store
+
+
+@pytest.fixture
+def online(monkeypatch):
+    """Record geocoding API lookups and answer them from a dict (None = not found)"""
+    answers, calls = {}, []
+
+    def lookup(city, api_key):
+        calls.append(city)
+        if isinstance(answers.get(city), Exception):
+            raise answers[city]
+        return answers.get(city)
+
+    monkeypatch.setattr(geocode, "_geocode_online", lookup)
+    return answers, calls
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = GeocodeStore(str(tmp_path / "geocode.sqlite3"))
+    store.preload(GAZETTEER)
+    return store
+
+
+def test_gazetteer_cities_resolve_offline(store, online):
+    _, calls = online
+    city = next(iter(GAZETTEER))
+    assert resolve_coordinates(f"  {city.upper()} ", "key", store) == GAZETTEER[city]
+    assert calls == []
+
+
+def test_an_unknown_city_is_geocoded_once_and_survives_a_restart(store, online):
+    answers, calls = online
+    answers["Shillong"] = (25.58, 91.89)
+
+    assert resolve_coordinates("Shillong", "key", store) == (25.58, 91.89)
+    reopened = GeocodeStore(store.db_path)
+    assert resolve_coordinates("shillong", "key", reopened) == (25.58, 91.89)
+    assert calls == ["Shillong"]
+
+
+def test_old_entries_are_served_and_refreshed_in_the_background(store, online, monkeypatch):
+    refreshed = []
+    monkeypatch.setattr(geocode, "_refresh_in_background", lambda store, city, api_key: refreshed.append(city))
+    store.put("Tura", 25.5, 90.2)
+
+    assert resolve_coordinates("Tura", "key", store, refresh_after=-1) == (25.5, 90.2)
+    assert refreshed == ["Tura"]
+
+
+def test_warm_store_reports_cities_it_could_not_resolve(store, online):
+    answers, calls = online
+    answers["Shillong"] = (25.58, 91.89)
+    answers["Atlantis"] = None
+    answers["Offline"] = requests.exceptions.ConnectionError("down")
+
+    known = next(iter(GAZETTEER))
+    assert warm_geocode_store([known, "Shillong", "Atlantis", "Offline"], "key", store) == ["Atlantis", "Offline"]
+    assert calls == ["Shillong", "Atlantis", "Offline"]
+    assert store.missing([known, "Shillong", "Atlantis"]) == ["Atlantis"]
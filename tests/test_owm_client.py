@@ -0,0 +1,183 @@
+import threading
+import time
+
+import pytest
+import requests
+
+import owm_client
+from owm_client import (CircuitBreaker, CircuitOpenError, OWMClient, SingleFlight, TokenBucket, configure_rate_limit,
+                        get_client)
+
+
+@pytest.fixture(autouse=True)
+def fresh_clients(monkeypatch):
+    monkeypatch.setattr(owm_client, "_clients", {})
+    monkeypatch.setattr(owm_client, "_buckets", {})
+
+
+def test_bucket_allows_a_burst_then_the_sustained_rate():
+    bucket = TokenBucket(rate_per_minute=600, capacity=3)
+    assert [bucket.try_acquire() for _ in range(4)] == [True, True, True, False]
+    time.sleep(0.12)
+    assert bucket.try_acquire()
+
+
+def test_set_rate_keeps_spent_tokens_spent():
+    bucket = TokenBucket(rate_per_minute=60, capacity=5)
+    for _ in range(5):
+        assert bucket.try_acquire()
+    bucket.set_rate(120, capacity=10)
+    assert not bucket.try_acquire()
+    assert bucket.capacity == 10 and bucket.rate == 2.0
+
+
+def test_acquire_gives_up_when_no_token_can_arrive_in_time():
+    bucket = TokenBucket(rate_per_minute=6, capacity=1)
+    assert bucket.acquire(timeout=0)
+    started = time.monotonic()
+    assert not bucket.acquire(timeout=0.5)
+    assert time.monotonic() - started < 0.1
+
+
+def test_every_client_for_a_key_shares_one_bucket():
+    interactive = get_client("key")
+    other_host = get_client("key", "http://127.0.0.1:8089")
+    assert interactive.rate_limiter is not None
+    assert other_host.rate_limiter is interactive.rate_limiter
+    assert get_client("other-key").rate_limiter is not interactive.rate_limiter
+
+
+def test_configure_rate_limit_retunes_the_shared_bucket_in_place():
+    bucket = get_client("key").rate_limiter
+    assert configure_rate_limit("key", owm_client.DEFAULT_CALLS_PER_MINUTE) is bucket
+    assert configure_rate_limit("key", 120) is bucket
+    assert bucket.rate == 2.0
+    assert get_client("key", "http://127.0.0.1:8089").rate_limiter is bucket
+
+
+def test_saturated_bucket_fails_the_call_at_the_deadline(stub):
+    server = stub()
+    client = OWMClient("key", server.base_url, rate_limiter=TokenBucket(rate_per_minute=6, capacity=1))
+    client.current_weather(31.6, 74.9)
+
+    started = time.monotonic()
+    with pytest.raises(requests.exceptions.Timeout):
+        client.current_weather(31.6, 74.9, deadline=time.monotonic() + 0.5)
+    assert time.monotonic() - started < 0.5
+    assert server.stats["requests"] == 1
+
+
+def test_retries_stop_at_the_deadline(stub):
+    server = stub(error_rate=1.0)
+    client = OWMClient("key", server.base_url, max_retries=10)
+    client._backoff = lambda attempt, retry_after=None: 0.4
+    started = time.monotonic()
+    with pytest.raises(requests.exceptions.RequestException):
+        client.current_weather(31.6, 74.9, deadline=time.monotonic() + 1.0)
+    assert time.monotonic() - started < 1.0
+    # Attempts at 0, 0.4 and 0.8 s; a third pause would end past the deadline
+    assert server.stats["requests"] == 3
+
+
+def test_half_open_breaker_admits_a_single_probe():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.1)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow_request()
+
+    time.sleep(0.12)
+    assert breaker.state == "half-open"
+    admitted = []
+    callers = [threading.Thread(target=lambda: admitted.append(breaker.allow_request())) for _ in range(20)]
+    for caller in callers:
+        caller.start()
+    for caller in callers:
+        caller.join()
+    assert admitted.count(True) == 1
+
+    # A failed probe re-opens the breaker; a successful one closes it
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow_request()
+    time.sleep(0.12)
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow_request()
+
+
+def test_open_breaker_fails_fast_without_calling_upstream(stub):
+    server = stub(error_rate=1.0)
+    client = OWMClient("key", server.base_url, max_retries=0, breaker=CircuitBreaker(failure_threshold=1))
+    with pytest.raises(requests.exceptions.HTTPError):
+        client.forecast(31.6, 74.9)
+    with pytest.raises(CircuitOpenError):
+        client.forecast(31.6, 74.9)
+    assert server.stats["requests"] == 1
+
+
+def test_single_flight_runs_concurrent_identical_calls_once():
+    flight = SingleFlight()
+    release = threading.Event()
+    runs = []
+
+    def work():
+        runs.append(1)
+        release.wait(5)
+        return {"temp": 30}
+
+    results = []
+    callers = [threading.Thread(target=lambda: results.append(flight.do("weather", work))) for _ in range(10)]
+    for caller in callers:
+        caller.start()
+    deadline = time.monotonic() + 5
+    while flight.snapshot_stats()["calls"] < 10 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for caller in callers:
+        caller.join()
+
+    assert len(runs) == 1
+    assert len(results) == 10 and all(result is results[0] for result in results)
+    assert flight.snapshot_stats() == {"calls": 10, "executed": 1, "coalesced": 9, "in_flight": 0}
+    # Once it has finished, the next call runs again
+    flight.do("weather", work)
+    assert len(runs) == 2
+
+
+def test_single_flight_shares_the_leaders_error():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def fail():
+        release.wait(5)
+        raise requests.exceptions.ConnectionError("refused")
+
+    errors = []
+
+    def call():
+        try:
+            flight.do("forecast", fail)
+        except requests.exceptions.ConnectionError as e:
+            errors.append(e)
+
+    callers = [threading.Thread(target=call) for _ in range(4)]
+    for caller in callers:
+        caller.start()
+    deadline = time.monotonic() + 5
+    while flight.snapshot_stats()["calls"] < 4 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for caller in callers:
+        caller.join()
+    assert len(errors) == 4 and flight.snapshot_stats()["executed"] == 1
+
+
+def test_client_coalesces_identical_requests(stub):
+    server = stub(latency=0.2)
+    client = OWMClient("key", server.base_url)
+    callers = [threading.Thread(target=client.air_pollution, args=(31.6, 74.9)) for _ in range(8)]
+    for caller in callers:
+        caller.start()
+    for caller in callers:
+        caller.join()
+    assert server.stats["requests"] == 1
+    assert client.single_flight.snapshot_stats()["coalesced"] == 7
@@ -0,0 +1,45 @@
+import requests
+
+from geocode import GAZETTEER
+
+WEATHER = "/data/2.5/weather"
+
+
+def get(server, path, **params):
+    return requests.get(f"{server.base_url}{path}", params=params, timeout=5)
+
+
+def test_recorded_responses_replay_without_upstream(stub, tmp_path):
+    upstream = stub()
+    recorder = stub(fixtures_dir=str(tmp_path), record=True, upstream=upstream.base_url)
+    recorded = get(recorder, WEATHER, lat="31.6", lon="74.9", units="metric", appid="real-key").json()
+    assert recorder.stats["recorded"] == 1
+
+    upstream.shutdown()
+    replay = stub(fixtures_dir=str(tmp_path))
+    # The API key is ignored and coordinates are rounded, so an equivalent request hits the fixture
+    replayed = get(replay, WEATHER, lat="31.600001", lon="74.9", units="metric", appid="other-key")
+    assert replayed.status_code == 200
+    assert replayed.json() == recorded
+    assert replay.stats["fixtures"] == 1 and replay.stats["synthetic"] == 0
+
+
+def test_synthetic_data_is_deterministic_per_location(stub):
+    server = stub()
+    first = get(server, "/data/2.5/air_pollution", lat="28.61", lon="77.21").json()
+    second = get(server, "/data/2.5/air_pollution", lat="28.61", lon="77.21").json()
+    assert first["list"][0]["components"] == second["list"][0]["components"]
+    forecast = get(server, "/data/2.5/forecast", lat="28.61", lon="77.21").json()
+    assert forecast["cnt"] == len(forecast["list"]) == 40
+    city, (lat, lon) = next(iter(GAZETTEER.items()))
+    place = get(server, "/geo/1.0/direct", q=city.title()).json()[0]
+    assert (place["lat"], place["lon"]) == (lat, lon)
+    assert get(server, "/geo/1.0/direct", q="Atlantis").json() == get(server, "/geo/1.0/direct", q="atlantis").json()
+
+
+def test_quota_answers_429_with_retry_after(stub):
+    server = stub(quota_per_minute=2)
+    statuses = [get(server, WEATHER, lat="1", lon="2") for _ in range(3)]
+    assert [r.status_code for r in statuses] == [200, 200, 429]
+    assert statuses[-1].headers["Retry-After"] == "1"
+    assert server.stats["rate_limited"] == 1
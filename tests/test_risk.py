@@ -0,0 +1,226 @@
+import itertools
+
+import numpy as np
+
+from environment import EnvironmentSnapshot, fetch_environment
+from owm_client import configure_rate_limit
+from risk import (AIR_CONDITIONS, STEPS_PER_DAY, assess_risk, assess_scenarios, forecast_risk_timeline,
+                  forecast_risk_timelines, score_locations)
+
+
+def _level(score, high, moderate):
+    return "High" if score >= high else "Moderate" if score >= moderate else "Low"
+
+
+def _row(disease, score, factors, max_score, high, moderate):
+    return {"Disease": disease, "Risk": _level(score, high, moderate), "Score": score, "Max_Score": max_score,
+            "Reason": f"Score: {score}/{max_score} - {', '.join(factors) if factors else 'No major risk factors'}"}
+
+
+def baseline_assessment(temp, humidity, rain, wind_speed, latest_aqi, latest_pm25, latest_pm10,
+                        dominant_pollutant, temp_change):
+    """The dashboard's original inline if/elif scoring, condensed but with the same branches and texts"""
+    rows = []
+
+    s, f = 0, []
+    if 25 <= temp <= 32:
+        s += 3; f.append("Optimal temperature for mosquito breeding")
+    elif 20 <= temp <= 35:
+        s += 2; f.append("Favorable temperature")
+    elif temp > 35:
+        s += 1; f.append("High temperature (reduced mosquito activity)")
+    if humidity > 80:
+        s += 3; f.append("Very high humidity (ideal for mosquitoes)")
+    elif humidity > 70:
+        s += 2; f.append("High humidity")
+    elif humidity > 60:
+        s += 1; f.append("Moderate humidity")
+    if rain > 15:
+        s += 3; f.append("Heavy rainfall (breeding sites)")
+    elif rain > 5:
+        s += 2; f.append("Moderate rainfall")
+    elif rain > 1:
+        s += 1; f.append("Light rainfall")
+    if wind_speed < 1:
+        s += 1; f.append("Low wind (stagnant conditions)")
+    if latest_aqi > 100:
+        s += 1; f.append("Poor air quality (weakened immunity)")
+    rows.append(_row("Dengue", s, f, 11, 6, 3))
+
+    s, f = 0, []
+    if temp > 42:
+        s += 4; f.append("Extreme dangerous heat")
+    elif temp > 38:
+        s += 3; f.append("Very high temperature")
+    elif temp > 35:
+        s += 2; f.append("High temperature")
+    elif temp > 32:
+        s += 1; f.append("Warm temperature")
+    if humidity > 80:
+        s += 3; f.append("Very high humidity (reduced cooling)")
+    elif humidity > 70:
+        s += 2; f.append("High humidity")
+    elif humidity > 50:
+        s += 1; f.append("Moderate humidity")
+    if wind_speed < 1:
+        s += 2; f.append("Very low wind (no cooling)")
+    elif wind_speed < 3:
+        s += 1; f.append("Low wind")
+    if latest_aqi > 150:
+        s += 1; f.append("Poor air quality (additional stress)")
+    heat_index = temp + (0.5 * humidity/100 * temp)
+    if heat_index > 40:
+        s += 2; f.append(f"High heat index ({heat_index:.1f}°C)")
+    rows.append(_row("Heat Stroke", s, f, 12, 7, 3))
+
+    s, f = 0, []
+    if latest_aqi > 200:
+        s += 4; f.append("Very unhealthy AQI")
+    elif latest_aqi > 150:
+        s += 3; f.append("Unhealthy AQI")
+    elif latest_aqi > 100:
+        s += 2; f.append("Unhealthy for sensitive groups")
+    elif latest_aqi > 50:
+        s += 1; f.append("Moderate AQI")
+    if latest_pm25 > 75:
+        s += 3; f.append("Very high PM2.5")
+    elif latest_pm25 > 55:
+        s += 2; f.append("High PM2.5")
+    elif latest_pm25 > 35:
+        s += 1; f.append("Elevated PM2.5")
+    if latest_pm10 > 150:
+        s += 2; f.append("Very high PM10")
+    elif latest_pm10 > 100:
+        s += 1; f.append("High PM10")
+    if dominant_pollutant in ["O3", "NO2", "SO2"]:
+        s += 2; f.append(f"Dominant pollutant is {dominant_pollutant}")
+    if temp_change > 15:
+        s += 3; f.append("Very high temperature variation")
+    elif temp_change > 10:
+        s += 2; f.append("High temperature variation")
+    elif temp_change > 5:
+        s += 1; f.append("Moderate temperature variation")
+    if humidity > 85:
+        s += 2; f.append("Very high humidity")
+    elif humidity < 30:
+        s += 1; f.append("Very low humidity (dry air)")
+    if wind_speed > 10:
+        s += 1; f.append("High wind (dust/allergens)")
+    rows.append(_row("Asthma", s, f, 18, 8, 4))
+
+    s, f = 0, []
+    if latest_aqi > 150:
+        s += 3; f.append("Poor air quality")
+    elif latest_aqi > 100:
+        s += 2; f.append("Moderate air quality")
+    if temp < 15:
+        s += 2; f.append("Cold temperature")
+    elif temp > 35:
+        s += 1; f.append("Hot temperature (stress)")
+    if humidity > 80:
+        s += 2; f.append("Very high humidity (mold/bacteria)")
+    elif humidity < 30:
+        s += 1; f.append("Very low humidity (dry airways)")
+    if temp_change > 10:
+        s += 2; f.append("High temperature variation")
+    if wind_speed < 1:
+        s += 1; f.append("Poor air circulation")
+    rows.append(_row("Respiratory Infections", s, f, 10, 5, 3))
+    return rows
+
+
+# Every threshold in the rule table, with values either side of it
+TEMPS = (-2, 14.9, 15, 19.9, 20, 25, 26.7, 32, 32.1, 35, 35.1, 38, 38.1, 42, 42.1)
+HUMIDITIES = (10, 29.9, 30, 50, 50.1, 60.1, 70.1, 80, 80.1, 85, 85.1)
+WINDS = (0, 0.99, 1, 2.99, 3, 10, 10.1)
+AQIS = (0, 50, 50.1, 100, 100.1, 150, 150.1, 200, 200.1)
+ARGUMENTS = ("temp", "humidity", "rain", "wind_speed", "aqi", "pm25", "pm10", "dominant_pollutant", "temp_change")
+
+
+def test_rule_table_matches_the_baseline_on_every_threshold():
+    rng = np.random.default_rng(0)
+    pollutants = ("O3", "NO2", "SO2", "PM2.5", "CO", "None", None)
+    grid = list(itertools.product(TEMPS, HUMIDITIES, WINDS, AQIS))
+    n = len(grid)
+    conditions = dict(zip(("temp", "humidity", "wind_speed", "aqi"), map(np.array, zip(*grid))))
+    conditions.update({
+        "rain": rng.choice([0, 1, 1.1, 5, 5.1, 15, 15.1], n), "pm25": rng.choice([35, 35.1, 55.1, 75.1], n),
+        "pm10": rng.choice([100, 100.1, 150.1], n), "temp_change": rng.choice([5, 5.1, 10.1, 15, 15.1], n),
+        "dominant_pollutant": np.array([pollutants[i] for i in rng.integers(len(pollutants), size=n)], dtype=object),
+    })
+    for i, rows in enumerate(assess_scenarios(conditions)):
+        args = [conditions[name][i] for name in ARGUMENTS]
+        assert rows == baseline_assessment(*args), args
+    # The scalar entry point takes the same path
+    for i in range(0, n, 97):
+        args = [conditions[name][i] for name in ARGUMENTS]
+        assert assess_risk(*args) == baseline_assessment(*args), args
+
+
+def test_batched_scenarios_match_the_baseline_one_by_one():
+    rng = np.random.default_rng(1)
+    n = 2000
+    conditions = {
+        "temp": rng.uniform(-5, 48, n), "humidity": rng.uniform(5, 100, n), "rain": rng.exponential(6, n),
+        "wind_speed": rng.exponential(3, n), "aqi": rng.uniform(0, 300, n), "pm25": rng.uniform(0, 150, n),
+        "pm10": rng.uniform(0, 250, n), "temp_change": rng.uniform(0, 20, n),
+        "dominant_pollutant": rng.choice(["O3", "NO2", "SO2", "PM10", "CO"], n).astype(object),
+    }
+    scenarios = assess_scenarios(conditions)
+    for i, rows in enumerate(scenarios):
+        assert rows == baseline_assessment(*(conditions[name][i] for name in ARGUMENTS)), i
+
+
+def synthetic_forecast(rng, steps=40):
+    return {"list": [{"dt": 1_700_000_000 + 10800 * i,
+                      "main": {"temp": float(rng.uniform(5, 45)), "humidity": float(rng.uniform(10, 100))},
+                      **({"rain": {"3h": float(rng.exponential(10))}} if i % 3 else {}),
+                      "wind": {"speed": float(rng.exponential(3))}} for i in range(steps)]}
+
+
+def test_forecast_timeline_matches_scoring_each_step_on_its_own():
+    rng = np.random.default_rng(2)
+    forecasts = [synthetic_forecast(rng, steps) for steps in (40, 7, 0, 40)]
+    air = [{"aqi": 160.0, "pm25": 80.0, "pm10": 120.0, "dominant_pollutant": "O3"},
+           {"aqi": 40.0, "pm25": 10.0, "pm10": 20.0, "dominant_pollutant": "PM2.5"},
+           {"aqi": 0, "pm25": 0, "pm10": 0, "dominant_pollutant": "None"},
+           {"aqi": 0, "pm25": 0, "pm10": 0, "dominant_pollutant": "None"}]
+
+    timelines = forecast_risk_timelines(forecasts, air)
+    for forecast, conditions, timeline in zip(forecasts, air, timelines):
+        single = forecast_risk_timeline(forecast, **conditions)
+        for disease, percentage in single.percentage.items():
+            np.testing.assert_array_equal(timeline.percentage[disease], percentage)
+        steps = forecast["list"]
+        temps = [step["main"]["temp"] for step in steps]
+        assert list(timeline.times) == [step["dt"] for step in steps]
+        for i, step in enumerate(steps):
+            # Temp Variation over the next 24 h (8 steps), shorter at the end of the horizon
+            window = temps[i:i + STEPS_PER_DAY]
+            rows = assess_risk(step["main"]["temp"], step["main"]["humidity"], step.get("rain", {}).get("3h", 0) / 3,
+                               step["wind"]["speed"], conditions["aqi"], conditions["pm25"], conditions["pm10"],
+                               conditions["dominant_pollutant"], max(window) - min(window))
+            for row in rows:
+                assert timeline.level[row["Disease"]][i] == row["Risk"]
+                assert timeline.percentage[row["Disease"]][i] == round(row["Score"] / row["Max_Score"] * 100, 1)
+
+
+def test_score_locations_matches_scoring_each_city_on_its_own(stub_api):
+    stub_api()
+    configure_rate_limit("key", 6000)
+    snapshots = {f"City {i}": fetch_environment(10 + 3 * i, 70 + 2 * i, "key", timeout=5) for i in range(6)}
+    snapshots["No weather"] = EnvironmentSnapshot(lat=0, lon=0)
+    snapshots["Missing"] = None
+
+    table = score_locations(snapshots).set_index("City")
+    assert sorted(table.index) == sorted(f"City {i}" for i in range(6))
+    assert list(table["Max Risk (%)"]) == sorted(table["Max Risk (%)"], reverse=True)
+    for name, row in table.iterrows():
+        snapshot = snapshots[name]
+        conditions = snapshot.risk_conditions()
+        timeline = forecast_risk_timeline(snapshot.forecast, **{key: conditions[key] for key in AIR_CONDITIONS})
+        for expected in assess_risk(**conditions):
+            disease = expected["Disease"]
+            assert row[f"{disease} (%)"] == round(expected["Score"] / expected["Max_Score"] * 100, 1)
+            assert row[f"{disease} Risk"] == expected["Risk"]
+            assert row[f"{disease} Peak (%)"] == timeline.peak(disease)[1]